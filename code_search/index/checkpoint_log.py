@@ -0,0 +1,138 @@
+"""
+Append-only binary checkpoint log for embedding generation.
+
+Every embedded structure is appended as one length-prefixed record:
+
+    u32 payload length | payload | u32 crc32(payload)
+
+with the payload holding the file path, a key (the content hash of the
+embedded text) and the float32 vector. Writes are fsync'd in chunks, so a
+checkpoint costs only the records added since the previous one. A crash can at
+worst leave a torn record at the end of the file; replay stops there and the
+next writer truncates it away.
+"""
+import os
+import struct
+import zlib
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CSEMBLOG2\n"
+_LENGTH = struct.Struct("<I")
+_STRING_LENGTH = struct.Struct("<H")
+# Read buffer used for replaying a log sequentially
+READ_BUFFER_SIZE = 1 << 20
+
+
+def _encode_record(file_path: str, key: str, vector) -> bytes:
+    path_bytes = file_path.encode("utf-8")
+    id_bytes = key.encode("utf-8")
+    vector_bytes = np.asarray(vector, dtype="<f4").tobytes()
+    payload = b"".join([
+        _STRING_LENGTH.pack(len(path_bytes)), path_bytes,
+        _STRING_LENGTH.pack(len(id_bytes)), id_bytes,
+        vector_bytes,
+    ])
+    return _LENGTH.pack(len(payload)) + payload + _LENGTH.pack(zlib.crc32(payload))
+
+
+def _decode_payload(payload: bytes) -> Tuple[str, str, List[float]]:
+    offset = 0
+    (path_length,) = _STRING_LENGTH.unpack_from(payload, offset)
+    offset += _STRING_LENGTH.size
+    file_path = payload[offset:offset + path_length].decode("utf-8")
+    offset += path_length
+    (id_length,) = _STRING_LENGTH.unpack_from(payload, offset)
+    offset += _STRING_LENGTH.size
+    key = payload[offset:offset + id_length].decode("utf-8")
+    offset += id_length
+    vector = np.frombuffer(payload, dtype="<f4", offset=offset).tolist()
+    return file_path, key, vector
+
+
+def replay(path: str) -> Tuple[List[Tuple[str, str, List[float]]], int]:
+    """
+    Read every intact record of the log at `path` in one sequential pass.
+
+    Returns:
+        The (file_path, key, vector) records and the byte length of the
+        intact prefix of the log
+    """
+    records = []
+    if not os.path.exists(path):
+        return records, 0
+
+    with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            logger.warning(f"{path} is not an embeddings checkpoint log. Ignoring it.")
+            return records, 0
+        valid_length = len(MAGIC)
+        while True:
+            header = f.read(_LENGTH.size)
+            if len(header) < _LENGTH.size:
+                break
+            (length,) = _LENGTH.unpack(header)
+            payload = f.read(length)
+            trailer = f.read(_LENGTH.size)
+            if len(payload) < length or len(trailer) < _LENGTH.size \
+                    or _LENGTH.unpack(trailer)[0] != zlib.crc32(payload):
+                logger.warning(f"Discarding torn record at byte {valid_length} of {path}")
+                break
+            records.append(_decode_payload(payload))
+            valid_length += _LENGTH.size + length + _LENGTH.size
+    return records, valid_length
+
+
+class CheckpointLog:
+    """Appends embedding records to a log file and makes them durable in chunks."""
+
+    def __init__(self, path: str, valid_length: int = 0):
+        """
+        Open the log at `path` for appending.
+
+        Args:
+            path: Log file to append to
+            valid_length: Length of the intact prefix returned by `replay`;
+                anything after it (a torn record) is truncated. 0 starts a new log.
+        """
+        self.path = path
+        if valid_length and os.path.exists(path):
+            self._file = open(path, "r+b")
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+        self._pending = 0
+
+    def append(self, file_path: str, key: str, vector):
+        self._file.write(_encode_record(file_path, key, vector))
+        self._pending += 1
+
+    def sync(self):
+        """Flush the appended records and fsync them to disk."""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self) -> "CheckpointLog":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
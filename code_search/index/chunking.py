@@ -0,0 +1,87 @@
+"""
+Sliding-window chunking of long code structures.
+
+Embedding models truncate their input, so a large class would otherwise be
+represented only by its first screen of code. Structures longer than
+`CHUNK_MAX_LINES` are embedded as overlapping windows of `CHUNK_WINDOW_LINES`
+lines instead. Every window repeats the structure's docstring and declaration
+line, and is stored under `{structure id}#w{n}` next to the vectors of
+ordinary structures, so the local index scans all of them in one pass and
+aggregates window scores back to their structure.
+"""
+import os
+import re
+from typing import Iterator, List, Optional, Tuple
+
+# Structures with more lines than this are split into windows (0 disables chunking)
+CHUNK_MAX_LINES = int(os.environ.get("CHUNK_MAX_LINES", 100))
+CHUNK_WINDOW_LINES = int(os.environ.get("CHUNK_WINDOW_LINES", 60))
+CHUNK_OVERLAP_LINES = int(os.environ.get("CHUNK_OVERLAP_LINES", 15))
+
+WINDOW_SEPARATOR = "#w"
+_WINDOW_SUFFIX = re.compile(rf"{WINDOW_SEPARATOR}\d+$")
+
+
+def structure_id(structure: dict) -> str:
+    """Id of a structure in the embeddings file (and of its row in the local index)."""
+    return f"{structure['file_path']}_{structure['line_from']}_{structure['line_to']}"
+
+
+def parent_id(unit_id: str) -> str:
+    """Structure id of a window id; ids of whole structures are returned unchanged."""
+    return _WINDOW_SUFFIX.sub("", unit_id)
+
+
+def split_windows(
+    snippet: str,
+    max_lines: int = CHUNK_MAX_LINES,
+    window_lines: int = CHUNK_WINDOW_LINES,
+    overlap_lines: int = CHUNK_OVERLAP_LINES,
+) -> Optional[List[str]]:
+    """
+    Overlapping windows of a long snippet.
+
+    Returns:
+        The window texts, or None if the snippet is short enough to embed whole
+    """
+    lines = (snippet or "").split("\n")
+    if not max_lines or len(lines) <= max_lines:
+        return None
+    window_lines = max(1, window_lines)
+    step = max(1, window_lines - overlap_lines)
+    header = lines[0]
+
+    windows = []
+    for start in range(0, len(lines), step):
+        window = lines[start:start + window_lines]
+        # Later windows keep the declaration so the model knows what they belong to
+        windows.append("\n".join(window if start == 0 else [header, *window]))
+        if start + window_lines >= len(lines):
+            break
+    return windows
+
+
+def embedding_units(structure: dict) -> List[Tuple[str, dict]]:
+    """
+    The texts embedded for `structure`: the structure itself, or its windows.
+
+    Returns:
+        (unit id, {"file_path", "snippet", "docstring"}) pairs
+    """
+    windows = split_windows(structure.get("snippet") or "")
+    if windows is None:
+        return [(structure_id(structure), structure)]
+    sid = structure_id(structure)
+    return [
+        (f"{sid}{WINDOW_SEPARATOR}{n}", {
+            "file_path": structure["file_path"],
+            "snippet": window,
+            "docstring": structure.get("docstring"),
+        })
+        for n, window in enumerate(windows)
+    ]
+
+
+def iter_embedding_units(structures) -> Iterator[Tuple[str, dict]]:
+    for structure in structures:
+        yield from embedding_units(structure)
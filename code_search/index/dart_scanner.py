@@ -0,0 +1,331 @@
+"""
+Single-pass scanner of the top-level declarations in Dart source.
+
+The source is read once, left to right. Declaration headers are tokenized;
+bodies are skipped by jumping from one brace, string literal or comment to the
+next. Comments (including nested block comments) and string literals (raw,
+multi-line and with `${...}` interpolations) are consumed whole, so braces
+inside them never affect the brace depth. Declarations are reported as
+character offsets into the source instead of copied text; only the name and
+docstring are extracted.
+"""
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<doc>///[^\n]*)
+    | (?P<comment>//[^\n]*)
+    | (?P<block>/\*)
+    | (?P<string>r?(?:'''|\"\"\"|'|"))
+    | (?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)
+    | (?P<number>[0-9][A-Za-z0-9_.]*)
+    | (?P<arrow>=>)
+    | (?P<punct>.)
+    )?
+""", re.VERBOSE | re.DOTALL)
+
+# Everything that can change the bracket depth inside an initializer or arrow body, or hide a bracket
+# (a raw string's `r` prefix is checked after the match, which keeps the pattern a plain character class)
+_SKIP = re.compile(r"""[{}()\[\];'"]|/[/*]""")
+# The same for a block body, where only the braces count
+_SKIP_BLOCK = re.compile(r"""[{}'"]|/[/*]""")
+
+_BLOCK_COMMENT_DELIMITER = re.compile(r"/\*|\*/")
+
+
+def _string_end_pattern(quote: str, raw: bool):
+    # What can end the literal or needs skipping inside it
+    parts = [re.escape(quote)]
+    if not raw:
+        parts[:0] = [r"\\.", r"\$\{"]
+    if len(quote) == 1:
+        # Single-line literals can't span lines; stop at the newline of an unterminated one
+        parts.append(r"\n")
+    return re.compile("|".join(parts), re.DOTALL)
+
+
+_STRING_END = {
+    (quote, raw): _string_end_pattern(quote, raw)
+    for quote in ("'", '"', "'''", '"""') for raw in (False, True)
+}
+
+# Keywords starting a type declaration, and the modifiers that may precede them
+_TYPE_KEYWORDS = {"class", "mixin", "enum", "extension"}
+_MODIFIERS = {"abstract", "sealed", "base", "final", "interface", "macro", "augment", "external"}
+
+# (kind, start, end) of one token
+Token = Tuple[str, int, int]
+
+
+class DartDeclaration(NamedTuple):
+    """A top-level declaration, located by offsets into the scanned source."""
+
+    # "class", "mixin", "enum", "extension" or "function"
+    kind: str
+    name: str
+    docstring: str
+    # First character of the declaration, after its doc comments and annotations
+    start: int
+    # End of the header, where the body starts
+    signature_end: int
+    # Just past the closing brace (or the semicolon of an arrow body)
+    end: int
+    line_from: int
+    line_to: int
+
+    def signature(self, source: str) -> str:
+        """The header of the declaration with its whitespace collapsed."""
+        return " ".join(source[self.start:self.signature_end].split())
+
+
+def _skip_block_comment(source: str, position: int) -> int:
+    # Block comments nest in Dart
+    depth = 1
+    while depth:
+        match = _BLOCK_COMMENT_DELIMITER.search(source, position)
+        if not match:
+            return len(source)
+        depth += 1 if match.group() == "/*" else -1
+        position = match.end()
+    return position
+
+
+def _skip_string(source: str, position: int, quote: str, raw: bool) -> int:
+    pattern = _STRING_END[(quote, raw)]
+    while True:
+        match = pattern.search(source, position)
+        if not match:
+            return len(source)
+        token = match.group()
+        if token == quote:
+            return match.end()
+        if token == "\n":
+            return match.start()
+        if token == "${":
+            position = _skip_nested(source, match.end(), closing="}")
+        else:
+            # Escaped character
+            position = match.end()
+
+
+def _skip_nested(source: str, position: int, closing: str) -> int:
+    """
+    Offset just past the `closing` bracket (or `;`) that ends the code starting
+    at `position`, outside any brackets, strings and comments opened after it.
+    """
+    depth = 0
+    search = (_SKIP_BLOCK if closing == "}" else _SKIP).search
+    while True:
+        match = search(source, position)
+        if not match:
+            return len(source)
+        token, position = match.group(), match.end()
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            if not depth and token == closing:
+                return position
+            depth -= 1
+        elif token == ";":
+            if not depth and closing == ";":
+                return position
+        elif token == "//":
+            newline = source.find("\n", position)
+            position = len(source) if newline == -1 else newline
+        elif token == "/*":
+            position = _skip_block_comment(source, position)
+        else:
+            if source.startswith(token * 3, match.start()):
+                token, position = token * 3, position + 2
+            start = match.start()
+            raw = start and source[start - 1] == "r" and not _is_identifier_char(source, start - 2)
+            position = _skip_string(source, position, token, raw)
+
+
+def _is_identifier_char(source: str, position: int) -> bool:
+    return position >= 0 and (source[position].isalnum() or source[position] in "_$")
+
+
+def _next_token(source: str, position: int) -> Optional[Token]:
+    """The (kind, start, end) token at `position`, after whitespace; None at the end."""
+    match = _TOKEN.match(source, position)
+    kind = match.lastgroup
+    if kind is None:
+        return None
+    start, end = match.start(kind), match.end()
+    if kind == "block":
+        end = _skip_block_comment(source, end)
+        is_doc = source.startswith("/**", start) and not source.startswith("/**/", start)
+        kind = "docblock" if is_doc else "comment"
+    elif kind == "string":
+        text = match.group(kind)
+        end = _skip_string(source, end, text.lstrip("r"), text[0] == "r")
+    return kind, start, end
+
+
+def line_span(source: str, start: int, end: int) -> str:
+    """The full lines of `source` that hold the characters from `start` to `end`."""
+    first = source.rfind("\n", 0, start) + 1
+    last = source.find("\n", max(start, end - 1))
+    return source[first:last if last != -1 else len(source)]
+
+
+def _docstring(source: str, docs: List[Token]) -> str:
+    lines = []
+    for kind, start, end in docs:
+        if kind == "doc":
+            lines.append(source[start:end].strip("/ "))
+        else:
+            block = [line.strip().strip("/*").strip() for line in source[start:end].split("\n")]
+            while block and not block[0]:
+                block.pop(0)
+            while block and not block[-1]:
+                block.pop()
+            lines.extend(block)
+    return "\n".join(lines)
+
+
+def _skip_annotation(source: str, position: int) -> int:
+    # After the "@": name, optional .name parts and optional arguments
+    token = _next_token(source, position)
+    if token is None or token[0] != "ident":
+        return position
+    position = token[2]
+    while True:
+        token = _next_token(source, position)
+        if token is None or token[0] != "punct":
+            return position
+        char = source[token[1]]
+        if char == ".":
+            following = _next_token(source, token[2])
+            if following is None or following[0] != "ident":
+                return position
+            position = following[2]
+        elif char == "(":
+            return _skip_nested(source, token[2], closing=")")
+        else:
+            return position
+
+
+def _classify(words: List[str], function_name: Optional[str]) -> Tuple[Optional[str], str]:
+    """(kind, name) of a declaration from the identifiers of its header."""
+    for index, word in enumerate(words):
+        if word in _TYPE_KEYWORDS:
+            following = words[index + 1:]
+            if word == "mixin" and following[:1] == ["class"]:
+                word, following = "class", following[1:]
+            if word == "extension" and (not following or following[0] == "on"):
+                # Unnamed extension
+                return word, " ".join(["extension"] + following[:2])
+            return word, following[0] if following else ""
+        if word not in _MODIFIERS:
+            break
+    if function_name is not None:
+        return "function", function_name
+    if "get" in words:
+        return "function", words[-1]
+    return None, ""
+
+
+def scan_declarations(source: str) -> List[DartDeclaration]:
+    """
+    Find the top-level classes, mixins, enums, extensions and functions of `source`.
+
+    Args:
+        source: Dart source code
+
+    Returns:
+        The declarations in source order
+    """
+    declarations = []
+    docs: List[Token] = []
+    position = 0
+    # Line numbers are counted forward from the last declaration, so each newline is counted once
+    counted, line = 0, 1
+
+    while True:
+        token = _next_token(source, position)
+        if token is None:
+            break
+        kind, start, position = token
+        if kind in ("doc", "docblock"):
+            docs.append(token)
+            continue
+        if kind == "comment":
+            continue
+        if kind == "punct" and source[start] == "@":
+            position = _skip_annotation(source, position)
+            continue
+        if kind != "ident":
+            # Stray punctuation between declarations
+            docs = []
+            continue
+
+        # Read the header up to its body, a semicolon or an initializer
+        header_start, header_end = start, position
+        words = [source[start:position]]
+        candidate, function_name = words[0], None
+        depth = angle = 0
+        body = None
+        while body is None:
+            token = _next_token(source, position)
+            if token is None:
+                break
+            kind, start, position = token
+            if kind == "ident":
+                if not depth:
+                    words.append(source[start:position])
+                    if not angle:
+                        candidate = words[-1]
+            elif kind == "arrow":
+                if not depth:
+                    body = "=>"
+            elif kind == "punct":
+                char = source[start]
+                if char in "([":
+                    if char == "(" and not depth and function_name is None:
+                        # The name precedes the parameters (or the type parameters of a generic function)
+                        function_name = candidate
+                    depth += 1
+                elif char in ")]":
+                    depth -= 1
+                elif depth:
+                    pass
+                elif char in "{;=":
+                    body = char
+                elif char == "<":
+                    angle += 1
+                elif char == ">":
+                    angle -= 1
+            if body is None and kind not in ("comment", "doc", "docblock"):
+                header_end = position
+
+        if body is None or body == ";":
+            # Directive or declaration without a body
+            docs = []
+            continue
+        if body == "=":
+            # Variable, typedef or mixin application
+            position = _skip_nested(source, position, closing=";")
+            docs = []
+            continue
+
+        position = _skip_nested(source, position, closing="}" if body == "{" else ";")
+        declaration_kind, name = _classify(words, function_name)
+        if declaration_kind is not None:
+            line_from = line + source.count("\n", counted, header_start)
+            line_to = line_from + source.count("\n", header_start, position - 1)
+            counted, line = position - 1, line_to
+            declarations.append(DartDeclaration(
+                kind=declaration_kind,
+                name=name,
+                docstring=_docstring(source, docs),
+                start=header_start,
+                signature_end=header_end,
+                end=position,
+                line_from=line_from,
+                line_to=line_to,
+            ))
+        docs = []
+    return declarations
@@ -0,0 +1,188 @@
+"""
+Persistent content-addressed cache of embedding vectors.
+
+Vectors are keyed by (model id, content hash of the embedded text), so the
+same snippet is embedded once no matter how often it occurs in a codebase, in
+which checkout or branch it is indexed, or which tool indexes it. The cache is
+a SQLite database shared by all processes, pruned least-recently-used first
+once it grows past its size limit.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_FILE = os.environ.get("EMBEDDING_CACHE_FILE", os.path.join(DATA_DIR, "embedding_cache.sqlite"))
+# Pruned down to this many megabytes of vectors after every run
+EMBEDDING_CACHE_MAX_MB = int(os.environ.get("EMBEDDING_CACHE_MAX_MB", 2048))
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    lines = (text or "").replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def content_hash(model: str, structure: dict) -> str:
+    """Stable key of the text `model` embeds for `structure`, independent of its position."""
+    text = "\0".join([model, _normalize_text(structure.get("docstring")), _normalize_text(structure.get("snippet"))])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_id(model: str) -> str:
+    """
+    Cache namespace of `model` as providers create it by default: vectors of
+    the ONNX or int8-quantized backends differ slightly from eager float ones.
+    """
+    from code_search.model.onnx_backend import onnx_enabled
+    from code_search.model.quantize import quantization_enabled
+
+    backend = "onnx" if onnx_enabled() else "torch"
+    return f"{model}:{backend}:{'int8' if quantization_enabled() else 'float'}"
+
+
+class EmbeddingCache:
+    """SQLite-backed map of (model id, content hash) -> float32 vector."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Used from the pipeline's writer thread as well, so guard it with a lock
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS vectors ("
+                " model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL, PRIMARY KEY (model, digest))"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)")
+
+    def get_many(self, model: str, digests: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors of `digests` as read-only float32 arrays; hits are marked as recently used."""
+        digests = list(dict.fromkeys(digests))
+        found = {}
+        with self._lock, self._connection:
+            for start in range(0, len(digests), _LOOKUP_CHUNK):
+                chunk = digests[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT digest, vector FROM vectors WHERE model = ? AND digest IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype="<f4")
+                if rows:
+                    self._connection.execute(
+                        f"UPDATE vectors SET last_used = ? WHERE model = ? AND digest IN ({','.join('?' * len(rows))})",
+                        [time.time(), model, *[digest for digest, _ in rows]],
+                    )
+        return found
+
+    def put_many(self, model: str, entries: Iterable[Tuple[str, Sequence[float]]]):
+        now = time.time()
+        rows = [(model, digest, np.asarray(vector, dtype="<f4").tobytes(), now) for digest, vector in entries]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?)", rows)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors").fetchone()[0]
+
+    def prune(self, max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024) -> int:
+        """Drop least recently used vectors until the cache holds at most `max_bytes`."""
+        size = self.size_bytes()
+        if size <= max_bytes:
+            return 0
+        removed = 0
+        with self._lock, self._connection:
+            rows = self._connection.execute("SELECT model, digest, LENGTH(vector) FROM vectors ORDER BY last_used")
+            stale = []
+            for model, digest, length in rows:
+                if size <= max_bytes:
+                    break
+                stale.append((model, digest))
+                size -= length
+            self._connection.executemany("DELETE FROM vectors WHERE model = ? AND digest = ?", stale)
+            removed = len(stale)
+        logger.info(f"Pruned {removed} vectors from the embedding cache")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def embed_with_cache(
+    provider,
+    model: str,
+    items: Sequence[Tuple[object, dict]],
+    batch_size: int = 8,
+    on_batch: Optional[Callable[[List, List[list]], None]] = None,
+    cache: Optional[EmbeddingCache] = None,
+):
+    """
+    Embed `items` through the cache: identical texts are embedded once, and
+    texts cached by any earlier run are not embedded at all.
+
+    Args:
+        provider: An embeddings provider for `model`
+        model: Key of `AVAILABLE_MODELS`
+        items: (key, {"code": ..., "docstring": ...}) pairs
+        batch_size: Number of texts per model call
+        on_batch: Called with the keys and vectors of every finished batch
+        cache: Cache to use (defaults to the shared cache file, pruned afterwards;
+            callers passing their own cache prune it themselves)
+    """
+    from code_search.index.pipeline import run_pipeline
+
+    own_cache = cache is None
+    cache = cache or EmbeddingCache()
+    namespace = model_id(model)
+
+    keys_by_digest: Dict[str, list] = {}
+    texts_by_digest: Dict[str, dict] = {}
+    for key, text in items:
+        digest = content_hash(model, {"docstring": text.get("docstring"), "snippet": text.get("code")})
+        keys_by_digest.setdefault(digest, []).append(key)
+        texts_by_digest.setdefault(digest, text)
+
+    def emit(digests, vectors):
+        if on_batch:
+            keys, expanded = [], []
+            for digest, vector in zip(digests, vectors):
+                keys.extend(keys_by_digest[digest])
+                expanded.extend([vector] * len(keys_by_digest[digest]))
+            on_batch(keys, expanded)
+
+    try:
+        cached = cache.get_many(namespace, keys_by_digest)
+        if cached:
+            emit(list(cached), list(cached.values()))
+        logger.info(
+            f"Embedding cache: {len(cached)} hits, {len(keys_by_digest) - len(cached)} unique texts to embed "
+            f"({len(items)} items)"
+        )
+
+        def store(digests, vectors):
+            cache.put_many(namespace, zip(digests, vectors))
+            emit(digests, vectors)
+
+        pending = [(digest, text) for digest, text in texts_by_digest.items() if digest not in cached]
+        run_pipeline(provider, pending, batch_size, on_batch=store)
+        if own_cache:
+            cache.prune()
+    finally:
+        if own_cache:
+            cache.close()
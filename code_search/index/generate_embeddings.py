@@ -0,0 +1,309 @@
+"""
+Embedding generation over the extracted code structures.
+
+This is the shared core of `tools/generate_embeddings_with_model.py` and the
+embedding jobs run by the local service. Providers are imported lazily so that
+importing this module does not pull in torch.
+
+Vectors are reused by content: every structure is hashed from the model and
+its normalized docstring and snippet, and `{output}.hashes.json` maps the
+structure ids in the output to those hashes. Regeneration embeds only content
+whose hash has no vector yet, so shifted line numbers or unchanged code never
+cost a model call. Texts embedded by any earlier run, in any checkout, are
+taken from the shared embedding cache.
+
+Structures too long for the models are embedded as overlapping windows (see
+`code_search.index.chunking`); windows are stored like structures, under
+window ids.
+"""
+import os
+import json
+import time
+import logging
+import importlib
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+from code_search.index.checkpoint_log import CheckpointLog, replay
+from code_search.index.chunking import embedding_units
+from code_search.index.embedding_cache import EmbeddingCache, content_hash, model_id
+from code_search.index.pipeline import run_pipeline
+from code_search.index.storage import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+STRUCTURES_FILE = os.path.join(DATA_DIR, "structures.json")
+
+# Available models
+AVAILABLE_MODELS = {
+    "nomic": {
+        "name": "nomic-ai/nomic-embed-code",
+        "provider": "code_search.model.nomic_embed.NomicEmbeddingsProvider",
+        "default_output": "embeddings.json"
+    },
+    "qodo": {
+        "name": "Qodo/Qodo-Embed-1-1.5B",
+        "provider": "code_search.model.qodo_embed.QodoEmbeddingsProvider",
+        "default_output": "qodo_embeddings.json"
+    },
+    "jina": {
+        "name": "jinaai/jina-embeddings-v2-small-en",
+        "provider": "code_search.model.jina_embed.JinaEmbeddingsProvider",
+        "default_output": "jina_embeddings.json"
+    }
+}
+
+# Called with (processed, total) after every embedded structure
+ProgressCallback = Callable[[int, int], None]
+
+
+def get_provider_class(model: str):
+    """Import and return the provider class registered for `model`."""
+    module_name, class_name = AVAILABLE_MODELS[model]["provider"].rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_provider(model: str, use_gpu: bool = False):
+    device = "cuda" if use_gpu else "cpu"
+    return get_provider_class(model)(device=device)
+
+
+def hashes_file_for(output_file: str) -> str:
+    return f"{os.path.splitext(output_file)[0]}.hashes.json"
+
+
+def _output_stat(output_file: str) -> list:
+    stat = os.stat(output_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_hashes(hashes_file: str, output_file: str, model: str) -> Optional[dict]:
+    """The id -> hash mapping of `output_file`, if it was written for exactly that file."""
+    try:
+        with open(hashes_file, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if data.get("model") != model or data.get("output") != _output_stat(output_file):
+        logger.warning(f"{hashes_file} does not match {output_file}. Ignoring it.")
+        return None
+    return data["hashes"]
+
+
+def _load_processed(path: str, embeddings: dict, processed_ids: set) -> bool:
+    """Merge a (possibly partial) embeddings file into `embeddings`."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        return False
+
+    for file_path, file_embeddings in data.items():
+        # Check if file_embeddings is a dictionary
+        if isinstance(file_embeddings, dict):
+            if not isinstance(embeddings.get(file_path), dict):
+                embeddings[file_path] = {}
+            for struct_id, embedding in file_embeddings.items():
+                embeddings[file_path][struct_id] = embedding
+                processed_ids.add(struct_id)
+        # Handle the case where file_embeddings might be a list
+        elif isinstance(file_embeddings, list):
+            if not isinstance(embeddings.get(file_path), list):
+                embeddings[file_path] = []
+            for embedding in file_embeddings:
+                embeddings[file_path].append(embedding)
+                if isinstance(embedding, dict) and 'id' in embedding:
+                    processed_ids.add(embedding['id'])
+    return True
+
+
+def generate_embeddings(
+    model: str,
+    force: bool = False,
+    use_gpu: bool = False,
+    batch_size: Optional[int] = None,
+    checkpoint_interval: int = 10,
+    output: Optional[str] = None,
+    provider=None,
+    progress: Optional[ProgressCallback] = None,
+    workers: Union[int, str] = 1,
+    threads_per_worker: Optional[int] = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Generate embeddings for every structure in `structures.json`.
+
+    Args:
+        model: Key of `AVAILABLE_MODELS`
+        force: Regenerate all embeddings instead of reusing existing vectors
+        use_gpu: Use CUDA when a provider has to be created
+        batch_size: Batch size for embedding generation (defaults to the
+            size tuned for `model` on this machine, or 8)
+        checkpoint_interval: Make the checkpoint log durable after this many items
+        output: Output filename inside the data directory (defaults to the model-specific name)
+        provider: An already loaded provider for `model`, reused instead of loading a new one
+        progress: Optional callback receiving (processed, total)
+        workers: Number of worker processes embedding in parallel, or "auto"
+            to pick workers and threads per worker by measuring a sample.
+            Ignored when `provider` is given.
+        threads_per_worker: Torch threads of every worker (defaults to an even split of the cores)
+        use_cache: Reuse and fill the shared content-addressed embedding cache
+
+    Returns:
+        Path of the written embeddings file
+    """
+    model_config = AVAILABLE_MODELS[model]
+    output = output or model_config["default_output"]
+    output_file = os.path.join(DATA_DIR, output)
+    hashes_file = hashes_file_for(output_file)
+    checkpoint_file = os.path.join(DATA_DIR, f"{output}_checkpoint.log")
+    # Checkpoints of older versions, still honoured when resuming
+    legacy_checkpoint_file = os.path.join(DATA_DIR, f"{output}_checkpoint.json")
+
+    if not os.path.exists(STRUCTURES_FILE):
+        raise FileNotFoundError(f"{STRUCTURES_FILE} not found. Please generate code structures first.")
+
+    # Load the code structures (as a list) and split long ones into windows
+    with open(STRUCTURES_FILE, 'r') as f:
+        structures_list = json.load(f)
+    units = [unit for structure in structures_list for unit in embedding_units(structure)]
+    hashes = [content_hash(model, unit) for _, unit in units]
+
+    # Vectors that can be reused, keyed by content hash
+    known: Dict[str, list] = {}
+
+    if not force:
+        embeddings, processed_ids = {}, set()
+        if os.path.exists(output_file) and not _load_processed(output_file, embeddings, processed_ids):
+            logger.warning("Could not parse existing embeddings file. Starting fresh.")
+            embeddings = {}
+        existing_hashes = _load_hashes(hashes_file, output_file, model) if embeddings else None
+
+        if existing_hashes is not None:
+            for file_path, file_hashes in existing_hashes.items():
+                file_embeddings = embeddings.get(file_path)
+                for struct_id, digest in file_hashes.items():
+                    if isinstance(file_embeddings, dict) and struct_id in file_embeddings:
+                        known[digest] = file_embeddings[struct_id]
+        else:
+            # No content hashes yet: trust the ids, as older versions did
+            if os.path.exists(legacy_checkpoint_file) and not _load_processed(legacy_checkpoint_file, embeddings, processed_ids):
+                logger.warning("Could not parse checkpoint file. Ignoring it.")
+            for (unit_id, unit), digest in zip(units, hashes):
+                file_embeddings = embeddings.get(unit["file_path"])
+                if isinstance(file_embeddings, dict) and unit_id in file_embeddings:
+                    known[digest] = file_embeddings[unit_id]
+        logger.info(f"Reusing {len(known)} existing embeddings from {output_file}")
+
+    valid_length = 0
+    if os.path.exists(checkpoint_file) and not force:
+        records, valid_length = replay(checkpoint_file)
+        for _, digest, embedding in records:
+            known[digest] = embedding
+        logger.info(f"Replayed {len(records)} entries from checkpoint log {checkpoint_file}")
+
+    # Embed every new or changed text once, even if it occurs in several places
+    to_process = {}
+    for (_, unit), digest in zip(units, hashes):
+        if digest not in known and digest not in to_process:
+            to_process[digest] = unit
+    to_process = list(to_process.items())
+
+    cache = EmbeddingCache() if use_cache else None
+    if cache is not None and to_process:
+        cached = cache.get_many(model_id(model), [digest for digest, _ in to_process])
+        known.update(cached)
+        to_process = [(digest, structure) for digest, structure in to_process if digest not in cached]
+        logger.info(f"Took {len(cached)} embeddings from the embedding cache")
+
+    total_count = len(to_process)
+    logger.info(
+        f"Embedding {total_count} new or changed out of {len(units)} texts "
+        f"({len(structures_list)} code structures)..."
+    )
+    if progress:
+        progress(0, total_count)
+
+    # Sort by length so every batch holds texts of similar size and pads little.
+    # Character length is a cheap stand-in for the token count.
+    to_process.sort(key=lambda item: len(item[1].get("snippet") or "") + len(item[1].get("docstring") or ""))
+    if batch_size is None:
+        from code_search.index.tuning import tuned_batch_size
+
+        batch_size = tuned_batch_size(model, "cuda" if use_gpu else "cpu")
+    batch_size = max(1, batch_size)
+    parallel = provider is None and workers != 1 and total_count > 1
+    if to_process:
+        logger.info(f"Generating embeddings using {model_config['name']} model...")
+
+    checkpoint_counter = 0
+    processed_count = 0
+    start_time = time.time()
+
+    with CheckpointLog(checkpoint_file, valid_length) as checkpoint:
+        def store(digests, vectors):
+            nonlocal checkpoint_counter, processed_count
+            # Store each vector under its content hash, whatever the processing order
+            for digest, embedding in zip(digests, vectors):
+                known[digest] = embedding
+                checkpoint.append(pending_files[digest], digest, embedding)
+            if cache is not None:
+                cache.put_many(model_id(model), zip(digests, vectors))
+
+            processed_count += len(digests)
+            if progress:
+                progress(processed_count, total_count)
+
+            # Make the appended records durable periodically
+            checkpoint_counter += len(digests)
+            if checkpoint_counter >= checkpoint_interval:
+                checkpoint.sync()
+                checkpoint_counter = 0
+
+        pending_files = {digest: structure["file_path"] for digest, structure in to_process}
+        if parallel and workers == "auto":
+            from code_search.index.parallel_embeddings import autotune
+
+            workers, threads_per_worker = autotune(model, to_process, batch_size, use_gpu)
+
+        if parallel and int(workers) > 1:
+            from code_search.index.parallel_embeddings import embed_parallel
+
+            embed_parallel(model, to_process, int(workers), threads_per_worker, batch_size, use_gpu, on_batch=store)
+        elif to_process:
+            if provider is None:
+                provider = create_provider(model, use_gpu)
+            # Tokenization, the forward pass and storing the vectors overlap
+            items = [
+                (digest, {"code": structure.get("snippet"), "docstring": structure.get("docstring")})
+                for digest, structure in to_process
+            ]
+            run_pipeline(provider, items, batch_size, on_batch=store)
+
+        # Lay the vectors out by the current structure ids; vectors of deleted
+        # structures are dropped instead of being left as orphans
+        embeddings, id_hashes = {}, {}
+        for (unit_id, unit), digest in zip(units, hashes):
+            file_path = unit["file_path"]
+            vector = known[digest]
+            embeddings.setdefault(file_path, {})[unit_id] = vector.tolist() if isinstance(vector, np.ndarray) else vector
+            id_hashes.setdefault(file_path, {})[unit_id] = digest
+
+        # Compact the log into the output; replace it atomically so a running
+        # service never reads a partial file
+        write_json_atomic(output_file, embeddings)
+        write_json_atomic(hashes_file, {"model": model, "output": _output_stat(output_file), "hashes": id_hashes})
+        checkpoint.remove()
+
+    if cache is not None:
+        cache.prune()
+        cache.close()
+
+    # Remove checkpoint file of older versions if successful
+    if os.path.exists(legacy_checkpoint_file):
+        os.remove(legacy_checkpoint_file)
+
+    logger.info(f"Embeddings saved to {output_file} in {time.time() - start_time:.2f} seconds")
+    return output_file
@@ -0,0 +1,416 @@
+"""
+Code structure extraction for the local search index.
+
+This is the shared core of `tools/index_quran_simple.py` and the structure
+jobs run by the local service. It writes the list-format `structures.json`
+consumed by the local search and embedding generation. Python files are
+parsed with `ast`; other files go through the Dart scanner.
+
+Files are scanned by a pool of worker processes. Their structures come back
+in the order of the files and are streamed into the output, so neither the
+order nor the memory use depends on the number of workers. A manifest of the
+scanned files limits re-runs to the files that were added or changed.
+"""
+import os
+import sys
+import glob
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from code_search.config import DATA_DIR
+from code_search.index.dart_scanner import line_span, scan_declarations
+from code_search.index.python_structures import scan_python_declarations
+from code_search.index.storage import write_json_array_atomic, write_json_atomic
+from code_search.index.structure_manifest import (
+    EXTRACTOR_VERSION, StructureManifest, delta_file_for, file_digest, file_stat, manifest_file_for
+)
+
+logger = logging.getLogger(__name__)
+
+STRUCTURES_FILE = os.path.join(DATA_DIR, "structures.json")
+
+# Called with (processed_files, total_files) after every scanned file
+ProgressCallback = Callable[[int, int], None]
+
+# Worker processes scanning files (0 uses one per core)
+STRUCTURE_WORKERS = int(os.environ.get("STRUCTURE_WORKERS", 0))
+# Files scanned per task sent to a worker
+FILES_PER_TASK = 16
+# Tasks queued per worker; bounds the results held back to keep the file order
+TASKS_PER_WORKER = 4
+# Below this many files, starting the workers costs more than it saves
+MIN_PARALLEL_FILES = 2 * FILES_PER_TASK
+
+
+def find_source_files(target_dir: str, pattern: str = "**/*.dart") -> List[str]:
+    """Resolve `pattern` inside `target_dir` the same way the indexing tools always have."""
+    if not os.path.isdir(target_dir):
+        raise NotADirectoryError(f"Error processing '{target_dir}': Is not a directory")
+
+    # If the target is a directory without a pattern specified or a directory is specified directly
+    if pattern == "**/*.dart" and not target_dir.endswith(".dart"):
+        # Use all dart files in that directory and subdirectories
+        files = glob.glob(os.path.join(target_dir, "**/*.dart"), recursive=True)
+    elif pattern.startswith('**'):
+        # Already a recursive pattern
+        files = glob.glob(os.path.join(target_dir, pattern), recursive=True)
+    elif pattern.startswith('*'):
+        # For patterns like *.dart, we should only search in the immediate directory
+        # without recursing into subdirectories
+        files = glob.glob(os.path.join(target_dir, pattern), recursive=False)
+    else:
+        # For other patterns, assume it should be recursive but check both
+        files = glob.glob(os.path.join(target_dir, pattern), recursive=False)
+        if not files:  # If no files found, try with recursive
+            files = glob.glob(os.path.join(target_dir, f"**/{pattern}"), recursive=True)
+
+    # Skip directories that might have been caught by the glob pattern
+    return [f for f in files if not os.path.isdir(f)]
+
+
+def extract_file_structures(file_path: str, target_dir: str, max_lines: int = 0) -> List[dict]:
+    """
+    Extract class and function structures from a single source file.
+
+    Structures longer than `max_lines` are skipped; 0 keeps every structure
+    (long ones are embedded as windows).
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        code = f.read()
+    return extract_code_structures(code, file_path, target_dir, max_lines)
+
+
+# Extensions of the files read with the Python parser; everything else goes through the Dart scanner
+PYTHON_EXTENSIONS = (".py", ".pyi")
+
+
+def extract_code_structures(code: str, file_path: str, target_dir: str, max_lines: int = 0) -> List[dict]:
+    """Extract class and function structures from the already read `code` of `file_path`."""
+    relative_path = os.path.relpath(file_path, start=target_dir)
+
+    # Extract file parts
+    file_name = os.path.basename(file_path)
+    dir_path = os.path.dirname(file_path)
+    module = os.path.basename(dir_path) if dir_path else ""
+
+    if file_path.endswith(PYTHON_EXTENSIONS):
+        return _python_structures(code, file_path, relative_path, file_name, module, max_lines)
+
+    code_structures = []
+    for declaration in scan_declarations(code):
+        # Skip if code segment is too long
+        if max_lines and declaration.line_to - declaration.line_from + 1 > max_lines:
+            continue
+
+        code_structures.append({
+            "structure_type": "function" if declaration.kind == "function" else "class",
+            "name": declaration.name,
+            "signature": declaration.signature(code),
+            "docstring": declaration.docstring,
+            "module": module,
+            "file_path": relative_path,
+            "file_name": file_name,
+            "line": declaration.line_from,
+            "line_from": declaration.line_from,
+            "line_to": declaration.line_to,
+            "snippet": line_span(code, declaration.start, declaration.end),
+        })
+
+    return code_structures
+
+
+def _python_structures(code: str, file_path: str, relative_path: str, file_name: str, module: str,
+                       max_lines: int) -> List[dict]:
+    lines = code.split('\n')
+    code_structures = []
+    for declaration in scan_python_declarations(code, file_path):
+        # Skip if code segment is too long
+        if max_lines and declaration.line_to - declaration.line_from + 1 > max_lines:
+            continue
+
+        code_structures.append({
+            "structure_type": declaration.kind,
+            "name": declaration.name,
+            "signature": declaration.signature,
+            "docstring": declaration.docstring,
+            "decorators": declaration.decorators,
+            "parent": declaration.parent,
+            "module": module,
+            "file_path": relative_path,
+            "file_name": file_name,
+            "line": declaration.line_from,
+            "line_from": declaration.line_from,
+            "line_to": declaration.line_to,
+            "snippet": "\n".join(lines[declaration.line_from - 1:declaration.line_to]),
+        })
+
+    return code_structures
+
+
+# (file path, size, mtime_ns, content hash, structures, error) of one scanned file
+ScannedFile = Tuple[str, int, int, str, List[dict], Optional[str]]
+
+
+def _scan_file(file_path: str, target_dir: str, max_lines: int) -> ScannedFile:
+    try:
+        size, mtime_ns = file_stat(file_path)
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        # Decoded with the newline translation of reading in text mode
+        code = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        structures = extract_code_structures(code, file_path, target_dir, max_lines)
+        return file_path, size, mtime_ns, file_digest(data), structures, None
+    except Exception as e:
+        return file_path, 0, 0, "", [], str(e)
+
+
+def _scan_files(file_paths: Sequence[str], target_dir: str, max_lines: int) -> List[ScannedFile]:
+    """Scan every file of a task; runs in the worker processes."""
+    return [_scan_file(file_path, target_dir, max_lines) for file_path in file_paths]
+
+
+def _pool_context():
+    # The workers only read files, so forking them is safe where it's available; unlike
+    # spawned ones they start at once, without re-running the calling script and its imports
+    if sys.platform.startswith("linux"):
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def _resolve_workers(workers: Optional[int], total_files: int) -> int:
+    workers = workers if workers is not None else STRUCTURE_WORKERS
+    workers = workers or os.cpu_count() or 1
+    if total_files < MIN_PARALLEL_FILES:
+        return 1
+    if multiprocessing.current_process().daemon:
+        # Daemonic processes can't start child processes
+        logger.info("Scanning files in-process: daemonic processes can't start workers")
+        return 1
+    return max(1, min(workers, total_files // FILES_PER_TASK))
+
+
+def _iter_scanned_files(
+    source_files: Sequence[str],
+    target_dir: str,
+    max_lines: int,
+    workers: Optional[int],
+    progress: Optional[Callable[[], None]] = None,
+) -> Iterator[ScannedFile]:
+    """Scan `source_files` and yield the results in the given order, calling `progress` after every file."""
+    total_files = len(source_files)
+    tasks = [source_files[start:start + FILES_PER_TASK] for start in range(0, total_files, FILES_PER_TASK)]
+    workers = _resolve_workers(workers, total_files)
+
+    if workers == 1:
+        batches = (_scan_files(task, target_dir, max_lines) for task in tasks)
+        executor = None
+    else:
+        logger.info(f"Scanning {total_files} files with {workers} worker processes")
+        executor = ProcessPoolExecutor(workers, mp_context=_pool_context())
+
+        def ordered():
+            # A bounded window of tasks in flight, consumed in submission order
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_scan_files, task, target_dir, max_lines))
+                if len(pending) >= workers * TASKS_PER_WORKER:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+        batches = ordered()
+
+    try:
+        for batch in batches:
+            for scanned in batch:
+                if scanned[-1] is not None:
+                    logger.error(f"Error processing {scanned[0]}: {scanned[-1]}")
+                yield scanned
+                if progress:
+                    progress()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def iter_file_structures(
+    source_files: Sequence[str],
+    target_dir: str,
+    max_lines: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Iterator[dict]:
+    """
+    Yield the structures of `source_files`, file by file in the given order.
+
+    Args:
+        source_files: Files to scan, as returned by `find_source_files`
+        target_dir: Root directory the structure paths are relative to
+        max_lines: Structures longer than this are skipped (0 keeps all of them)
+        workers: Worker processes (default: STRUCTURE_WORKERS, or one per core);
+            1 scans in this process
+        progress: Optional callback receiving (processed_files, total_files)
+    """
+    total_files = len(source_files)
+    processed_files = 0
+    if progress:
+        progress(0, total_files)
+
+    def advance():
+        nonlocal processed_files
+        processed_files += 1
+        progress(processed_files, total_files)
+
+    for scanned in _iter_scanned_files(source_files, target_dir, max_lines, workers, advance if progress else None):
+        yield from scanned[4]
+
+
+def update_structures(
+    target_dir: str,
+    source_files: Sequence[str],
+    max_lines: int = 0,
+    output_file: str = STRUCTURES_FILE,
+    progress: Optional[ProgressCallback] = None,
+    workers: Optional[int] = None,
+    full: bool = False,
+) -> dict:
+    """
+    Bring `output_file` up to date with `source_files`, re-scanning only the
+    files that were added or changed since the last run.
+
+    The structures of every file are kept in a manifest next to `output_file`
+    (see `structure_manifest`). A file whose size and modification time are
+    unchanged isn't read at all; one whose content hash is unchanged keeps its
+    structures. The delta is returned and written next to `output_file`.
+
+    Args:
+        target_dir: Root directory of the codebase
+        source_files: Files to extract structures from
+        max_lines: Structures longer than this are skipped (0 keeps all of them)
+        output_file: Where to write the structures JSON
+        progress: Optional callback receiving (processed_files, total_files)
+        workers: Worker processes scanning the files (default: STRUCTURE_WORKERS, or one per core)
+        full: Forget the manifest and re-scan every file
+
+    Returns:
+        The delta: relative paths of the "added", "changed" and "removed" files,
+        the number of "unchanged" ones and of the "structures" written
+    """
+    total_files = len(source_files)
+    relative_paths = {file_path: os.path.relpath(file_path, start=target_dir) for file_path in source_files}
+    settings = {"target_dir": os.path.abspath(target_dir), "max_lines": max_lines, "version": EXTRACTOR_VERSION}
+
+    manifest = StructureManifest(manifest_file_for(output_file))
+    try:
+        if full or manifest.get_meta("settings") != settings:
+            manifest.reset(settings)
+        known = manifest.file_stats()
+
+        # Files with the size and modification time they had last time aren't read again
+        to_scan = []
+        for file_path in source_files:
+            entry = known.get(relative_paths[file_path])
+            try:
+                unchanged = entry is not None and file_stat(file_path) == entry[:2]
+            except OSError:
+                unchanged = False
+            if not unchanged:
+                to_scan.append(file_path)
+
+        processed_files = total_files - len(to_scan)
+        if progress:
+            progress(processed_files, total_files)
+
+        def advance():
+            nonlocal processed_files
+            processed_files += 1
+            progress(processed_files, total_files)
+
+        delta = {"added": [], "changed": [], "removed": [], "unchanged": total_files - len(to_scan)}
+        failed = set()
+        for file_path, size, mtime_ns, digest, structures, error in _iter_scanned_files(
+            to_scan, target_dir, max_lines, workers, advance if progress else None
+        ):
+            path = relative_paths[file_path]
+            if error is not None:
+                # Scanned again next time; until then the file contributes no structures
+                failed.add(path)
+                if path in known:
+                    manifest.remove([path])
+                    delta["changed"].append(path)
+            elif path not in known:
+                manifest.put(path, size, mtime_ns, digest, structures)
+                delta["added"].append(path)
+            elif digest == known[path][2]:
+                manifest.touch(path, size, mtime_ns)
+                delta["unchanged"] += 1
+            else:
+                manifest.put(path, size, mtime_ns, digest, structures)
+                delta["changed"].append(path)
+
+        current = set(relative_paths.values())
+        delta["removed"] = sorted(path for path in known if path not in current)
+        manifest.remove(delta["removed"])
+
+        changed = delta["added"] or delta["changed"] or delta["removed"]
+        output_stat = file_stat(output_file) if os.path.exists(output_file) else None
+        if changed or output_stat is None or manifest.get_meta("output") != list(output_stat):
+            def records():
+                for file_path in source_files:
+                    path = relative_paths[file_path]
+                    if path not in failed:
+                        yield from manifest.structures(path) or []
+
+            delta["structures"] = write_json_array_atomic(output_file, records())
+            manifest.set_meta("output", list(file_stat(output_file)))
+            manifest.set_meta("structures", delta["structures"])
+        else:
+            delta["structures"] = manifest.get_meta("structures")
+    finally:
+        manifest.close()
+
+    write_json_atomic(delta_file_for(output_file), delta)
+    logger.info(
+        f"Structures: {len(delta['added'])} files added, {len(delta['changed'])} changed, "
+        f"{len(delta['removed'])} removed, {delta['unchanged']} unchanged"
+    )
+    return delta
+
+
+def generate_structures(
+    target_dir: str,
+    pattern: str = "**/*.dart",
+    max_lines: int = 0,
+    output_file: str = STRUCTURES_FILE,
+    progress: Optional[ProgressCallback] = None,
+    workers: Optional[int] = None,
+    full: bool = False,
+) -> dict:
+    """
+    Extract code structures from every matching file and save them to `output_file`.
+
+    Only files added or changed since the previous run are scanned again (see
+    `update_structures`).
+
+    Args:
+        target_dir: Root directory of the codebase
+        pattern: Glob pattern of the files to process
+        max_lines: Structures longer than this are skipped (0 keeps all of them)
+        output_file: Where to write the structures JSON
+        progress: Optional callback receiving (processed_files, total_files)
+        workers: Worker processes scanning the files (default: STRUCTURE_WORKERS, or one per core)
+        full: Re-scan every file instead of only the added and changed ones
+
+    Returns:
+        The delta of the run, as returned by `update_structures`
+    """
+    source_files = find_source_files(target_dir, pattern)
+    logger.info(f"Found {len(source_files)} files to process with pattern: {pattern}")
+
+    delta = update_structures(target_dir, source_files, max_lines, output_file, progress, workers, full)
+
+    logger.info(f"Found {delta['structures']} code structures")
+    return delta
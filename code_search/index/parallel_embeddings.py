@@ -0,0 +1,199 @@
+"""
+Data-parallel embedding generation across several CPU worker processes.
+
+The pending structures are sharded across K spawned workers. Every worker pins
+its BLAS/torch thread pool to its share of the cores, loads its own provider
+and streams its vectors back to the coordinator, which merges them into the
+embeddings being generated. `autotune` measures a few K x threads splits on a
+sample and picks the one with the highest throughput.
+"""
+import os
+import time
+import queue
+import logging
+import traceback
+import multiprocessing
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between liveness checks of the workers while waiting for results
+POLL_INTERVAL = 1.0
+# Structures embedded per configuration while autotuning
+AUTOTUNE_SAMPLE_SIZE = 64
+
+# (content hashes, vectors) of one finished batch
+BatchCallback = Callable[[List[str], List[list]], None]
+
+
+def _pin_threads(threads: int):
+    # Must happen before torch (and its BLAS) is imported in the worker
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    os.environ["ONNX_INTRA_OP_THREADS"] = str(threads)
+
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already set by an earlier parallel section in this process
+        pass
+
+
+def _worker_main(worker_id: int, model: str, use_gpu: bool, threads: int, batch_size: int,
+                 shard: List[Tuple[str, dict]], results):
+    try:
+        _pin_threads(threads)
+        from code_search.index.generate_embeddings import create_provider
+        from code_search.index.pipeline import run_pipeline
+
+        load_start = time.time()
+        provider = create_provider(model, use_gpu)
+        load_seconds = time.time() - load_start
+
+        start = time.time()
+        items = [
+            (digest, {"code": structure.get("snippet"), "docstring": structure.get("docstring")})
+            for digest, structure in shard
+        ]
+        run_pipeline(provider, items, batch_size,
+                     on_batch=lambda digests, vectors: results.put(("batch", worker_id, digests, vectors)))
+        embed_seconds = time.time() - start
+
+        results.put(("done", worker_id, {
+            "worker": worker_id,
+            "threads": threads,
+            "items": len(shard),
+            "load_seconds": load_seconds,
+            "seconds": embed_seconds,
+            "items_per_second": len(shard) / embed_seconds if embed_seconds else None,
+        }))
+    except BaseException:
+        results.put(("error", worker_id, traceback.format_exc()))
+
+
+def embed_parallel(
+    model: str,
+    items: Sequence[Tuple[str, dict]],
+    workers: int,
+    threads_per_worker: Optional[int] = None,
+    batch_size: int = 8,
+    use_gpu: bool = False,
+    on_batch: Optional[BatchCallback] = None,
+) -> List[dict]:
+    """
+    Embed `items` with `workers` processes.
+
+    Args:
+        model: Key of `AVAILABLE_MODELS`
+        items: (content hash, structure) pairs, ideally sorted by length
+        workers: Number of worker processes
+        threads_per_worker: Torch/BLAS threads of every worker (defaults to an even split of the cores)
+        batch_size: Batch size of every worker
+        use_gpu: Use CUDA in the workers
+        on_batch: Called in the coordinator with the hashes and vectors of every finished batch
+
+    Returns:
+        Throughput statistics of every worker
+    """
+    workers = max(1, min(workers, len(items)))
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+    # Round-robin over the length-sorted items gives every shard the same mix of lengths
+    shards = [list(items[i::workers]) for i in range(workers)]
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker_main,
+            args=(worker_id, model, use_gpu, threads_per_worker, batch_size, shard, results),
+            name=f"embedding-worker-{worker_id}",
+            daemon=True,
+        )
+        for worker_id, shard in enumerate(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    stats = {}
+    try:
+        while len(stats) < workers:
+            try:
+                message = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                dead = [p.name for worker_id, p in enumerate(processes) if not p.is_alive() and worker_id not in stats]
+                if dead:
+                    raise RuntimeError(f"Embedding workers exited unexpectedly: {', '.join(dead)}")
+                continue
+
+            kind, worker_id, payload = message[0], message[1], message[2:]
+            if kind == "batch":
+                if on_batch:
+                    on_batch(*payload)
+            elif kind == "done":
+                stats[worker_id] = payload[0]
+            else:
+                raise RuntimeError(f"Embedding worker {worker_id} failed:\n{payload[0]}")
+    finally:
+        for process in processes:
+            if process.is_alive() and len(stats) < workers:
+                process.terminate()
+            process.join()
+
+    worker_stats = [stats[worker_id] for worker_id in sorted(stats)]
+    for stat in worker_stats:
+        logger.info(
+            f"Worker {stat['worker']}: {stat['items']} items in {stat['seconds']:.2f}s "
+            f"({stat['items_per_second'] or 0:.2f} items/s, {stat['threads']} threads, "
+            f"model load {stat['load_seconds']:.2f}s)"
+        )
+    return worker_stats
+
+
+def _candidate_splits(cpu_count: int) -> List[Tuple[int, int]]:
+    splits, workers = [], 1
+    while workers <= cpu_count:
+        splits.append((workers, cpu_count // workers))
+        workers *= 2
+    return splits
+
+
+def autotune(
+    model: str,
+    items: Sequence[Tuple[str, dict]],
+    batch_size: int = 8,
+    use_gpu: bool = False,
+    sample_size: int = AUTOTUNE_SAMPLE_SIZE,
+    cpu_count: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    Pick the workers x threads-per-worker split with the highest throughput.
+
+    Every candidate split (1, 2, 4, ... workers sharing all cores) embeds the
+    same sample of `items`; model loading is not counted.
+
+    Returns:
+        (workers, threads_per_worker)
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    # Take the sample evenly across the length-sorted items
+    step = max(1, len(items) // sample_size)
+    sample = list(items[::step])[:sample_size]
+
+    best, best_rate = (1, cpu_count), 0.0
+    for workers, threads in _candidate_splits(cpu_count):
+        if workers > len(sample):
+            break
+        stats = embed_parallel(model, sample, workers, threads, batch_size, use_gpu)
+        # The workers run concurrently, so the slowest one bounds the throughput
+        slowest = max(stat["seconds"] for stat in stats) or 1e-9
+        rate = len(sample) / slowest
+        logger.info(f"Autotune: {workers} workers x {threads} threads -> {rate:.2f} items/s")
+        if rate > best_rate:
+            best, best_rate = (workers, threads), rate
+
+    logger.info(f"Autotune: using {best[0]} workers x {best[1]} threads")
+    return best
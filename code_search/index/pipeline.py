@@ -0,0 +1,143 @@
+"""
+Staged producer/consumer pipeline for embedding many texts.
+
+Formatting, tokenization, the model forward pass and writing the results back
+run in their own threads, connected by bounded queues, so the model never
+waits for Python-side preprocessing or output handling. Fast tokenizers and
+torch/onnxruntime release the GIL while they work, which is what lets the
+stages overlap.
+
+Providers opt into the separate tokenization stage by implementing
+`tokenize_batch(texts)` and `embed_tokenized(features)`; for any other
+provider the forward stage calls `encode_documents(texts)` (or the older
+`embed_batch(texts)`). Vectors are handed on as the provider returns them,
+float32 matrices for the providers in this package.
+"""
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Batches buffered between two stages
+QUEUE_SIZE = 4
+# Seconds a blocked stage waits before checking whether the pipeline was aborted
+POLL_INTERVAL = 0.1
+
+# (keys, vectors as a float32 matrix or a list of vectors) of one finished batch
+BatchCallback = Callable[[List, Union[np.ndarray, List[list]]], None]
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+def run_pipeline(
+    provider,
+    items: Sequence[Tuple[object, dict]],
+    batch_size: int = 8,
+    on_batch: Optional[BatchCallback] = None,
+    queue_size: int = QUEUE_SIZE,
+):
+    """
+    Embed `items` with `provider`, overlapping every stage of the work.
+
+    Args:
+        provider: An embeddings provider
+        items: (key, {"code": ..., "docstring": ...}) pairs, ideally sorted by length
+        batch_size: Number of texts per model call
+        on_batch: Called in order with the keys and vectors of every finished batch
+        queue_size: Batches buffered between two stages
+    """
+    batch_size = max(1, batch_size)
+    staged = hasattr(provider, "tokenize_batch") and hasattr(provider, "embed_tokenized")
+    stop = threading.Event()
+    errors = []
+
+    def put(target: queue.Queue, value):
+        while True:
+            if stop.is_set():
+                raise _Aborted()
+            try:
+                target.put(value, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def get(source: queue.Queue):
+        while True:
+            if stop.is_set():
+                raise _Aborted()
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+    def stage(func, source: Optional[queue.Queue], target: Optional[queue.Queue]):
+        def run():
+            try:
+                if source is None:
+                    for value in func():
+                        put(target, value)
+                else:
+                    while True:
+                        value = get(source)
+                        if value is _DONE:
+                            break
+                        result = func(value)
+                        if target is not None:
+                            put(target, result)
+                if target is not None:
+                    put(target, _DONE)
+            except _Aborted:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        return run
+
+    def read():
+        for batch_start in range(0, len(items), batch_size):
+            batch = items[batch_start:batch_start + batch_size]
+            texts = [
+                {"code": text.get("code") or "", "docstring": text.get("docstring") or ""}
+                for _, text in batch
+            ]
+            yield [key for key, _ in batch], texts
+
+    def tokenize(value):
+        keys, texts = value
+        return keys, provider.tokenize_batch(texts) if staged else texts
+
+    def forward(value):
+        keys, inputs = value
+        if staged:
+            return keys, provider.embed_tokenized(inputs)
+        if hasattr(provider, "encode_documents"):
+            return keys, provider.encode_documents(inputs, batch_size=batch_size)
+        return keys, provider.embed_batch(inputs, batch_size=batch_size)
+
+    def write(value):
+        keys, vectors = value
+        if on_batch:
+            on_batch(keys, vectors)
+
+    texts_queue, inputs_queue, vectors_queue = (queue.Queue(maxsize=queue_size) for _ in range(3))
+    threads = [
+        threading.Thread(target=stage(read, None, texts_queue), name="embed-read", daemon=True),
+        threading.Thread(target=stage(tokenize, texts_queue, inputs_queue), name="embed-tokenize", daemon=True),
+        threading.Thread(target=stage(forward, inputs_queue, vectors_queue), name="embed-forward", daemon=True),
+        threading.Thread(target=stage(write, vectors_queue, None), name="embed-write", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,184 @@
+"""
+Corpus-trained PCA projections that shrink the stored embedding vectors.
+
+A projection is fitted offline on a model's own (normalized) embeddings and
+saved as `data/{model}_projection.npz`. When the local index is published,
+the vectors of that model are stored reduced, and queries are projected with
+the same matrix at search time.
+"""
+import os
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def projection_file(model: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f"{model}_projection.npz")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class Projection:
+    """A linear projection `((x - mean) @ components.T) * scale` to fewer dimensions."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, scale: np.ndarray, explained: float):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+        # Fraction of the corpus variance kept by the components
+        self.explained = float(explained)
+
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Project one vector or a matrix of vectors and normalize the result."""
+        projected = ((vectors - self.mean) @ self.components.T) * self.scale
+        return _normalize_rows(projected.astype(np.float32))
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components, scale=self.scale,
+                 explained=np.float32(self.explained))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], data["scale"], float(data["explained"]))
+
+
+def fit_projection(matrix: np.ndarray, dims: int, whiten: bool = False) -> Projection:
+    """
+    Fit a PCA projection on the rows of `matrix`.
+
+    Args:
+        matrix: (n, d) corpus embeddings, normalized
+        dims: Number of components to keep
+        whiten: Scale every component to unit variance
+
+    Returns:
+        The fitted projection
+    """
+    dims = min(dims, matrix.shape[1])
+    mean = matrix.mean(axis=0)
+    centered = matrix - mean
+    # Eigendecomposition of the d x d covariance is cheap compared to an SVD of the corpus
+    covariance = centered.T.astype(np.float64) @ centered / max(len(matrix) - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvalues = np.clip(eigenvalues[order], 0.0, None)
+    components = eigenvectors[:, order[:dims]].T
+
+    if whiten:
+        scale = 1.0 / np.sqrt(np.maximum(eigenvalues[:dims], 1e-12))
+    else:
+        scale = np.ones(dims)
+    total = eigenvalues.sum()
+    explained = eigenvalues[:dims].sum() / total if total > 0 else 1.0
+    return Projection(mean, components, scale, explained)
+
+
+def projection_recall(matrix: np.ndarray, projection: Projection, k: int = 10,
+                      sample: int = 200, seed: int = 42) -> float:
+    """
+    Recall@k of nearest-neighbour searches over projected vectors versus the full vectors.
+
+    Sampled corpus vectors are used as queries; every query's own row is excluded.
+    """
+    if len(matrix) < 2:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(matrix), size=min(sample, len(matrix)), replace=False)
+    reduced = projection.apply(matrix)
+    k = min(k, len(matrix) - 1)
+
+    hits = []
+    for query in queries:
+        full_scores = matrix @ matrix[query]
+        reduced_scores = reduced @ reduced[query]
+        full_scores[query] = reduced_scores[query] = -np.inf
+        full_top = set(np.argpartition(-full_scores, k - 1)[:k])
+        reduced_top = set(np.argpartition(-reduced_scores, k - 1)[:k])
+        hits.append(len(full_top & reduced_top) / k)
+    return float(np.mean(hits))
+
+
+def load_embedding_matrix(embeddings_file: str) -> np.ndarray:
+    """All vectors of an embeddings JSON file (or `.npy` matrix) as a normalized float32 matrix."""
+    if embeddings_file.endswith(".npy"):
+        matrix = np.load(embeddings_file, mmap_mode="r")
+        if not matrix.size:
+            raise ValueError(f"No embeddings found in {embeddings_file}")
+        return _normalize_rows(np.asarray(matrix, dtype=np.float32))
+    with open(embeddings_file, 'r') as f:
+        embeddings = json.load(f)
+    vectors = [
+        vector
+        for file_embeddings in embeddings.values() if isinstance(file_embeddings, dict)
+        for vector in file_embeddings.values()
+    ]
+    if not vectors:
+        raise ValueError(f"No embeddings found in {embeddings_file}")
+    return _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def fit_model_projection(
+    model: str,
+    embeddings_file: str,
+    dims: int = 256,
+    whiten: bool = False,
+    k: int = 10,
+    data_dir: str = DATA_DIR,
+    output: Optional[str] = None,
+) -> dict:
+    """
+    Fit and save the projection of one model's embeddings, and evaluate it.
+
+    Args:
+        model: Model key the local index uses for `embeddings_file`
+        embeddings_file: Embeddings JSON to fit on
+        dims: Number of dimensions to keep
+        whiten: Whiten the projected components
+        k: Cut-off of the recall evaluation
+        data_dir: Directory of the local index sources
+        output: Projection path (defaults to `data/{model}_projection.npz`)
+
+    Returns:
+        A report with the dimensions, variance retained and recall@k
+    """
+    matrix = load_embedding_matrix(embeddings_file)
+    projection = fit_projection(matrix, dims, whiten)
+    recall = projection_recall(matrix, projection, k)
+
+    output = output or projection_file(model, data_dir)
+    projection.save(output)
+    report = {
+        "model": model,
+        "input_dim": projection.input_dim,
+        "dim": projection.dim,
+        "vectors": len(matrix),
+        "variance_retained": projection.explained,
+        f"recall@{k}": recall,
+        "output": output,
+    }
+    logger.info(
+        f"{model}: projected {projection.input_dim} -> {projection.dim} dims, "
+        f"variance retained {projection.explained:.4f}, recall@{k} {recall:.4f}"
+    )
+    return report
@@ -0,0 +1,81 @@
+"""
+Structures of Python source, read from its syntax tree.
+
+The classes, functions and methods of a file come from `ast`, with the line
+span of each one (decorators included) taken from the node positions, so the
+snippets are exact. Functions nested in other functions are part of the
+snippet of the function around them and aren't reported on their own.
+"""
+import ast
+import copy
+from typing import List, NamedTuple, Optional, Union
+
+FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+
+class PythonDeclaration(NamedTuple):
+    """A class, function or method of a Python module."""
+
+    # "class", "function" or "method"
+    kind: str
+    name: str
+    signature: str
+    docstring: str
+    decorators: List[str]
+    # Dotted name of the enclosing class of a method or nested class
+    parent: Optional[str]
+    # First line of the declaration, including its decorators
+    line_from: int
+    line_to: int
+
+
+def _signature(node: Union[ast.ClassDef, FunctionNode]) -> str:
+    # The header as `ast.unparse` writes it, without decorators and body
+    header = copy.copy(node)
+    header.decorator_list = []
+    header.body = [ast.Pass()]
+    return ast.unparse(header).rsplit("\n", 1)[0].rstrip(":")
+
+
+def scan_python_declarations(source: str, filename: str = "<unknown>") -> List[PythonDeclaration]:
+    """
+    Find the classes, functions and methods of `source`.
+
+    Args:
+        source: Python source code
+        filename: Name reported in syntax errors
+
+    Returns:
+        The declarations in source order; a class comes before its methods
+
+    Raises:
+        SyntaxError: If `source` doesn't parse
+    """
+    declarations = []
+
+    def visit(nodes, parent: Optional[str]):
+        for node in nodes:
+            if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                # Look into blocks such as `if TYPE_CHECKING:` or `try:`; expressions hold no declarations
+                visit([child for child in ast.iter_child_nodes(node) if not isinstance(child, ast.expr)], parent)
+                continue
+            if isinstance(node, ast.ClassDef):
+                kind = "class"
+            else:
+                kind = "function" if parent is None else "method"
+            decorators = node.decorator_list
+            declarations.append(PythonDeclaration(
+                kind=kind,
+                name=node.name,
+                signature=_signature(node),
+                docstring=ast.get_docstring(node) or "",
+                decorators=[ast.unparse(decorator) for decorator in decorators],
+                parent=parent,
+                line_from=min([node.lineno] + [decorator.lineno for decorator in decorators]),
+                line_to=node.end_lineno,
+            ))
+            if kind == "class":
+                visit(node.body, node.name if parent is None else f"{parent}.{node.name}")
+
+    visit(ast.parse(source, filename=filename).body, None)
+    return declarations
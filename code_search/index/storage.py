@@ -0,0 +1,112 @@
+"""
+Helpers for writing index files that are read by a running service.
+"""
+import os
+import json
+import tempfile
+from typing import Iterable, Iterator
+
+# Characters read at a time when streaming a JSON array
+READ_CHUNK_SIZE = 1 << 16
+
+
+def write_json_atomic(path: str, data) -> None:
+    """
+    Write `data` as JSON to `path` without ever exposing a partially written file.
+
+    The JSON is written to a temporary file in the same directory, flushed to
+    disk and then renamed over `path`, so readers see either the old or the
+    new content.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_array_atomic(path: str, items: Iterable) -> int:
+    """
+    Write the elements of `items` as a JSON array to `path` one at a time, so
+    they never have to be held in memory together, replacing `path` atomically
+    like `write_json_atomic`.
+
+    Returns:
+        The number of elements written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    count = 0
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("[")
+            for item in items:
+                if count:
+                    f.write(", ")
+                json.dump(item, f)
+                count += 1
+            f.write("]")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def iter_json_array(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator:
+    """
+    Yield the elements of the JSON array in `path` one at a time, reading the
+    file in chunks instead of loading it whole.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer, position, eof = "", 0, False
+        started = False
+        while True:
+            # Skip whitespace and separators before the next element
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError(f"{path} does not contain a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                # A value running up to the end of the buffer (a number) may continue in the next chunk
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield value
+            position = end
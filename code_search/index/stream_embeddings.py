@@ -0,0 +1,153 @@
+"""
+Streaming, bounded-memory embedding generation.
+
+Structures are read incrementally from `structures.json` (or a JSONL file),
+embedded window by window and written straight into a binary float32 `.npy`
+matrix, with the (file_path, struct_id) of every row in a JSONL sidecar. Long
+structures are split into windows, with one row per window.
+Memory is bounded by the window size instead of the corpus size. The local
+index picks the binary output up in place of the JSON embeddings file.
+"""
+import os
+import json
+import logging
+from itertools import islice
+from typing import Iterator, Optional
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+from code_search.index.chunking import iter_embedding_units
+from code_search.index.embedding_cache import EmbeddingCache, embed_with_cache
+from code_search.index.pipeline import run_pipeline
+from code_search.index.generate_embeddings import (
+    AVAILABLE_MODELS, STRUCTURES_FILE, ProgressCallback, create_provider,
+)
+from code_search.index.storage import iter_json_array
+from code_search.index.tuning import tuned_batch_size
+
+logger = logging.getLogger(__name__)
+
+# Batches read, length-sorted and embedded together
+WINDOW_BATCHES = 64
+
+
+def iter_structures(path: str = STRUCTURES_FILE) -> Iterator[dict]:
+    """Yield the structures of a JSON array or JSONL file without loading it whole."""
+    if path.endswith(".jsonl"):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(path)
+
+
+def binary_output_paths(output_file: str):
+    """The (.npy matrix, .ids.jsonl rows) pair written for the embeddings file `output_file`."""
+    stem = os.path.splitext(output_file)[0]
+    return f"{stem}.npy", f"{stem}.ids.jsonl"
+
+
+def generate_embeddings_streaming(
+    model: str,
+    structures_file: str = STRUCTURES_FILE,
+    output: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    use_gpu: bool = False,
+    provider=None,
+    progress: Optional[ProgressCallback] = None,
+    window_batches: int = WINDOW_BATCHES,
+    use_cache: bool = True,
+) -> str:
+    """
+    Embed every structure of `structures_file` into a binary matrix.
+
+    Args:
+        model: Key of `AVAILABLE_MODELS`
+        structures_file: JSON array or JSONL file of structures
+        output: Embeddings filename inside the data directory (defaults to the
+            model-specific name); the `.npy` and `.ids.jsonl` files are named after it
+        batch_size: Batch size for embedding generation (defaults to the tuned size)
+        use_gpu: Use CUDA when a provider has to be created
+        provider: An already loaded provider for `model`
+        progress: Optional callback receiving (processed, total)
+        window_batches: Number of batches read and length-sorted together
+        use_cache: Reuse and fill the shared content-addressed embedding cache
+
+    Returns:
+        Path of the written `.npy` matrix
+    """
+    output_file = os.path.join(DATA_DIR, output or AVAILABLE_MODELS[model]["default_output"])
+    matrix_file, ids_file = binary_output_paths(output_file)
+    tmp_matrix_file, tmp_ids_file = f"{matrix_file}.tmp.npy", f"{ids_file}.tmp"
+
+    if not os.path.exists(structures_file):
+        raise FileNotFoundError(f"{structures_file} not found. Please generate code structures first.")
+
+    # A cheap first pass sizes the output matrix
+    total_count = sum(1 for _ in iter_embedding_units(iter_structures(structures_file)))
+    logger.info(f"Streaming {total_count} texts from {structures_file}...")
+    if progress:
+        progress(0, total_count)
+    if provider is None:
+        provider = create_provider(model, use_gpu)
+
+    if batch_size is None:
+        batch_size = tuned_batch_size(model, "cuda" if use_gpu else "cpu")
+    matrix = None
+    processed_count = 0
+    window_size = max(1, batch_size) * max(1, window_batches)
+    cache = EmbeddingCache() if use_cache else None
+
+    def write_rows(rows, vectors):
+        nonlocal matrix, processed_count
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                tmp_matrix_file, mode="w+", dtype=np.float32, shape=(total_count, len(vectors[0]))
+            )
+        matrix[np.asarray(rows)] = np.asarray(vectors, dtype=np.float32)
+        processed_count += len(rows)
+        if progress:
+            progress(processed_count, total_count)
+
+    try:
+        units = iter_embedding_units(iter_structures(structures_file))
+        row = 0
+        with open(tmp_ids_file, 'w') as ids:
+            while True:
+                window = list(islice(units, window_size))
+                if not window:
+                    break
+                items = []
+                for unit_id, unit in window:
+                    ids.write(json.dumps([unit["file_path"], unit_id]) + "\n")
+                    items.append((row, {"code": unit.get("snippet"), "docstring": unit.get("docstring")}))
+                    row += 1
+                # Sort within the window so batches pad little
+                items.sort(key=lambda item: len(item[1]["code"] or "") + len(item[1]["docstring"] or ""))
+                if cache is not None:
+                    embed_with_cache(provider, model, items, batch_size, on_batch=write_rows, cache=cache)
+                else:
+                    run_pipeline(provider, items, batch_size, on_batch=write_rows)
+                if matrix is not None:
+                    matrix.flush()
+
+        if matrix is None:
+            np.save(tmp_matrix_file, np.zeros((0, 0), dtype=np.float32))
+        else:
+            matrix.flush()
+            del matrix
+        os.replace(tmp_ids_file, ids_file)
+        os.replace(tmp_matrix_file, matrix_file)
+        if cache is not None:
+            cache.prune()
+    finally:
+        if cache is not None:
+            cache.close()
+        for path in (tmp_matrix_file, tmp_ids_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    logger.info(f"Embeddings saved to {matrix_file} ({total_count} rows)")
+    return matrix_file
@@ -0,0 +1,96 @@
+"""
+Manifest of the source files behind a structures file.
+
+For every scanned file the manifest keeps its size, modification time and
+content hash next to the structures extracted from it, in a SQLite database
+beside the structures file. Re-running the extraction only re-scans files whose
+size or modification time changed, keeps the records of files whose content
+turned out to be the same, and drops the structures of deleted files.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bump when the extractor changes what it produces, so existing manifests are rebuilt
+EXTRACTOR_VERSION = 3
+
+
+def manifest_file_for(output_file: str) -> str:
+    return f"{os.path.splitext(output_file)[0]}.manifest.sqlite"
+
+
+def delta_file_for(output_file: str) -> str:
+    return f"{os.path.splitext(output_file)[0]}.delta.json"
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_stat(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class StructureManifest:
+    """SQLite-backed map of relative file path -> (size, mtime, content hash, structures)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30)
+        with self._connection:
+            # Every scanned file is committed on its own; WAL keeps those commits cheap
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                " digest TEXT NOT NULL, structures TEXT NOT NULL)"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def get_meta(self, key: str):
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key: str, value):
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def reset(self, settings: dict):
+        """Forget every file and start over with `settings`."""
+        with self._connection:
+            self._connection.execute("DELETE FROM files")
+            self._connection.execute("DELETE FROM meta")
+            self._connection.execute("INSERT INTO meta VALUES ('settings', ?)", (json.dumps(settings),))
+
+    def file_stats(self) -> Dict[str, Tuple[int, int, str]]:
+        """(size, mtime_ns, digest) of every known file."""
+        rows = self._connection.execute("SELECT path, size, mtime_ns, digest FROM files")
+        return {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in rows}
+
+    def structures(self, path: str) -> Optional[List[dict]]:
+        row = self._connection.execute("SELECT structures FROM files WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, path: str, size: int, mtime_ns: int, digest: str, structures: List[dict]):
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, digest, json.dumps(structures)),
+            )
+
+    def touch(self, path: str, size: int, mtime_ns: int):
+        """Record the new stat of a file whose content didn't change."""
+        with self._connection:
+            self._connection.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+
+    def remove(self, paths: Iterable[str]):
+        with self._connection:
+            self._connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,253 @@
+"""
+Per-machine batch size and thread tuning for the embedding models.
+
+`tune` probes a loaded provider on the current machine: it doubles the batch
+size while throughput keeps improving and the projected peak RSS stays under a
+memory ceiling, then tries the thread counts for that batch size and for
+single-query latency. Thread counts are those of the process-wide torch pool,
+or of the provider's own session for the ONNX backend. The best configuration
+is stored per (host, model, backend, device) in `data/tuning.json`; embedding
+jobs and query encoding pick it up through `get_tuned_config`.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import resource
+import threading
+from typing import List, Optional
+
+from code_search.config import DATA_DIR
+from code_search.index.storage import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+TUNING_FILE = os.environ.get("EMBEDDING_TUNING_FILE", os.path.join(DATA_DIR, "tuning.json"))
+# Fraction of the physical memory the probes may use
+MEMORY_FRACTION = float(os.environ.get("EMBEDDING_TUNING_MEMORY_FRACTION", 0.8))
+MAX_BATCH_SIZE = 256
+# Stop growing the batch once throughput improves by less than this factor
+MIN_SPEEDUP = 1.05
+# Used when a model has not been tuned on this machine
+DEFAULT_BATCH_SIZE = 8
+
+_SAMPLE_QUERIES = [
+    "fetch surah list from api",
+    "parse json response",
+    "play audio recitation",
+    "save bookmark to local storage",
+    "handle network error",
+]
+
+_lock = threading.Lock()
+
+
+def host_key() -> str:
+    return f"{socket.gethostname()}:{os.cpu_count() or 1}cpu"
+
+
+def _config_key(model: str, device: str) -> str:
+    from code_search.model.onnx_backend import onnx_enabled
+    from code_search.model.quantize import quantization_enabled
+
+    # Providers only use ONNX Runtime on the CPU
+    backend = "onnx" if onnx_enabled() and device == "cpu" else "torch"
+    return f"{model}:{backend}:{'int8' if quantization_enabled() else 'float'}:{device}"
+
+
+def _load(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def get_tuned_config(model: str, device: str = "cpu", path: str = TUNING_FILE) -> Optional[dict]:
+    """Configuration stored by `tune` for `model` on this host, if any."""
+    return _load(path).get(host_key(), {}).get(_config_key(model, device))
+
+
+def tuned_batch_size(model: str, device: str = "cpu") -> int:
+    config = get_tuned_config(model, device)
+    return config["batch_size"] if config else DEFAULT_BATCH_SIZE
+
+
+def _onnx_encoder(provider):
+    from code_search.model.onnx_backend import OnnxEncoder
+
+    model = getattr(provider, "model", None)
+    return model if isinstance(model, OnnxEncoder) else None
+
+
+def uses_process_threads(provider) -> bool:
+    """Whether `provider` runs on the torch thread pool, which every model in the process shares."""
+    return _onnx_encoder(provider) is None
+
+
+def apply_threads(threads: Optional[int], provider=None):
+    """
+    Set the intra-op thread count of `provider`'s own ONNX session or, for any
+    other provider (or none), of the process-wide torch pool.
+    """
+    if not threads:
+        return
+    encoder = _onnx_encoder(provider) if provider is not None else None
+    if encoder is not None:
+        encoder.set_threads(threads)
+    else:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def save_tuned_config(model: str, config: dict, device: str = "cpu", path: str = TUNING_FILE):
+    with _lock:
+        data = _load(path)
+        data.setdefault(host_key(), {})[_config_key(model, device)] = config
+        write_json_atomic(path, data)
+
+
+def memory_ceiling_mb() -> float:
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return float("inf")
+    return total * MEMORY_FRACTION / (1024 * 1024)
+
+
+def sample_texts(structures_file: str, count: int = 64) -> List[dict]:
+    """Up to `count` texts spread evenly over the structures in `structures_file`."""
+    with open(structures_file, 'r') as f:
+        structures = json.load(f)
+    step = max(1, len(structures) // count)
+    return [
+        {"code": s.get("snippet") or "", "docstring": s.get("docstring") or ""}
+        for s in structures[::step][:count]
+    ]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _throughput(provider, texts: List[dict], batch_size: int) -> float:
+    encode = getattr(provider, "encode_documents", None) or provider.embed_batch
+    # One untimed batch absorbs allocations for the new shape
+    encode(texts[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    for batch_start in range(0, len(texts), batch_size):
+        encode(texts[batch_start:batch_start + batch_size], batch_size=batch_size)
+    return len(texts) / max(time.perf_counter() - start, 1e-9)
+
+
+def _query_latency(provider, repeats: int = 3) -> float:
+    if hasattr(provider, "encode_queries"):
+        embed = lambda q: provider.encode_queries([q], batch_size=1)
+    elif hasattr(provider, "embed_query"):
+        embed = provider.embed_query
+    else:
+        embed = lambda q: provider.embed_code(docstring=q)
+    embed(_SAMPLE_QUERIES[0])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for query in _SAMPLE_QUERIES:
+            embed(query)
+    return (time.perf_counter() - start) / (repeats * len(_SAMPLE_QUERIES))
+
+
+def _thread_candidates(cpu_count: int) -> List[int]:
+    threads, candidates = 1, []
+    while threads < cpu_count:
+        candidates.append(threads)
+        threads *= 2
+    return candidates + [cpu_count]
+
+
+def tune(
+    model: str,
+    provider,
+    texts: List[dict],
+    device: str = "cpu",
+    max_batch_size: int = MAX_BATCH_SIZE,
+    memory_ceiling: Optional[float] = None,
+    save: bool = True,
+) -> dict:
+    """
+    Find the fastest batch size and thread counts of `provider` on this machine.
+
+    Args:
+        model: Key of `AVAILABLE_MODELS`
+        provider: A loaded provider for `model`
+        texts: Sample of {"code": ..., "docstring": ...} texts to embed
+        device: Device the provider runs on
+        max_batch_size: Largest batch size to probe
+        memory_ceiling: Peak RSS in MB the probes must stay under (defaults to
+            EMBEDDING_TUNING_MEMORY_FRACTION of the physical memory)
+        save: Store the result in the tuning file
+
+    Returns:
+        {"batch_size", "threads", "query_threads", "items_per_second", ...}
+    """
+    if not texts:
+        raise ValueError("Tuning needs at least one sample text")
+    memory_ceiling = memory_ceiling or memory_ceiling_mb()
+    cpu_count = os.cpu_count() or 1
+    apply_threads(cpu_count, provider)
+
+    base_rss = _peak_rss_mb()
+    best_batch, best_rate, peak_rss = 1, 0.0, base_rss
+    batch_size = 1
+    while batch_size <= max_batch_size:
+        # Peak memory grows roughly linearly with the batch size
+        per_item = (peak_rss - base_rss) / best_batch if best_rate else 0.0
+        if base_rss + per_item * batch_size > memory_ceiling:
+            logger.info(f"Tuning {model}: batch size {batch_size} would exceed {memory_ceiling:.0f} MB")
+            break
+        # Repeat the sample so every probe runs several batches
+        sample = (texts * (2 * batch_size // len(texts) + 1))[:max(len(texts), 2 * batch_size)]
+        rate = _throughput(provider, sample, batch_size)
+        peak_rss = _peak_rss_mb()
+        logger.info(f"Tuning {model}: batch size {batch_size} -> {rate:.2f} items/s, peak RSS {peak_rss:.0f} MB")
+        if rate < best_rate * MIN_SPEEDUP:
+            if rate > best_rate:
+                best_batch, best_rate = batch_size, rate
+            break
+        best_batch, best_rate = batch_size, rate
+        batch_size *= 2
+
+    best_threads, best_thread_rate = cpu_count, best_rate
+    best_query_threads, best_latency = cpu_count, _query_latency(provider)
+    for threads in _thread_candidates(cpu_count)[:-1]:
+        apply_threads(threads, provider)
+        rate = _throughput(provider, texts, best_batch)
+        latency = _query_latency(provider)
+        logger.info(f"Tuning {model}: {threads} threads -> {rate:.2f} items/s, query {latency * 1000:.1f} ms")
+        if rate > best_thread_rate:
+            best_threads, best_thread_rate = threads, rate
+        if latency < best_latency:
+            best_query_threads, best_latency = threads, latency
+    apply_threads(cpu_count, provider)
+
+    config = {
+        "backend": "torch" if uses_process_threads(provider) else "onnx",
+        "batch_size": best_batch,
+        "threads": best_threads,
+        "query_threads": best_query_threads,
+        "items_per_second": best_thread_rate,
+        "query_latency_ms": best_latency * 1000,
+        "peak_rss_mb": peak_rss,
+        "memory_ceiling_mb": memory_ceiling,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    logger.info(
+        f"Tuned {model}: batch size {best_batch}, {best_threads} threads for indexing, "
+        f"{best_query_threads} threads for queries"
+    )
+    if save:
+        save_tuned_config(model, config, device)
+    return config
@@ -16,6 +16,11 @@ code_keys = [
     "name",
 ]
 
+# Snippets per model call
+ENCODE_BATCH_SIZE = 32
+# Snippets per progress step; the encoder sorts each chunk by length before batching it
+ENCODE_CHUNK_SIZE = 1024
+
 
 def encode_and_upload():
     client = qdrant_client.QdrantClient(
@@ -36,11 +41,11 @@ def encode_and_upload():
 
     if output_file.exists():
         print(f"File {output_file} already exists. Skipping encoding.")
-        embeddings = np.load(str(output_file)).tolist()
+        embeddings = np.load(str(output_file))
     else:
         print(f"Preparing the output for {output_file}")
 
-        embeddings = []
+        texts = []
         with open(input_file, "r") as fp:
             for line in tqdm(fp):
                 line_dict = json.loads(line)
@@ -55,10 +60,15 @@ def encode_and_upload():
                 if body is None or len(body) == 0:
                     continue
 
-                embedding = encoder.embed_code(body, docstring)
-                embeddings.append(embedding)
+                texts.append({"code": body, "docstring": docstring})
+
+        # Snippets are encoded in padded batches instead of one model call each
+        embeddings = np.concatenate([
+            encoder.encode_documents(texts[start:start + ENCODE_CHUNK_SIZE], batch_size=ENCODE_BATCH_SIZE)
+            for start in tqdm(range(0, len(texts), ENCODE_CHUNK_SIZE), unit="chunk")
+        ]) if texts else np.zeros((0, 0), dtype=np.float32)
 
-        np.save(str(output_file), np.array(embeddings))
+        np.save(str(output_file), embeddings)
 
     payloads = []
     with open(input_file, "r") as fp:
@@ -0,0 +1,342 @@
+"""
+Background indexing jobs for the local service.
+
+Jobs run in a single long-lived worker process, so torch and the embedding
+models are imported and loaded once and stay warm between jobs. The worker
+reports structured progress events over a multiprocessing queue; the service
+keeps the latest state per job kind and fans events out to SSE subscribers.
+"""
+import os
+import glob
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+import multiprocessing
+from dataclasses import dataclass, asdict, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_JOB = "embeddings"
+STRUCTURES_JOB = "structures"
+JOB_KINDS = (EMBEDDINGS_JOB, STRUCTURES_JOB)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Minimum seconds between two progress events sent by the worker
+PROGRESS_INTERVAL = 0.25
+# Seconds between SSE keep-alive comments
+SSE_KEEPALIVE = 15.0
+
+
+@dataclass
+class JobProgress:
+    """Progress of a single indexing job, as sent over the event channel."""
+    kind: str
+    status: str = "idle"  # idle, running, completed, failed
+    message: str = ""
+    processed: int = 0
+    total: int = 0
+    items_per_second: float = 0.0
+    eta_seconds: Optional[float] = None
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def progress(self) -> int:
+        if self.status == "completed":
+            return 100
+        if not self.total:
+            return 0
+        # Never report 100% before the job has actually finished
+        return min(99, int(self.processed * 100 / self.total))
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["progress"] = self.progress
+        return data
+
+
+class _ProgressReporter:
+    """Worker-side helper that turns (processed, total) callbacks into throttled events."""
+
+    def __init__(self, events, kind: str, params: dict):
+        self.events = events
+        self.state = JobProgress(kind=kind, status="running", start_time=time.time(), params=params)
+        self._last_sent = 0.0
+
+    def send(self):
+        self._last_sent = time.time()
+        self.events.put(asdict(self.state))
+
+    def message(self, message: str):
+        self.state.message = message
+        self.send()
+
+    def __call__(self, processed: int, total: int):
+        now = time.time()
+        elapsed = now - self.state.start_time
+        self.state.processed = processed
+        self.state.total = total
+        self.state.items_per_second = processed / elapsed if elapsed > 0 else 0.0
+        if self.state.items_per_second > 0:
+            self.state.eta_seconds = (total - processed) / self.state.items_per_second
+        if processed == total or now - self._last_sent >= PROGRESS_INTERVAL:
+            self.state.message = f"Processed {processed}/{total}"
+            self.send()
+
+    def finish(self, status: str, message: str):
+        self.state.status = status
+        self.state.message = message
+        self.state.end_time = time.time()
+        self.state.eta_seconds = 0.0 if status == "completed" else None
+        self.send()
+
+
+def _run_embeddings(params: dict, reporter: _ProgressReporter, providers: dict) -> str:
+    from code_search.index.generate_embeddings import create_provider, generate_embeddings
+    from code_search.index.tuning import apply_threads, get_tuned_config
+
+    model, use_gpu = params["model"], params.get("use_gpu", False)
+    key = (model, use_gpu)
+    if key not in providers:
+        # Keep a single warm model; drop the previous one before loading another
+        providers.clear()
+        reporter.message(f"Loading {model} model...")
+        providers[key] = create_provider(model, use_gpu)
+    tuned = get_tuned_config(model, "cuda" if use_gpu else "cpu")
+    if tuned:
+        apply_threads(tuned["threads"], providers[key])
+
+    reporter.message(f"Starting embedding generation with {model} model...")
+    output_file = generate_embeddings(
+        model=model,
+        force=params.get("force", False),
+        use_gpu=use_gpu,
+        batch_size=params.get("batch_size"),
+        provider=providers[key],
+        progress=reporter,
+    )
+    return f"Embedding generation completed successfully. Saved to {os.path.basename(output_file)}."
+
+
+def _run_structures(params: dict, reporter: _ProgressReporter, providers: dict) -> str:
+    from code_search.index.generate_structures import generate_structures
+
+    target_dir = params["target_dir"].strip().rstrip('/')
+    pattern = params.get("pattern", "**/*.py").strip()
+
+    # Verify directory exists before proceeding
+    if not os.path.isdir(target_dir):
+        raise NotADirectoryError(f"Target directory does not exist or is not a directory: '{target_dir}'")
+
+    # Use the appropriate default pattern based on likely files in the target directory
+    if pattern in ("**/*.py", "**/*.dart"):
+        # Check if this is a Flutter project by seeing if any .dart files exist
+        if glob.glob(os.path.join(target_dir, "**/*.dart"), recursive=True):
+            pattern = "**/*.dart"
+        else:
+            pattern = "**/*.py"
+
+    reporter.message(f"Starting code structure generation for '{target_dir}' with pattern '{pattern}'...")
+    # Without force only the files added or changed since the last run are scanned
+    delta = generate_structures(
+        target_dir,
+        pattern=pattern,
+        max_lines=params.get("max_lines", 0),
+        progress=reporter,
+        full=params.get("force", False),
+    )
+    return (
+        f"Structure generation completed successfully. Found {delta['structures']} code structures "
+        f"({len(delta['added'])} files added, {len(delta['changed'])} changed, {len(delta['removed'])} removed)."
+    )
+
+
+_JOB_HANDLERS = {
+    EMBEDDINGS_JOB: _run_embeddings,
+    STRUCTURES_JOB: _run_structures,
+}
+
+
+def _worker_main(tasks, events):
+    """Entry point of the job worker process."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    providers = {}
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        kind, params = task
+        reporter = _ProgressReporter(events, kind, params)
+        reporter.message("Initializing...")
+        try:
+            message = _JOB_HANDLERS[kind](params, reporter, providers)
+            reporter.finish("completed", message)
+        except Exception as e:
+            logger.exception(f"Error in {kind} job")
+            reporter.finish("failed", f"Failed: {e}")
+
+
+class JobRunner:
+    """
+    Runs indexing jobs in a managed worker process and tracks their progress.
+
+    At most one job per kind is accepted at a time. Jobs are executed
+    sequentially by the worker, which is started on the first submission and
+    restarted if it dies.
+    """
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = None
+        self._events = None
+        self._process = None
+        self._listener = None
+        self._lock = threading.RLock()
+        self._states = {kind: JobProgress(kind=kind) for kind in JOB_KINDS}
+        self._subscribers: Dict[str, List[tuple]] = {kind: [] for kind in JOB_KINDS}
+        self._callbacks: Dict[str, List[Callable[[JobProgress], None]]] = {kind: [] for kind in JOB_KINDS}
+
+    def _ensure_worker(self) -> list:
+        """Start the worker if it isn't running; returns the notifications of the jobs it failed."""
+        failed = []
+        if self._process is not None:
+            if self._process.is_alive():
+                return failed
+            failed = self._fail_running(f"Job worker exited unexpectedly (exit code {self._process.exitcode})")
+        self._tasks = self._ctx.Queue()
+        self._events = self._ctx.Queue()
+        # Not daemonic: structure jobs start their own pool of scanning processes, which
+        # daemonic processes can't do. shutdown() stops the worker instead.
+        self._process = self._ctx.Process(
+            target=_worker_main, args=(self._tasks, self._events), name="indexing-jobs", daemon=False
+        )
+        self._process.start()
+        logger.info(f"Started indexing job worker (pid {self._process.pid})")
+
+        self._listener = threading.Thread(
+            target=self._listen, args=(self._process, self._events), name="indexing-job-events", daemon=True
+        )
+        self._listener.start()
+        return failed
+
+    def _listen(self, process, events):
+        while True:
+            try:
+                data = events.get(timeout=1.0)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                with self._lock:
+                    failed = []
+                    if process is self._process:
+                        failed = self._fail_running(f"Job worker exited unexpectedly (exit code {process.exitcode})")
+                # Callbacks run outside the lock
+                for notification in failed:
+                    self._notify(*notification)
+                return
+            except (EOFError, OSError):
+                return
+            self._publish(JobProgress(**data))
+
+    def _fail_running(self, message: str) -> list:
+        """
+        Mark the running jobs as failed. Called with the lock held; the returned
+        notifications are passed to `_notify` once it's released.
+        """
+        failed = []
+        for kind, state in list(self._states.items()):
+            if state.status == "running":
+                failed_state = JobProgress(**asdict(state))
+                failed_state.status = "failed"
+                failed_state.message = message
+                failed_state.end_time = time.time()
+                failed.append(self._record(failed_state))
+        return failed
+
+    def _record(self, state: JobProgress) -> tuple:
+        # Called with the lock held
+        self._states[state.kind] = state
+        subscribers = list(self._subscribers[state.kind])
+        callbacks = list(self._callbacks[state.kind]) if state.status in TERMINAL_STATUSES else []
+        return state, subscribers, callbacks
+
+    def _publish(self, state: JobProgress):
+        with self._lock:
+            notification = self._record(state)
+        self._notify(*notification)
+
+    def _notify(self, state: JobProgress, subscribers: list, callbacks: list):
+        payload = state.to_dict()
+        for loop, subscriber in subscribers:
+            loop.call_soon_threadsafe(subscriber.put_nowait, payload)
+
+        for callback in callbacks:
+            try:
+                callback(state)
+            except Exception:
+                logger.exception(f"Error in {state.kind} job callback")
+
+    def on_finished(self, kind: str, callback: Callable[[JobProgress], None]):
+        """Register a callback invoked when a job of `kind` completes or fails."""
+        self._callbacks[kind].append(callback)
+
+    def submit(self, kind: str, **params) -> bool:
+        """Queue a job; returns False if a job of this kind is already running."""
+        with self._lock:
+            if self._states[kind].status == "running":
+                return False
+            failed = self._ensure_worker()
+            self._states[kind] = JobProgress(
+                kind=kind, status="running", message="Queued...", start_time=time.time(), params=params
+            )
+            self._tasks.put((kind, params))
+        for notification in failed:
+            self._notify(*notification)
+        return True
+
+    def status(self, kind: str) -> dict:
+        with self._lock:
+            return self._states[kind].to_dict()
+
+    async def events(self, kind: str) -> AsyncIterator[str]:
+        """Server-sent events stream of progress updates for jobs of `kind`."""
+        loop = asyncio.get_running_loop()
+        subscriber = asyncio.Queue()
+        entry = (loop, subscriber)
+        with self._lock:
+            self._subscribers[kind].append(entry)
+            current = self._states[kind].to_dict()
+
+        try:
+            yield f"data: {json.dumps(current)}\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscriber.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(payload)}\n\n"
+        finally:
+            with self._lock:
+                self._subscribers[kind].remove(entry)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the worker, waiting up to `timeout` seconds for its current job before terminating it."""
+        with self._lock:
+            process, self._process = self._process, None
+        if process is None:
+            return
+        if process.is_alive():
+            self._tasks.put(None)
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        process.join()
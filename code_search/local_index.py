@@ -0,0 +1,722 @@
+"""
+In-memory index generations for the local search service.
+
+An `IndexGeneration` is an immutable snapshot of `structures.json` and every
+`*embeddings.json` file (or the `*embeddings.npy` matrix written by streaming
+generation), with each model's vectors packed into a normalized
+float32 matrix aligned to the structure records. The `IndexManager` serves one
+generation at a time: new generations are loaded, validated and warmed in the
+background and then swapped in atomically, while the previous generation stays
+alive until the requests that acquired it have finished.
+
+Generations are published to `data/index/` as `.npy` matrices next to a
+snapshot of the structure records (a JSON-lines file with an offset table),
+and `data/index/CURRENT` names the generation to serve. Every process
+memory-maps the published files read-only, so uvicorn workers share a single
+physical copy of the vectors and records through the page cache, and a
+generation published by any worker is picked up by all of them. Records are
+only parsed when a result is formatted or a text search hits them.
+
+Models listed in `TRUNCATED_SEARCH` additionally get a contiguous matrix of
+the normalized leading dimensions of every vector. Searches scan that small
+prefix matrix first and rescore only the best candidates with the full vectors.
+Models with a fitted PCA projection (`data/{model}_projection.npz`) are stored
+reduced, and their queries are projected before scoring.
+
+Long structures are embedded as several windows. Window vectors are rows of
+the same matrix, pointing at their structure's record; searches aggregate the
+window scores of a structure with `CHUNK_AGGREGATE` ("max" or "sum").
+"""
+import os
+import re
+import glob
+import json
+import mmap
+import time
+import fcntl
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+from code_search.index.chunking import parent_id
+from code_search.index.projection import Projection, projection_file
+from code_search.index.storage import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Model whose embeddings are used when the requested model has none,
+# followed by the legacy `embeddings.json`
+FALLBACK_MODELS = ("qodo", "default")
+
+INDEX_DIRNAME = "index"
+CURRENT_FILENAME = "CURRENT"
+MANIFEST_FILENAME = "manifest.json"
+RECORDS_FILENAME = "records.jsonl"
+RECORD_OFFSETS_FILENAME = "records.offsets.npy"
+# Bump when the layout of a published generation changes, so older ones are rebuilt
+INDEX_FORMAT = 2
+# Published generations kept on disk besides the current one
+KEEP_GENERATIONS = 1
+# Seconds between checks for a generation published by another process
+REFRESH_INTERVAL = 1.0
+
+# Two-stage search settings per model: scan the first `dims` dimensions, then
+# rescore `limit * oversample` candidates with the full vectors. The legacy
+# embeddings.json is what the nomic generator writes by default.
+TRUNCATED_SEARCH = {
+    "nomic": {"dims": 256, "oversample": 8},
+    "default": {"dims": 256, "oversample": 8},
+    "jina": {"dims": 128, "oversample": 8},
+}
+# Never rescore fewer candidates than this, however small the limit
+MIN_CANDIDATES = 100
+# How the scores of a structure's windows are combined: "max" or "sum"
+CHUNK_AGGREGATE = os.environ.get("CHUNK_AGGREGATE", "max")
+
+
+def truncated_search_config(model: str) -> Optional[dict]:
+    """Two-stage settings of `model`, overridable with <MODEL>_SEARCH_DIMS / <MODEL>_SEARCH_OVERSAMPLE."""
+    config = dict(TRUNCATED_SEARCH.get(model, {}))
+    for key in ("dims", "oversample"):
+        value = os.environ.get(f"{model.upper()}_SEARCH_{key.upper()}")
+        if value is not None:
+            config[key] = int(value)
+    if not config.get("dims"):
+        return None
+    config.setdefault("oversample", 8)
+    return config
+
+
+class IndexValidationError(Exception):
+    """Raised when a freshly loaded index generation is inconsistent."""
+
+
+def model_key_for(embeddings_file: str) -> str:
+    filename = os.path.splitext(os.path.basename(embeddings_file))[0]
+    if filename == "embeddings":
+        return "default"
+    return filename.replace("_embeddings", "")
+
+
+def iter_structure_records(structures) -> Iterator[tuple]:
+    """Flatten either structures format into (file_path, struct_id, result record) tuples."""
+    if isinstance(structures, dict):
+        # Newer format: structures is a dict of file_path -> file_info
+        for file_path, file_info in structures.items():
+            for func in file_info.get("functions", []):
+                yield file_path, func.get("id", ""), {
+                    "file_path": file_path,
+                    "file_name": os.path.basename(file_path),
+                    "name": func.get("name", ""),
+                    "structure_type": func.get("type", "function"),
+                    "module": func.get("module", ""),
+                    "docstring": func.get("docstring", ""),
+                    "snippet": func.get("code", ""),
+                    "line": func.get("line", 0),
+                    "line_from": func.get("start_line", 0),
+                    "line_to": func.get("end_line", 0),
+                }
+    else:
+        # Legacy format: structures is a list of structure objects
+        for structure in structures:
+            file_path = structure.get("file_path", "")
+            struct_id = f"{file_path}_{structure.get('line_from', '')}_{structure.get('line_to', '')}"
+            yield file_path, struct_id, structure
+
+
+class RecordStore:
+    """
+    Structure records of a generation, one JSON object per line of a memory-mapped
+    file. `offsets[i]` is the first byte of record `i`; records are parsed on access.
+    """
+
+    def __init__(self, data=b"", offsets: Optional[np.ndarray] = None):
+        self.data = data
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def load(cls, records_file: str, offsets_file: str) -> "RecordStore":
+        offsets = np.load(offsets_file, mmap_mode="r")
+        if os.path.getsize(records_file) == 0:
+            # Empty files can't be mapped
+            return cls(b"", offsets)
+        with open(records_file, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data, offsets)
+
+    @staticmethod
+    def write(records: Iterator[dict], records_file: str, offsets_file: str) -> int:
+        """Write `records` and their offset table; returns the number of records."""
+        offsets = [0]
+        with open(records_file, 'wb') as f:
+            for record in records:
+                line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(offsets_file, np.asarray(offsets, dtype=np.int64))
+        return len(offsets) - 1
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index) -> dict:
+        index = int(index)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return json.loads(self.data[int(self.offsets[index]):int(self.offsets[index + 1])])
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def containing(self, text: str) -> Iterator[dict]:
+        """
+        Records whose JSON line contains `text`, ignoring ASCII case. Callers
+        still check the fields they care about: keys and numbers match too.
+        """
+        escaped = any(char in '"\\' or ord(char) < 0x20 for char in text)
+        if not text or escaped or not text.isascii():
+            # JSON would store `text` escaped or with other case rules; check every record
+            yield from self
+            return
+
+        search = re.compile(re.escape(text.encode('ascii')), re.IGNORECASE).search
+        position = 0
+        while True:
+            match = search(self.data, position)
+            if not match:
+                return
+            index = int(np.searchsorted(self.offsets, match.start(), side="right")) - 1
+            yield self[index]
+            # One hit is enough; continue with the next record
+            position = int(self.offsets[index + 1])
+
+
+def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Indices of the `limit` highest scores, best first."""
+    if limit < len(scores):
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ModelVectors:
+    """Normalized embedding matrix of one model, with the record index of every row."""
+
+    def __init__(self, matrix: np.ndarray, rows: np.ndarray, prefix: Optional[np.ndarray] = None, oversample: int = 8,
+                 projection: Optional[Projection] = None, max_windows: int = 1):
+        self.matrix = matrix
+        self.rows = rows
+        # Most rows pointing at the same record (windows of one long structure)
+        self.max_windows = max_windows
+        # Normalized leading dimensions of `matrix` for the coarse first stage
+        self.prefix = prefix
+        self.oversample = oversample
+        # PCA projection the stored vectors were reduced with
+        self.projection = projection
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def input_dim(self) -> int:
+        """Dimension of the query vectors this model produces."""
+        return self.projection.input_dim if self.projection is not None else self.dim
+
+    def prepare_query(self, query_vector: np.ndarray) -> np.ndarray:
+        """Normalize a query vector, projecting it like the stored vectors."""
+        if self.projection is not None:
+            return self.projection.apply(query_vector)
+        norm = np.linalg.norm(query_vector)
+        return query_vector / norm if norm else query_vector
+
+    def scores(self, query_vector: np.ndarray) -> np.ndarray:
+        return self.matrix @ query_vector
+
+    def top_k(self, query_vector: np.ndarray, limit: int):
+        """
+        Best `limit` rows for a normalized query vector.
+
+        Returns:
+            (row positions, scores), best first
+        """
+        candidates = max(limit * self.oversample, MIN_CANDIDATES)
+        if self.prefix is None or candidates >= len(self.rows):
+            scores = self.scores(query_vector)
+            best = _top_k(scores, limit)
+            return best, scores[best]
+
+        # Stage one: scan the truncated prefix matrix
+        head = query_vector[:self.prefix.shape[1]]
+        norm = np.linalg.norm(head)
+        coarse = np.sort(_top_k(self.prefix @ (head / norm if norm else head), candidates))
+
+        # Stage two: rescore the candidates with the full dimensionality
+        scores = self.matrix[coarse] @ query_vector
+        best = _top_k(scores, limit)
+        return coarse[best], scores[best]
+
+    def search(self, query_vector: np.ndarray, limit: int, aggregate: str = CHUNK_AGGREGATE):
+        """
+        Best `limit` records for a normalized query vector, with the window
+        scores of every record combined by `aggregate` ("max" or "sum").
+
+        Returns:
+            (record indices, scores), best first
+        """
+        if self.max_windows <= 1:
+            positions, scores = self.top_k(query_vector, limit)
+            return self.rows[positions], scores
+
+        if aggregate == "sum":
+            scores = self.scores(query_vector)
+            totals = np.bincount(self.rows, weights=scores)
+            totals[np.bincount(self.rows) == 0] = -np.inf
+            best = _top_k(totals, min(limit, int(np.isfinite(totals).sum())))
+            return best, totals[best].astype(np.float32)
+
+        # A record has at most `max_windows` rows, so this many candidates
+        # always contain the best window of each of the `limit` best records
+        positions, scores = self.top_k(query_vector, limit * self.max_windows)
+        records, best_scores, seen = [], [], set()
+        for position, score in zip(positions, scores):
+            record = int(self.rows[position])
+            if record not in seen:
+                seen.add(record)
+                records.append(record)
+                best_scores.append(score)
+                if len(records) == limit:
+                    break
+        return np.asarray(records, dtype=np.int64), np.asarray(best_scores, dtype=np.float32)
+
+
+class IndexGeneration:
+    """An immutable snapshot of the structure records with memory-mapped embedding matrices."""
+
+    def __init__(self, generation_id: Optional[str], records: RecordStore, vectors: Dict[str, ModelVectors]):
+        self.generation_id = generation_id
+        self.records = records
+        self.vectors = vectors
+        self._refs = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, generation_id: str, data_dir: str = DATA_DIR) -> "IndexGeneration":
+        """Memory-map a published generation."""
+        generation_dir = os.path.join(data_dir, INDEX_DIRNAME, generation_id)
+        with open(os.path.join(generation_dir, MANIFEST_FILENAME), 'r') as f:
+            manifest = json.load(f)
+        records = RecordStore.load(
+            os.path.join(generation_dir, RECORDS_FILENAME), os.path.join(generation_dir, RECORD_OFFSETS_FILENAME)
+        )
+        vectors = {}
+        for model in manifest["models"]:
+            matrix = np.load(os.path.join(generation_dir, f"{model}.vectors.npy"), mmap_mode="r")
+            rows = np.load(os.path.join(generation_dir, f"{model}.rows.npy"), mmap_mode="r")
+            prefix, config = None, truncated_search_config(model)
+            if model in manifest.get("prefix_dims", {}) and config is not None:
+                prefix = np.load(os.path.join(generation_dir, f"{model}.prefix.npy"), mmap_mode="r")
+            projection = None
+            if model in manifest.get("projections", {}):
+                projection = Projection.load(os.path.join(generation_dir, f"{model}.projection.npz"))
+            vectors[model] = ModelVectors(matrix, rows, prefix, config["oversample"] if config else 8, projection,
+                                          manifest.get("max_windows", {}).get(model, 1))
+
+        return cls(generation_id, records, vectors)
+
+    def vectors_for(self, model: Optional[str] = None) -> Optional[ModelVectors]:
+        """Vectors of `model`, falling back to the default embeddings like `load_embeddings`."""
+        if model and model in self.vectors:
+            return self.vectors[model]
+        if model:
+            logger.warning(f"No embeddings found for model {model}. Falling back to default.")
+        for fallback in FALLBACK_MODELS:
+            if fallback in self.vectors:
+                return self.vectors[fallback]
+        return None
+
+    def warm_up(self):
+        """Touch every mapped matrix once so the first real query doesn't pay for page faults."""
+        for vectors in self.vectors.values():
+            vectors.scores(np.ones(vectors.dim, dtype=np.float32))
+            if vectors.prefix is not None:
+                vectors.prefix @ np.ones(vectors.prefix.shape[1], dtype=np.float32)
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._retired:
+                return False
+            self._refs += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._refs -= 1
+            drained = self._retired and self._refs == 0
+        if drained:
+            self._close()
+
+    def _retire(self):
+        with self._lock:
+            self._retired = True
+            drained = self._refs == 0
+        if drained:
+            self._close()
+
+    def _close(self):
+        logger.info(f"Retired index generation {self.generation_id}")
+        self.vectors = {}
+        self.records = RecordStore()
+
+
+def embedding_sources(data_dir: str) -> Dict[str, str]:
+    """
+    Embeddings file of every model: the JSON file, or the binary `.npy` matrix
+    written by streaming generation, whichever is newer.
+    """
+    sources = {}
+    candidates = glob.glob(os.path.join(data_dir, "*embeddings.json")) + [
+        path for path in glob.glob(os.path.join(data_dir, "*embeddings.npy"))
+        if os.path.exists(_ids_file(path))
+    ]
+    for path in sorted(candidates):
+        model = model_key_for(path)
+        if model not in sources or os.path.getmtime(path) > os.path.getmtime(sources[model]):
+            sources[model] = path
+    return sources
+
+
+def _ids_file(matrix_file: str) -> str:
+    return f"{os.path.splitext(matrix_file)[0]}.ids.jsonl"
+
+
+def _source_files(data_dir: str) -> List[str]:
+    files = [os.path.join(data_dir, "structures.json")]
+    for path in sorted(embedding_sources(data_dir).values()):
+        files.append(path)
+        if path.endswith(".npy"):
+            files.append(_ids_file(path))
+    return files
+
+
+def _source_signature(data_dir: str) -> List[list]:
+    """(name, size, mtime) of every file a generation is built from."""
+    signature = []
+    for path in _source_files(data_dir) + sorted(glob.glob(os.path.join(data_dir, "*_projection.npz"))):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def _pack(model: str, embeddings: dict, positions: Dict[tuple, int]):
+    """Align one model's embeddings with the structure records and validate them."""
+    rows, vectors, orphans = [], [], 0
+    dim = None
+    for file_path, file_embeddings in embeddings.items():
+        if not isinstance(file_embeddings, dict):
+            continue
+        for struct_id, embedding in file_embeddings.items():
+            # Windows of a long structure all point at the structure's record
+            position = positions.get((file_path, parent_id(struct_id)))
+            if position is None:
+                orphans += 1
+                continue
+            if dim is None:
+                dim = len(embedding)
+            elif len(embedding) != dim:
+                raise IndexValidationError(
+                    f"{model}: vector for {struct_id} has {len(embedding)} dims, expected {dim}"
+                )
+            rows.append(position)
+            vectors.append(embedding)
+
+    if orphans:
+        logger.warning(f"{model}: {orphans} embeddings do not match any structure and were skipped")
+    if not rows:
+        raise IndexValidationError(f"{model}: no embeddings match the current structures")
+
+    matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    logger.info(f"{model}: packed {len(rows)} vectors of dimension {dim}")
+    return np.ascontiguousarray(matrix), np.asarray(rows, dtype=np.int64)
+
+
+def _pack_binary(model: str, matrix_file: str, positions: Dict[tuple, int]):
+    """Like `_pack`, for a `.npy` matrix whose row ids are listed in its `.ids.jsonl` file."""
+    matrix = np.load(matrix_file, mmap_mode="r")
+    keep, rows, orphans = [], [], 0
+    with open(_ids_file(matrix_file), 'r') as f:
+        for i, line in enumerate(f):
+            file_path, struct_id = json.loads(line)
+            position = positions.get((file_path, parent_id(struct_id)))
+            if position is None:
+                orphans += 1
+                continue
+            keep.append(i)
+            rows.append(position)
+
+    if len(keep) + orphans != matrix.shape[0]:
+        raise IndexValidationError(
+            f"{model}: {os.path.basename(matrix_file)} has {matrix.shape[0]} rows, "
+            f"its ids file lists {len(keep) + orphans}"
+        )
+    if orphans:
+        logger.warning(f"{model}: {orphans} embeddings do not match any structure and were skipped")
+    if not rows:
+        raise IndexValidationError(f"{model}: no embeddings match the current structures")
+
+    packed = _normalize_rows(np.asarray(matrix[np.asarray(keep)], dtype=np.float32))
+    logger.info(f"{model}: packed {len(rows)} vectors of dimension {packed.shape[1]}")
+    return np.ascontiguousarray(packed), np.asarray(rows, dtype=np.int64)
+
+
+def read_current_generation(data_dir: str = DATA_DIR) -> Optional[str]:
+    """Name of the generation published in `data_dir`, if any."""
+    try:
+        with open(os.path.join(data_dir, INDEX_DIRNAME, CURRENT_FILENAME), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _read_manifest(data_dir: str, generation_id: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(data_dir, INDEX_DIRNAME, generation_id, MANIFEST_FILENAME), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def publish_generation(data_dir: str = DATA_DIR, required_models=()) -> str:
+    """
+    Build a new generation from the source files in `data_dir` and make it current.
+
+    Models whose embeddings fail validation are left out, unless they are
+    listed in `required_models`, in which case nothing is published.
+    """
+    index_dir = os.path.join(data_dir, INDEX_DIRNAME)
+    signature = _source_signature(data_dir)
+
+    structures = []
+    structures_file = os.path.join(data_dir, "structures.json")
+    if os.path.exists(structures_file):
+        with open(structures_file, 'r') as f:
+            structures = json.load(f)
+    structure_records = list(iter_structure_records(structures))
+    positions = {(file_path, struct_id): i for i, (file_path, struct_id, _) in enumerate(structure_records)}
+
+    packed, projections = {}, {}
+    for model, embeddings_file in sorted(embedding_sources(data_dir).items()):
+        try:
+            if embeddings_file.endswith(".npy"):
+                packed[model] = _pack_binary(model, embeddings_file, positions)
+            else:
+                with open(embeddings_file, 'r') as f:
+                    embeddings = json.load(f)
+                packed[model] = _pack(model, embeddings, positions)
+        except IndexValidationError as e:
+            if model in required_models:
+                raise
+            logger.error(f"Skipping embeddings {os.path.basename(embeddings_file)}: {e}")
+            continue
+
+        if os.path.exists(projection_file(model, data_dir)):
+            projection = Projection.load(projection_file(model, data_dir))
+            matrix, rows = packed[model]
+            if projection.input_dim == matrix.shape[1]:
+                packed[model] = (np.ascontiguousarray(projection.apply(matrix)), rows)
+                projections[model] = projection
+                logger.info(f"{model}: stored vectors projected to {projection.dim} dims")
+            else:
+                logger.error(
+                    f"Ignoring projection for {model}: fitted on {projection.input_dim} dims, "
+                    f"embeddings have {matrix.shape[1]}"
+                )
+
+    generation_id = f"gen-{time.time_ns()}"
+    staging_dir = os.path.join(index_dir, f".{generation_id}")
+    os.makedirs(staging_dir)
+    try:
+        prefix_dims = {}
+        for model, (matrix, rows) in packed.items():
+            np.save(os.path.join(staging_dir, f"{model}.vectors.npy"), matrix)
+            np.save(os.path.join(staging_dir, f"{model}.rows.npy"), rows)
+            if model in projections:
+                projections[model].save(os.path.join(staging_dir, f"{model}.projection.npz"))
+            config = truncated_search_config(model)
+            if config is not None and config["dims"] < matrix.shape[1]:
+                prefix = np.ascontiguousarray(_normalize_rows(matrix[:, :config["dims"]]))
+                np.save(os.path.join(staging_dir, f"{model}.prefix.npy"), prefix)
+                prefix_dims[model] = config["dims"]
+        # Snapshot the records so they always match the published rows
+        RecordStore.write(
+            (record for _, _, record in structure_records),
+            os.path.join(staging_dir, RECORDS_FILENAME),
+            os.path.join(staging_dir, RECORD_OFFSETS_FILENAME),
+        )
+        write_json_atomic(os.path.join(staging_dir, MANIFEST_FILENAME), {
+            "format": INDEX_FORMAT,
+            "models": sorted(packed),
+            "dims": {model: int(matrix.shape[1]) for model, (matrix, _) in packed.items()},
+            "rows": {model: int(matrix.shape[0]) for model, (matrix, _) in packed.items()},
+            "prefix_dims": prefix_dims,
+            "projections": {model: projection.dim for model, projection in projections.items()},
+            "max_windows": {model: int(np.bincount(rows).max()) for model, (_, rows) in packed.items()},
+            "structures": len(positions),
+            "sources": signature,
+        })
+        os.rename(staging_dir, os.path.join(index_dir, generation_id))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    with open(os.path.join(index_dir, f".{CURRENT_FILENAME}.tmp"), 'w') as f:
+        f.write(generation_id)
+    os.replace(os.path.join(index_dir, f".{CURRENT_FILENAME}.tmp"), os.path.join(index_dir, CURRENT_FILENAME))
+    logger.info(f"Published index generation {generation_id}")
+
+    # Processes still mapping an old generation keep their pages after the unlink
+    old = sorted(d for d in os.listdir(index_dir) if d.startswith("gen-") and d != generation_id)
+    for name in old[:max(0, len(old) - KEEP_GENERATIONS)]:
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+    return generation_id
+
+
+def ensure_published(data_dir: str = DATA_DIR, required_models=()) -> Optional[str]:
+    """
+    Return the current generation, publishing a new one first if the JSON
+    sources changed since it was built. Concurrent processes are serialized
+    with a file lock so only one of them does the build.
+    """
+    if not os.path.exists(os.path.join(data_dir, "structures.json")):
+        return read_current_generation(data_dir)
+
+    index_dir = os.path.join(data_dir, INDEX_DIRNAME)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, ".lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            generation_id = read_current_generation(data_dir)
+            manifest = _read_manifest(data_dir, generation_id) if generation_id else None
+            if manifest is not None and manifest.get("format") == INDEX_FORMAT \
+                    and manifest["sources"] == _source_signature(data_dir):
+                return generation_id
+            return publish_generation(data_dir, required_models)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class IndexManager:
+    """Serves the current index generation and swaps in new ones without downtime."""
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self._current: Optional[IndexGeneration] = None
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    @property
+    def current(self) -> Optional[IndexGeneration]:
+        return self._current
+
+    def _build(self) -> Optional[IndexGeneration]:
+        # A new generation must not drop a model that is currently being served
+        served = tuple(self._current.vectors) if self._current is not None else ()
+        generation_id = ensure_published(self.data_dir, required_models=served)
+        if generation_id is None:
+            return None
+        if self._current is not None and self._current.generation_id == generation_id:
+            return self._current
+        generation = IndexGeneration.load(generation_id, self.data_dir)
+        generation.warm_up()
+        return generation
+
+    def _swap(self, generation: IndexGeneration):
+        with self._swap_lock:
+            previous, self._current = self._current, generation
+        logger.info(
+            f"Serving index generation {generation.generation_id} "
+            f"({len(generation.records)} structures, models: {sorted(generation.vectors)})"
+        )
+        if previous is not None:
+            previous._retire()
+
+    def reload(self, wait: bool = True) -> Optional[IndexGeneration]:
+        """
+        Load, validate and warm a new generation, then swap it in.
+
+        If validation fails the current generation keeps serving. With
+        `wait=False` the work happens on a background thread.
+        """
+        if not wait:
+            threading.Thread(target=self.reload, name="index-reload", daemon=True).start()
+            return None
+
+        with self._reload_lock:
+            try:
+                generation = self._build()
+            except (IndexValidationError, OSError, ValueError, KeyError) as e:
+                logger.error(f"Keeping index generation {getattr(self._current, 'generation_id', None)}: {e}")
+                return None
+            if generation is not None and generation is not self._current:
+                self._swap(generation)
+            return generation
+
+    def _follow_published(self):
+        """Start a reload if another process published a newer generation."""
+        now = time.monotonic()
+        if now - self._last_refresh < REFRESH_INTERVAL:
+            return
+        self._last_refresh = now
+        published = read_current_generation(self.data_dir)
+        current = self._current
+        if published and current is not None and published != current.generation_id \
+                and not self._reload_lock.locked():
+            self.reload(wait=False)
+
+    @contextmanager
+    def acquire(self) -> Iterator[IndexGeneration]:
+        """Pin the current generation for the duration of a request."""
+        self._follow_published()
+        while True:
+            with self._swap_lock:
+                generation = self._current
+            if generation is None:
+                generation = self.reload() or IndexGeneration(None, RecordStore(), {})
+                if generation.generation_id is None:
+                    # Nothing loadable yet; serve an empty index without pinning it
+                    yield generation
+                    return
+            if generation._acquire():
+                break
+        try:
+            yield generation
+        finally:
+            generation._release()
+
+
+_INDEX_MANAGER = None
+
+
+def get_index_manager() -> IndexManager:
+    """Get or create the process-wide index manager."""
+    global _INDEX_MANAGER
+    if _INDEX_MANAGER is None:
+        _INDEX_MANAGER = IndexManager()
+    return _INDEX_MANAGER
@@ -5,6 +5,7 @@ import numpy as np
 from pathlib import Path
 from typing import List, Dict, Any, Tuple, Optional
 import logging
+import threading
 
 # Set up paths
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -15,8 +16,14 @@ STRUCTURES_FILE = os.path.join(DATA_DIR, "structures.json")
 # Vector size for encoding
 VECTOR_SIZE = 768
 
-# Create a global embeddings provider singleton
-_EMBEDDINGS_PROVIDER = None
+# Model used when a search doesn't ask for a specific one
+DEFAULT_MODEL = os.environ.get("DEFAULT_EMBEDDING_MODEL", "qodo")
+
+# Embedding providers are loaded once per model and shared by all searches
+_EMBEDDINGS_PROVIDERS = {}
+_EMBEDDINGS_PROVIDERS_LOCK = threading.Lock()
+# Size of the torch thread pool before any tuned query thread count was applied
+_DEFAULT_TORCH_THREADS = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -31,26 +38,55 @@ def get_embeddings_provider(model=None):
     Returns:
         An instance of the appropriate embeddings provider.
     """
-    global _EMBEDDINGS_PROVIDER
-    
-    # If specific model requested, create a new provider for that model
-    if model:
-        if model == 'qodo':
-            from code_search.model.qodo_embed import QodoEmbeddingsProvider
-            return QodoEmbeddingsProvider()
-        elif model == 'nomic':
-            from code_search.model.nomic_embed import NomicEmbeddingsProvider
-            return NomicEmbeddingsProvider()
-        elif model == 'jina':
-            from code_search.model.jina_embed import JinaEmbeddingsProvider
-            return JinaEmbeddingsProvider()
-    
-    # Otherwise use or create the default provider
-    if _EMBEDDINGS_PROVIDER is None:
-        from code_search.model.qodo_embed import QodoEmbeddingsProvider
-        _EMBEDDINGS_PROVIDER = QodoEmbeddingsProvider()
-    
-    return _EMBEDDINGS_PROVIDER
+    if model not in ('qodo', 'nomic', 'jina'):
+        model = DEFAULT_MODEL
+    
+    provider = _EMBEDDINGS_PROVIDERS.get(model)
+    if provider is not None:
+        return provider
+    
+    # Load each model only once, even if several requests ask for it concurrently
+    with _EMBEDDINGS_PROVIDERS_LOCK:
+        if model not in _EMBEDDINGS_PROVIDERS:
+            if model == 'nomic':
+                from code_search.model.nomic_embed import NomicEmbeddingsProvider
+                _EMBEDDINGS_PROVIDERS[model] = NomicEmbeddingsProvider()
+            elif model == 'jina':
+                from code_search.model.jina_embed import JinaEmbeddingsProvider
+                _EMBEDDINGS_PROVIDERS[model] = JinaEmbeddingsProvider()
+            else:
+                from code_search.model.qodo_embed import QodoEmbeddingsProvider
+                _EMBEDDINGS_PROVIDERS[model] = QodoEmbeddingsProvider()
+
+            _apply_query_threads(model)
+        return _EMBEDDINGS_PROVIDERS[model]
+
+def _apply_query_threads(model):
+    """
+    Use the thread count tuned for single queries. An ONNX provider gets it for
+    its own session. The torch pool is process-global, so it only follows the
+    tuning while a single torch model is served; once several are loaded it goes
+    back to the thread count the process started with.
+    """
+    global _DEFAULT_TORCH_THREADS
+    from code_search.index.tuning import apply_threads, get_tuned_config, uses_process_threads
+
+    provider = _EMBEDDINGS_PROVIDERS[model]
+    tuned = get_tuned_config(model)
+    if not uses_process_threads(provider):
+        if tuned:
+            apply_threads(tuned["query_threads"], provider)
+        return
+
+    import torch
+    if _DEFAULT_TORCH_THREADS is None:
+        _DEFAULT_TORCH_THREADS = torch.get_num_threads()
+    torch_models = [name for name, loaded in _EMBEDDINGS_PROVIDERS.items() if uses_process_threads(loaded)]
+    if len(torch_models) > 1:
+        logger.info(f"Serving {', '.join(torch_models)} on the shared torch pool; using {_DEFAULT_TORCH_THREADS} threads")
+        apply_threads(_DEFAULT_TORCH_THREADS)
+    elif tuned:
+        apply_threads(tuned["query_threads"])
 
 def simple_encode(text, size=VECTOR_SIZE):
     """Create a simple vector encoding from text using hashing."""
@@ -133,93 +169,55 @@ def load_embeddings(model: str = None):
     
     return {}
 
-def search(query: str, limit: int = 100, embeddings_provider=None, model: str = None) -> List[Dict[str, Any]]:
-    """Search for code structures matching the query using available embeddings."""
+def search(query: str, limit: int = 100, embeddings_provider=None, model: str = None, index=None) -> List[Dict[str, Any]]:
+    """
+    Search for code structures matching the query using available embeddings.
+
+    `index` is the pinned `IndexGeneration` to search; if omitted, the current
+    generation of the process-wide index manager is used.
+    """
+    if index is None:
+        from code_search.local_index import get_index_manager
+        with get_index_manager().acquire() as index:
+            return search(query, limit=limit, embeddings_provider=embeddings_provider, model=model, index=index)
+
     logger.info(f"Searching with query: {query}, model: {model}")
     
-    # Load structures and embeddings
-    structures = load_structures()
-    if not structures:
+    if not index.records:
         logger.warning("No structures found. Please run indexing first.")
         return []
 
     # Use the singleton embeddings provider instead of creating a new one each time
     if embeddings_provider is None:
         embeddings_provider = get_embeddings_provider(model)
-        logger.info(f"Created embedding provider for model: {model}")
     
     # Embed the query
-    query_vector = embeddings_provider.embed_query(query)
+    if hasattr(embeddings_provider, "encode_queries"):
+        query_vector = embeddings_provider.encode_queries([query], batch_size=1)[0]
+    else:
+        query_vector = np.asarray(embeddings_provider.embed_query(query), dtype=np.float32)
     vector_dim = len(query_vector)
     logger.info(f"Query vector dimension: {vector_dim}")
     
-    # Load embeddings file
-    embeddings = load_embeddings(model)
-    if not embeddings:
+    vectors = index.vectors_for(model)
+    if vectors is None:
         logger.warning("No embeddings found. Please run indexing first.")
         return []
 
-    results = []
-    
-    # Check if we're using the newer dictionary format or the older list format
-    if isinstance(structures, dict):
-        # Newer format: structures is a dict of file_path -> file_info
-        for file_path, file_info in structures.items():
-            if file_path not in embeddings:
-                continue
-                
-            file_embeddings = embeddings[file_path]
-            for func in file_info.get("functions", []):
-                func_id = func.get("id", "")
-                if not func_id or func_id not in file_embeddings:
-                    continue
-                    
-                # Get the embedding vector for this function
-                embedding = file_embeddings[func_id]
-                
-                # Calculate similarity
-                similarity = cosine_similarity(query_vector, embedding)
-                
-                # Create the search result
-                result = {
-                    "file_path": file_path,
-                    "file_name": os.path.basename(file_path),
-                    "name": func.get("name", ""),
-                    "structure_type": func.get("type", "function"),
-                    "module": func.get("module", ""),
-                    "docstring": func.get("docstring", ""),
-                    "snippet": func.get("code", ""),
-                    "line": func.get("line", 0),
-                    "line_from": func.get("start_line", 0),
-                    "line_to": func.get("end_line", 0),
-                    "similarity": similarity
-                }
-                
-                results.append(result)
+    if vectors.input_dim != vector_dim:
+        logger.warning(f"Vector dimension mismatch: {vector_dim} vs {vectors.input_dim}. Using alternative similarity measure.")
+        # Return a low similarity score to avoid breaking the search
+        records = np.unique(vectors.rows)[:limit]
+        scores = np.full(len(records), 0.1, dtype=np.float32)
     else:
-        # Legacy format: structures is a list of structure objects
-        for i, structure in enumerate(structures):
-            file_path = structure.get("file_path", "")
-            if file_path not in embeddings:
-                continue
-                
-            structure_id = f"{file_path}_{structure.get('line_from', '')}_{structure.get('line_to', '')}"
-            
-            if structure_id not in embeddings[file_path]:
-                continue
-                
-            # Get the embedding vector
-            embedding = embeddings[file_path][structure_id]
-            
-            # Calculate similarity
-            similarity = cosine_similarity(query_vector, embedding)
-            
-            # Copy the structure and add the similarity score
-            result = structure.copy()
-            result["similarity"] = similarity
-            
-            results.append(result)
-    
-    # Sort results by similarity and limit
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-    return results[:limit] 
\ No newline at end of file
+        # Two-stage over a truncated prefix for models configured for it, exact otherwise;
+        # window scores of long structures are aggregated per structure
+        records, scores = vectors.search(vectors.prepare_query(query_vector), limit)
+
+    results = []
+    for record, score in zip(records, scores):
+        # Copy the structure and add the similarity score
+        result = dict(index.records[record])
+        result["similarity"] = float(score)
+        results.append(result)
+    return results
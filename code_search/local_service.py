@@ -1,20 +1,22 @@
 import os
 import tempfile
 import logging
-import subprocess
-import time
-import glob
 from typing import List, Optional
 
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from code_search.config import ROOT_DIR
 from code_search.hybrid_searcher import CombinedSearcher
+from code_search.jobs import JobRunner, EMBEDDINGS_JOB, STRUCTURES_JOB
 from code_search.local_file_get import FileGet
-from code_search.merge_codes import merge_search_results
+from code_search.local_index import embedding_sources, get_index_manager
+from code_search.local_search import DEFAULT_MODEL, get_embeddings_provider
+from code_search.merge_codes import iter_merged_chunks
+from code_search.warmup import Warmup
 
 app = FastAPI()
 
@@ -35,34 +37,51 @@ logger = logging.getLogger(__name__)
 logger.info("Initializing search services...")
 searcher = CombinedSearcher()
 get_file = FileGet()
+index_manager = get_index_manager()
 logger.info("Search services initialized successfully")
 
-# Track embedding generation process
-embedding_process = {
-    "status": "idle",  # idle, running, completed, failed
-    "progress": 0,
-    "message": "",
-    "start_time": None,
-    "end_time": None
-}
+# The index and the default model are loaded after the server starts listening
+def load_index():
+    if index_manager.reload() is None:
+        raise RuntimeError("No search index could be loaded. Please generate structures and embeddings first.")
 
-# Track structure generation process
-structure_process = {
-    "status": "idle",  # idle, running, completed, failed
-    "progress": 0,
-    "message": "",
-    "start_time": None,
-    "end_time": None
-}
+warmup = Warmup()
+warmup.add_step("index", load_index)
+warmup.add_step("model", lambda: get_embeddings_provider(DEFAULT_MODEL))
+
+@app.on_event("startup")
+def start_warmup():
+    warmup.start()
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: the index and the default model are loaded."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Indexing jobs run in a managed worker process that keeps models warm between jobs
+job_runner = JobRunner()
 
 def resetSearcher():
-    """Reset the global searcher instance to load new embeddings"""
-    global searcher
-    logger.info("Resetting searcher to load new embeddings")
-    searcher = CombinedSearcher()
+    """Load, validate and swap in a new index generation with the new embeddings"""
+    logger.info("Reloading search index to pick up new embeddings")
+    # In-flight requests keep using the generation they pinned until they finish
+    index_manager.reload(wait=False)
+
+# Reload the searcher whenever an embedding job finishes
+job_runner.on_finished(EMBEDDINGS_JOB, lambda state: resetSearcher())
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.shutdown()
 
 @app.get("/api/search")
-async def search(query: str, model: str = None):
+def search(query: str, model: str = None):
     logger.info(f"Received search request: {query}" + (f" with model: {model}" if model else ""))
     try:
         results = searcher.search(query, limit=100, model=model)
@@ -100,161 +119,36 @@ async def merge_codes(request: MergeRequest):
     logger.info(f"File paths: {request.file_paths}")
     
     temp_file = os.path.join(tempfile.gettempdir(), "merged_code.txt")
-    merged_content = merge_search_results(request.file_paths, temp_file)
-    
-    logger.info(f"Merged content length: {len(merged_content)}")
-    # Log the first 100 characters of the content for debugging
-    if merged_content:
-        logger.info(f"Content preview: {merged_content[:100]}...")
-    else:
-        logger.warning("Merged content is empty")
-    
-    return {
-        "result": merged_content
-    }
+    # Stream the merged files in order; the temp copy is written from the same chunks
+    return StreamingResponse(
+        iter_merged_chunks(request.file_paths, temp_file),
+        media_type="text/plain; charset=utf-8"
+    )
 
 class EmbeddingRequest(BaseModel):
     model: str = "qodo"
     force: bool = False
     use_gpu: bool = False
-    batch_size: int = 8
-
-def run_embedding_generation(model: str, force: bool, use_gpu: bool, batch_size: int = 8):
-    global embedding_process
-    
-    try:
-        embedding_process["status"] = "running"
-        embedding_process["start_time"] = time.time()
-        embedding_process["message"] = f"Starting embedding generation with {model} model..."
-        
-        # Build the command
-        cmd = [
-            "python3", 
-            os.path.join(ROOT_DIR, "tools", "generate_embeddings_with_model.py"),
-            f"--model={model}",
-            f"--batch-size={batch_size}"
-        ]
-        
-        if force:
-            cmd.append("--force")
-        
-        if use_gpu:
-            cmd.append("--gpu")
-        
-        logger.info(f"Running command: {' '.join(cmd)}")
-        
-        # Start the process
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        
-        # Monitor progress
-        for line in iter(process.stdout.readline, ''):
-            logger.info(line.strip())
-            
-            # Extract total structures to process
-            if "Processing" in line and "code structures" in line:
-                try:
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if part == "out" and i > 0 and i+2 < len(parts):
-                            current = int(parts[i-1])
-                            total = int(parts[i+2])
-                            embedding_process["total"] = total
-                            # Only set progress to 100% if truly complete
-                            progress_percent = int((current / total) * 100)
-                            if progress_percent < 100 or "Processing" not in line:
-                                embedding_process["progress"] = progress_percent
-                            break
-                except Exception as e:
-                    logger.error(f"Error parsing progress info: {e}")
-            
-            # Parse direct progress output
-            elif "Progress:" in line and "%" in line:
-                try:
-                    # Example: "Progress: 45.5% (262/575)"
-                    progress_part = line.split("%")[0].split(":")[1].strip()
-                    embedding_process["progress"] = min(99, int(float(progress_part)))
-                    
-                    # Also extract current/total if available
-                    if "(" in line and ")" in line:
-                        counts = line.split("(")[1].split(")")[0].split("/")
-                        if len(counts) == 2:
-                            embedding_process["processed"] = int(counts[0])
-                            embedding_process["total"] = int(counts[1])
-                except Exception as e:
-                    logger.error(f"Error parsing direct progress output: {e}")
-            
-            # Parse tqdm progress bar format
-            elif "|" in line and "%" in line:
-                try:
-                    # Example: "45%|█████████▉         | 1351/3000 [00:20<00:24, 67.55it/s]"
-                    percent_part = line.split("|")[0].strip()
-                    if "%" in percent_part:
-                        percent = int(float(percent_part.replace("%", "").strip()))
-                        # Don't set progress to 100% unless the process is actually complete
-                        if percent < 100:
-                            embedding_process["progress"] = percent
-                except Exception as e:
-                    logger.error(f"Error parsing tqdm output: {e}")
-            
-            embedding_process["message"] = line.strip()
-        
-        # Wait for process to complete
-        return_code = process.wait()
-        
-        if return_code == 0:
-            embedding_process["status"] = "completed"
-            embedding_process["progress"] = 100
-            embedding_process["message"] = "Embedding generation completed successfully."
-        else:
-            stderr_output = process.stderr.read()
-            logger.error(f"Embedding generation failed: {stderr_output}")
-            embedding_process["status"] = "failed"
-            embedding_process["message"] = f"Failed: {stderr_output}"
-            
-    except Exception as e:
-        logger.exception("Error in embedding generation")
-        embedding_process["status"] = "failed"
-        embedding_process["message"] = str(e)
-    finally:
-        embedding_process["end_time"] = time.time()
-        # Reset the searcher to load the new embeddings
-        resetSearcher()
+    # None uses the batch size tuned for the model on this machine
+    batch_size: Optional[int] = None
 
 @app.post("/api/generate-embeddings")
-async def generate_embeddings(request: EmbeddingRequest, background_tasks: BackgroundTasks):
-    global embedding_process
+async def generate_embeddings(request: EmbeddingRequest):
+    started = job_runner.submit(
+        EMBEDDINGS_JOB,
+        model=request.model,
+        force=request.force,
+        use_gpu=request.use_gpu,
+        batch_size=request.batch_size
+    )
     
     # Check if already running
-    if embedding_process["status"] == "running":
+    if not started:
         return {
             "status": "error",
             "message": "Embedding generation already in progress"
         }
     
-    # Reset status
-    embedding_process = {
-        "status": "idle",
-        "progress": 0,
-        "message": "Initializing...",
-        "start_time": None,
-        "end_time": None
-    }
-    
-    # Start embedding generation in background
-    background_tasks.add_task(
-        run_embedding_generation, 
-        model=request.model, 
-        force=request.force, 
-        use_gpu=request.use_gpu,
-        batch_size=request.batch_size
-    )
-    
     return {
         "status": "started",
         "message": f"Started embedding generation with {request.model} model"
@@ -262,150 +156,22 @@ async def generate_embeddings(request: EmbeddingRequest, background_tasks: Backg
 
 @app.get("/api/embedding-status")
 async def get_embedding_status():
-    global embedding_process
-    return embedding_process
+    return job_runner.status(EMBEDDINGS_JOB)
+
+@app.get("/api/embedding-events")
+async def get_embedding_events():
+    """Stream embedding job progress as server-sent events."""
+    return StreamingResponse(job_runner.events(EMBEDDINGS_JOB), media_type="text/event-stream")
 
 class StructureRequest(BaseModel):
     target_dir: str = ""
     pattern: str = "**/*.py"
-    max_lines: int = 500
+    # 0 keeps every structure; long ones are embedded as overlapping windows
+    max_lines: int = 0
     force: bool = False
 
-def run_structure_generation(target_dir: str, pattern: str, max_lines: int, force: bool):
-    global structure_process
-    
-    try:
-        structure_process["status"] = "running"
-        structure_process["start_time"] = time.time()
-        structure_process["message"] = "Starting code structure generation..."
-        
-        # Clean target_dir - strip whitespace and ensure no trailing slash
-        target_dir = target_dir.strip().rstrip('/')
-        
-        # Verify directory exists before proceeding
-        if not os.path.isdir(target_dir):
-            err_msg = f"Target directory does not exist or is not a directory: '{target_dir}'"
-            logger.error(err_msg)
-            structure_process["status"] = "failed"
-            structure_process["message"] = err_msg
-            return
-        
-        # Determine if we're specifying a directory directly without a pattern
-        if os.path.isdir(target_dir) and (pattern == "**/*.py" or pattern == "**/*.dart"):
-            # Use the appropriate default pattern based on likely files in the target directory
-            # Check if this is a Flutter project by seeing if any .dart files exist
-            if glob.glob(os.path.join(target_dir, "**/*.dart"), recursive=True):
-                pattern = "**/*.dart"
-                logger.info(f"Detected Flutter project, using pattern: {pattern}")
-            else:
-                pattern = "**/*.py"
-                logger.info(f"Using default pattern: {pattern}")
-                
-        # Clean pattern
-        pattern = pattern.strip()
-        
-        # Build the command
-        cmd = [
-            "python3", 
-            os.path.join(ROOT_DIR, "tools", "index_quran_simple.py"),
-            "--target-dir", target_dir,
-            "--pattern", pattern,
-            "--max-lines", str(max_lines)
-        ]
-        
-        if force:
-            cmd.append("--force")
-        
-        logger.info(f"Running command: {' '.join(cmd)}")
-        
-        # Start the process
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        
-        # Monitor progress
-        total_files = 0
-        processed_files = 0
-        
-        for line in iter(process.stdout.readline, ''):
-            logger.info(line.strip())
-            
-            # Extract total files to process
-            if "Found" in line and "files to process" in line:
-                try:
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if part == "Found" and i+1 < len(parts):
-                            total_files = int(parts[i+1])
-                            structure_process["total"] = total_files
-                            break
-                except Exception as e:
-                    logger.error(f"Error parsing file count: {e}")
-            
-            # Parse file processing updates
-            elif "Processing file" in line:
-                processed_files += 1
-                if total_files > 0:
-                    structure_process["progress"] = int((processed_files / total_files) * 100)
-                    structure_process["processed"] = processed_files
-            
-            # Parse tqdm progress bar format
-            elif "|" in line and "%" in line:
-                try:
-                    # Example: "45%|█████████▉         | 1351/3000 [00:20<00:24, 67.55it/s]"
-                    percent_part = line.split("|")[0].strip()
-                    if "%" in percent_part:
-                        percent = int(float(percent_part.replace("%", "").strip()))
-                        structure_process["progress"] = percent
-                except Exception as e:
-                    logger.error(f"Error parsing tqdm output: {e}")
-            
-            structure_process["message"] = line.strip()
-        
-        # Wait for process to complete
-        return_code = process.wait()
-        
-        if return_code == 0:
-            structure_process["status"] = "completed"
-            structure_process["progress"] = 100
-            structure_process["message"] = "Structure generation completed successfully."
-        else:
-            stderr_output = process.stderr.read()
-            logger.error(f"Structure generation failed: {stderr_output}")
-            structure_process["status"] = "failed"
-            structure_process["message"] = f"Failed: {stderr_output}"
-            
-    except Exception as e:
-        logger.exception("Error in structure generation")
-        structure_process["status"] = "failed"
-        structure_process["message"] = str(e)
-    finally:
-        structure_process["end_time"] = time.time()
-
 @app.post("/api/generate-structures")
-async def generate_structures(request: StructureRequest, background_tasks: BackgroundTasks):
-    global structure_process
-    
-    # Check if already running
-    if structure_process["status"] == "running":
-        return {
-            "status": "error",
-            "message": "Structure generation already in progress"
-        }
-    
-    # Reset status
-    structure_process = {
-        "status": "idle",
-        "progress": 0,
-        "message": "Initializing...",
-        "start_time": None,
-        "end_time": None
-    }
-    
+async def generate_structures(request: StructureRequest):
     # Process the target directory to ensure it exists and is a directory
     target_dir = request.target_dir.strip() if request.target_dir else ""
     
@@ -438,15 +204,21 @@ async def generate_structures(request: StructureRequest, background_tasks: Backg
     # Ensure pattern is clean
     pattern = request.pattern.strip() if request.pattern else "**/*.py"
     
-    # Start structure generation in background
-    background_tasks.add_task(
-        run_structure_generation, 
+    started = job_runner.submit(
+        STRUCTURES_JOB,
         target_dir=target_dir,
         pattern=pattern,
         max_lines=request.max_lines,
         force=request.force
     )
     
+    # Check if already running
+    if not started:
+        return {
+            "status": "error",
+            "message": "Structure generation already in progress"
+        }
+    
     return {
         "status": "started",
         "message": f"Started code structure generation for '{target_dir}' with pattern '{pattern}'"
@@ -454,22 +226,27 @@ async def generate_structures(request: StructureRequest, background_tasks: Backg
 
 @app.get("/api/structure-status")
 async def get_structure_status():
-    global structure_process
-    return structure_process
+    return job_runner.status(STRUCTURES_JOB)
+
+@app.get("/api/structure-events")
+async def get_structure_events():
+    """Stream structure job progress as server-sent events."""
+    return StreamingResponse(job_runner.events(STRUCTURES_JOB), media_type="text/event-stream")
 
 @app.get("/api/available-embeddings")
 async def get_available_embeddings():
-    """Get a list of available embedding models based on embedding files in the data directory."""
+    """
+    Get a list of available embedding models based on embedding files in the data
+    directory: a JSON file, or the `.npy` matrix and `.ids.jsonl` pair written by
+    streaming generation.
+    """
     logger.info("Fetching available embedding models")
-    embedding_files = glob.glob(os.path.join(ROOT_DIR, "data", "*embeddings.json"))
     
     models = []
-    for file_path in embedding_files:
-        filename = os.path.basename(file_path)
-        if filename == "embeddings.json":
+    for model_name in sorted(embedding_sources(os.path.join(ROOT_DIR, "data"))):
+        if model_name == "default":
             models.append({"value": "default", "label": "Default"})
-        elif "_embeddings.json" in filename:
-            model_name = filename.replace("_embeddings.json", "")
+        else:
             # Make the label more user-friendly
             if model_name == "qodo":
                 label = "Qodo Embed"
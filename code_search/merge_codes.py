@@ -1,6 +1,10 @@
 import os
-import pyperclip
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import pyperclip
 
 def merge_files_recursively(source_folder, output_file, base_path=""):
     for root, dirs, files in os.walk(source_folder):
@@ -35,6 +39,81 @@ def merge_specific_paths_from_file(paths_file, output_file):
             display_name = os.path.relpath(path, os.path.dirname(path))
             append_file_content(path, output_file, display_name)
 
+SEPARATOR = "\n\n=====================\n\n"
+SEARCH_RESULTS_PREFIX = "/Users/devsufi/Documents/GitHub/Quran-Majeed/lib/"
+# Number of files read ahead of the one currently being emitted
+MERGE_READ_AHEAD = 8
+
+
+def _prefixed_paths(file_paths, prefix=SEARCH_RESULTS_PREFIX):
+    return [path if path.startswith(prefix) else prefix + path for path in file_paths]
+
+
+def _read_file(path):
+    """Read a single file for merging, returning None if it can't be used."""
+    if not os.path.isfile(path):
+        logging.warning(f"File not found: {path}")
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as infile:
+            return infile.read()
+    except Exception as e:
+        logging.error(f"Error processing file {path}: {e}")
+        return None
+
+
+def iter_merged_chunks(file_paths, output_file=None, read_ahead=MERGE_READ_AHEAD):
+    """
+    Stream the merged code of the given search result files chunk by chunk.
+
+    Files are read concurrently by a small thread pool, but at most `read_ahead`
+    files are buffered at a time and chunks are always yielded in the order of
+    `file_paths`, so memory use is bounded by the read-ahead window rather than
+    by the size of the selection.
+
+    Args:
+        file_paths (list): List of file paths from search results
+        output_file (str, optional): If given, the same chunks are also written to this file
+
+    Yields:
+        str: Header, content and separator chunks for every readable file
+    """
+    logging.info(f"Starting merge of {len(file_paths)} file paths")
+    paths = _prefixed_paths(file_paths)
+    outfile = open(output_file, "w", encoding="utf-8") if output_file else None
+    total_length = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, read_ahead)) as executor:
+            pending = deque()
+            path_iter = iter(paths)
+
+            for path in islice(path_iter, read_ahead):
+                pending.append((path, executor.submit(_read_file, path)))
+
+            while pending:
+                path, future = pending.popleft()
+                # Keep the read-ahead window full while this file is emitted
+                for next_path in islice(path_iter, 1):
+                    pending.append((next_path, executor.submit(_read_file, next_path)))
+
+                content = future.result()
+                if content is None:
+                    continue
+
+                logging.info(f"Processing file: {path}")
+                for chunk in (f"File Name : {os.path.basename(path)}\n\n", content, SEPARATOR):
+                    if outfile:
+                        outfile.write(chunk)
+                    total_length += len(chunk)
+                    yield chunk
+    finally:
+        if outfile:
+            outfile.close()
+
+    logging.info(f"Finished merging. Content length: {total_length} characters")
+
+
 def merge_search_results(file_paths, output_file=None):
     """
     Merge code from files specified in search results and return the content
@@ -46,45 +125,7 @@ def merge_search_results(file_paths, output_file=None):
     Returns:
         str: The merged content for copying to clipboard
     """
-    logging.info(f"Starting merge_search_results with {len(file_paths)} file paths")
-    
-    # Create merged content in memory
-    merged_content = ""
-    
-    # If output_file is provided, clear or create it
-    if output_file:
-        open(output_file, "w").close()
-    
-    # Add prefix to file paths
-    prefixed_paths = []
-    prefix = "/Users/devsufi/Documents/GitHub/Quran-Majeed/lib/"
-    for path in file_paths:
-        prefixed_path = prefix + path if not path.startswith(prefix) else path
-        prefixed_paths.append(prefixed_path)
-    
-    for path in prefixed_paths:
-        if os.path.isfile(path):
-            display_name = os.path.basename(path)
-            logging.info(f"Processing file: {path}")
-            
-            # Add content to string
-            merged_content += f"File Name : {display_name}\n\n"
-            try:
-                with open(path, "r", encoding="utf-8") as infile:
-                    content = infile.read()
-                    merged_content += content
-                merged_content += "\n\n=====================\n\n"
-                
-                # If output file is provided, also write to that file
-                if output_file:
-                    append_file_content(path, output_file, display_name)
-            except Exception as e:
-                logging.error(f"Error processing file {path}: {e}")
-        else:
-            logging.warning(f"File not found: {path}")
-    
-    logging.info(f"Finished merging. Content length: {len(merged_content)} characters")
-    return merged_content
+    return "".join(iter_merged_chunks(file_paths, output_file))
 
 def copy_search_results_to_clipboard(file_paths):
     """
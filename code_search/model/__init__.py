@@ -1,5 +1,17 @@
-from .encoder import UniXcoderEmbeddingsProvider
-from .nomic_embed import NomicEmbeddingsProvider
-from .jina_embed import JinaEmbeddingsProvider
+import importlib
+
+# Providers are imported on first access so that importing a single provider
+# module (or this package) doesn't pull in torch and every model library.
+_PROVIDERS = {
+    "UniXcoderEmbeddingsProvider": ".encoder",
+    "NomicEmbeddingsProvider": ".nomic_embed",
+    "JinaEmbeddingsProvider": ".jina_embed",
+}
 
 __all__ = ["UniXcoderEmbeddingsProvider", "NomicEmbeddingsProvider", "JinaEmbeddingsProvider"]
+
+
+def __getattr__(name):
+    if name in _PROVIDERS:
+        return getattr(importlib.import_module(_PROVIDERS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
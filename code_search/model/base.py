@@ -0,0 +1,260 @@
+"""
+Common base of the sentence-transformers embedding providers.
+
+Nomic, Qodo and Jina differ only in their model, prompts and loading options;
+everything else lives here. `encode_documents` and `encode_queries` return
+contiguous, L2-normalized float32 matrices that the indexing pipeline and the
+local search consume as they are. The list-returning `embed_*` methods remain
+for callers that serialize vectors to JSON themselves.
+"""
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+from tqdm import tqdm
+
+from code_search.model.hub import resolve_model_path
+from code_search.model.onnx_backend import load_onnx_encoder, onnx_enabled
+from code_search.model.quantize import load_quantized, quantization_enabled
+
+
+def resolve_device(device: Optional[str] = None) -> torch.device:
+    """The requested device (default: EMBEDDING_DEVICE or cpu), or the CPU if it isn't available."""
+    if device is None:
+        device = os.environ.get("EMBEDDING_DEVICE", "cpu")
+    if device == "cuda" and torch.cuda.is_available():
+        return torch.device("cuda")
+    if device == "mps" and hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+
+def format_text(item: Dict[str, str]) -> str:
+    """The text embedded for a {"code": ..., "docstring": ...} item."""
+    return f"{item.get('docstring') or ''} {item.get('code') or ''}"
+
+
+def as_float32(vectors) -> np.ndarray:
+    """Contiguous float32 matrix of `vectors`, without copying when it already is one."""
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SentenceTransformerProvider:
+    """An embedding model loaded with sentence-transformers, ONNX Runtime or int8 quantization."""
+
+    # Hub name of the model
+    MODEL_NAME: str = ""
+    # Name shown while resolving the local snapshot
+    DISPLAY_NAME: str = ""
+    # Prompts stored with the model, prepended to queries and documents
+    QUERY_PROMPT: Optional[str] = None
+    DOCUMENT_PROMPT: Optional[str] = None
+    TRUST_REMOTE_CODE = False
+    # Use hashed fallback embeddings instead of failing when the model can't be loaded
+    FALLBACK_ON_ERROR = False
+
+    def __init__(self, device: Optional[str] = None, quantize: Optional[bool] = None, backend: Optional[str] = None):
+        self.device = resolve_device(device)
+        self.model_name = self.MODEL_NAME
+        self.model = None
+
+        # Set environment variables for memory management
+        if self.device.type == "mps":
+            os.environ["PYTORCH_MPS_HIGH_WATERMARK_RATIO"] = "0.0"
+
+        try:
+            # Use locally cached weights without any network access when available
+            model_path = resolve_model_path(self.MODEL_NAME, self.DISPLAY_NAME)
+            print(f"Loading model on {self.device}...")
+            self.model = self._load_model(model_path, quantize, backend)
+
+            # Warm up the model with a simple embedding
+            print("Warming up the model...")
+            self.encode_documents([{"code": "Test code"}], batch_size=1)
+            print(f"Model {self.model_name} loaded successfully.")
+        except Exception as e:
+            if not self.FALLBACK_ON_ERROR:
+                raise
+            print(f"Error loading model: {e}")
+            print("Will use fallback embedding method instead.")
+            self.model = None
+            self.model_name = "fallback_simple_embed"
+
+    def _sentence_transformer(self, model_path: str, device: str) -> SentenceTransformer:
+        return SentenceTransformer(model_path, device=device, trust_remote_code=self.TRUST_REMOTE_CODE)
+
+    def _load_model(self, model_path: str, quantize: Optional[bool], backend: Optional[str]):
+        if onnx_enabled(backend) and self.device.type == "cpu":
+            # Exported graph with pooling and normalization, run by onnxruntime
+            return load_onnx_encoder(
+                self.model_name, model_path, lambda: self._sentence_transformer(model_path, "cpu"),
+                quantize=quantization_enabled(quantize)
+            )
+        if quantization_enabled(quantize) and self.device.type == "cpu":
+            # Dynamic int8 quantization of the linear layers for faster CPU inference
+            return load_quantized(self.model_name, model_path, lambda: self._sentence_transformer(model_path, "cpu"))
+        return self._sentence_transformer(model_path, self.device.type)
+
+    def _encode(self, texts: List[str], batch_size: int, prompt_name: Optional[str]) -> np.ndarray:
+        if self.model is None:
+            # Fallback to simple embedding if model failed to load
+            from code_search.local_search import simple_encode
+            return as_float32([simple_encode(text) for text in texts])
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            prompt_name=prompt_name,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return as_float32(vectors)
+
+    def encode_documents(self, texts: List[Dict[str, str]], batch_size: int = 8) -> np.ndarray:
+        """
+        Embed code snippets.
+
+        Args:
+            texts: List of dicts, each with "code" and optional "docstring" keys
+            batch_size: Batch size for more efficient processing
+
+        Returns:
+            A (len(texts), dim) normalized float32 matrix
+        """
+        return self._encode([format_text(item) for item in texts], batch_size, self.DOCUMENT_PROMPT)
+
+    def encode_queries(self, queries: List[str], batch_size: int = 8) -> np.ndarray:
+        """
+        Embed search queries, with the model's query prompt.
+
+        Returns:
+            A (len(queries), dim) normalized float32 matrix
+        """
+        return self._encode(list(queries), batch_size, self.QUERY_PROMPT)
+
+    def tokenize_batch(self, texts: List[Dict[str, str]]):
+        """
+        Tokenize a batch of code snippets for `embed_tokenized`.
+
+        Args:
+            texts: List of dicts, each with "code" and optional "docstring" keys
+
+        Returns:
+            Model inputs for the whole batch
+        """
+        formatted_texts = [format_text(item) for item in texts]
+        if self.model is None:
+            # The fallback embedding works on the raw texts
+            return formatted_texts
+        if self.DOCUMENT_PROMPT:
+            prefix = self._prompts().get(self.DOCUMENT_PROMPT, "")
+            formatted_texts = [prefix + text for text in formatted_texts]
+        return self.model.tokenize(formatted_texts)
+
+    def _prompts(self) -> dict:
+        return dict(getattr(self.model, "prompts", None) or {})
+
+    def embed_tokenized(self, features) -> np.ndarray:
+        """
+        Run the model on inputs returned by `tokenize_batch`.
+
+        Returns:
+            A normalized float32 matrix with one embedding per text
+        """
+        if self.model is None:
+            return self._encode(features, len(features), None)
+        if hasattr(self.model, "embed_features"):
+            # ONNX Runtime backend; the graph normalizes already
+            return as_float32(self.model.embed_features(features))
+        with torch.no_grad():
+            features = {name: value.to(self.device) for name, value in features.items()}
+            vectors = self.model(features)["sentence_embedding"].float().cpu().numpy()
+        return as_float32(normalize(vectors))
+
+    def embed_code(
+        self, code: Optional[str] = None, docstring: Optional[str] = None, batch_size: int = 1
+    ) -> List[float]:
+        """Embedding of code and/or docstring as a list of floats."""
+        return self.encode_documents([{"code": code, "docstring": docstring}], batch_size)[0].tolist()
+
+    def embed_batch(self, texts: List[Dict[str, str]], batch_size: int = 8) -> List[List[float]]:
+        """Embeddings of a batch of code snippets as lists of floats."""
+        return self.encode_documents(texts, batch_size).tolist()
+
+    def embed_query(self, query: str, batch_size: int = 1) -> List[float]:
+        """Embedding of a search query as a list of floats."""
+        return self.encode_queries([query], batch_size)[0].tolist()
+
+
+def generate_embeddings_file(provider, model: str, structures_file: str, output_file: str, batch_size: int = 8):
+    """
+    Generate embeddings for code structures and save them to a JSON file.
+
+    Args:
+        provider: A loaded provider
+        model: Key of the model in `AVAILABLE_MODELS`, used for the embedding cache
+        structures_file: Path to the JSON file containing code structures
+        output_file: Path to save the embeddings JSON file
+        batch_size: Batch size for more efficient processing
+    """
+    from code_search.index.embedding_cache import embed_with_cache
+
+    # Load the code structures
+    with open(structures_file, 'r') as f:
+        structures = json.load(f)
+
+    # Dictionary to store the embeddings
+    embeddings = {}
+
+    # Collect (file path, structure id) keys and texts of either structures format
+    items = []
+    if isinstance(structures, list):
+        # Process list format
+        print(f"Processing {len(structures)} code structures (list format)...")
+        for structure in structures:
+            file_path = structure["file_path"]
+            struct_id = f"{file_path}_{structure['line_from']}_{structure['line_to']}"
+            items.append(((file_path, struct_id), {
+                "code": structure.get("snippet", ""),
+                "docstring": structure.get("docstring", "")
+            }))
+    else:
+        # Process dictionary format
+        print(f"Processing {len(structures)} code files (dictionary format)...")
+        for file_path, file_info in structures.items():
+            embeddings[file_path] = {}
+            for func_info in file_info["functions"]:
+                items.append(((file_path, func_info["id"]), {
+                    "code": func_info["code"],
+                    "docstring": func_info.get("docstring", "")
+                }))
+
+    # Sort by length so batches pad little; the keys restore the original layout
+    items.sort(key=lambda item: len(item[1]["code"] or "") + len(item[1]["docstring"] or ""))
+
+    # Identical and previously cached texts are not embedded again; reading,
+    # tokenization, the forward pass and storing the results overlap
+    with tqdm(total=len(items), desc="Generating embeddings", unit="structure") as pbar:
+        def store(keys, vectors):
+            for (file_path, struct_id), embedding in zip(keys, vectors):
+                embeddings.setdefault(file_path, {})[struct_id] = np.asarray(embedding).tolist()
+            pbar.update(len(keys))
+
+        embed_with_cache(provider, model, items, batch_size, on_batch=store)
+
+    # Save the embeddings to a file
+    with open(output_file, 'w') as f:
+        json.dump(embeddings, f)
+
+    print(f"Embeddings saved to {output_file}")
@@ -1,24 +1,135 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from .unixcoder import UniXcoder
+from .hub import resolve_model_path
+from .quantize import load_quantized, quantization_enabled
 
+import numpy as np
 import torch
 
+# Longest input UniXcoder was trained on, including its four mode/special tokens
+MAX_LENGTH = 512
+# Texts are cut to this many characters per token before tokenization; a BPE
+# token of code rarely spans more, and tokenizing the whole text of a long
+# structure only to drop most of it is the slowest part of encoding it
+MAX_CHARS_PER_TOKEN = 16
+
+
+def load_fast_tokenizer(model_path: str):
+    """Rust-backed tokenizer of UniXcoder, with the `<mask0>` token the model adds."""
+    from transformers import RobertaTokenizerFast
+
+    tokenizer = RobertaTokenizerFast.from_pretrained(model_path)
+    tokenizer.add_tokens(["<mask0>"], special_tokens=True)
+    return tokenizer
+
 
 class UniXcoderEmbeddingsProvider:
-    def __init__(self, device: Optional[str] = None):
+    def __init__(self, device: Optional[str] = None, quantize: Optional[bool] = None):
         default_device = "cuda" if torch.cuda.is_available() else "cpu"
         self.device = torch.device(default_device if device is None else device)
-        self.model = UniXcoder("microsoft/unixcoder-base")
-        self.model.to(self.device)
         self.model_name = "microsoft/unixcoder-base"
+        model_path = resolve_model_path(self.model_name, "UniXcoder")
+        if quantization_enabled(quantize) and self.device.type == "cpu":
+            # Dynamic int8 quantization of the linear layers for faster CPU inference
+            self.model = load_quantized(self.model_name, model_path, lambda: UniXcoder(model_path))
+        else:
+            self.model = UniXcoder(model_path)
+        self.model.to(self.device)
+        self.model.eval()
+        self.tokenizer = load_fast_tokenizer(model_path)
+        self.pad_token_id = self.model.config.pad_token_id
+
+    def tokenize_batch(self, texts: List[Dict[str, str]], max_length: int = MAX_LENGTH) -> Dict[str, torch.Tensor]:
+        """
+        Tokenize a batch of code snippets in `<encoder-only>` mode, the same way
+        `UniXcoder.tokenize` does for a single one.
+
+        Args:
+            texts: List of dicts, each with "code" and optional "docstring" keys
+            max_length: Maximum number of tokens per text
+
+        Returns:
+            "input_ids" and "attention_mask", padded to the longest text of the batch
+        """
+        tokenizer = self.tokenizer
+        max_chars = max_length * MAX_CHARS_PER_TOKEN
+        formatted_texts = [f"{item.get('docstring') or ''} {item.get('code') or ''}"[:max_chars] for item in texts]
+        encoded = tokenizer(
+            formatted_texts,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=max_length - 4,
+            return_attention_mask=False,
+        )["input_ids"]
+
+        prefix = tokenizer.convert_tokens_to_ids([tokenizer.cls_token, "<encoder-only>", tokenizer.sep_token])
+        sequences = [prefix + ids + [tokenizer.sep_token_id] for ids in encoded]
+        length = max((len(ids) for ids in sequences), default=0)
+        input_ids = torch.full((len(sequences), length), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), length), dtype=torch.long)
+        for row, ids in enumerate(sequences):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+    def embed_tokenized(self, features: Dict[str, torch.Tensor]) -> np.ndarray:
+        """
+        Run the model on inputs returned by `tokenize_batch`.
+
+        Returns:
+            A normalized float32 matrix with one embedding per text
+        """
+        with torch.inference_mode():
+            _, embeddings = self.model(
+                features["input_ids"].to(self.device), attention_mask=features["attention_mask"].to(self.device)
+            )
+            embeddings = torch.nn.functional.normalize(embeddings.float(), dim=-1)
+            return np.ascontiguousarray(embeddings.cpu().numpy(), dtype=np.float32)
+
+    def encode_documents(self, texts: List[Dict[str, str]], batch_size: int = 8) -> np.ndarray:
+        """
+        Embed code snippets in batches of similar length.
+
+        Args:
+            texts: List of dicts, each with "code" and optional "docstring" keys
+            batch_size: Batch size for more efficient processing
+
+        Returns:
+            A (len(texts), dim) normalized float32 matrix in the order of `texts`
+        """
+        batch_size = max(1, batch_size)
+        # Batching texts of similar length keeps the padding, and so the wasted compute, small
+        lengths = [len(text.get("code") or "") + len(text.get("docstring") or "") for text in texts]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        vectors = None
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            embeddings = self.embed_tokenized(self.tokenize_batch([texts[i] for i in indices]))
+            if vectors is None:
+                vectors = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            vectors[indices] = embeddings
+        if vectors is None:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return vectors
+
+    def encode_queries(self, queries: List[str], batch_size: int = 8) -> np.ndarray:
+        """
+        Embed search queries, which UniXcoder encodes like a docstring without code.
+
+        Returns:
+            A (len(queries), dim) normalized float32 matrix
+        """
+        return self.encode_documents([{"docstring": query} for query in queries], batch_size)
 
     def embed_code(
         self, code: Optional[str] = None, docstring: Optional[str] = None
     ) -> List[float]:
-        tokens_ids = self.model.tokenize(
-            [f"{docstring or ''} {code or ''}"], max_length=512, mode="<encoder-only>"
-        )
-        source_ids = torch.tensor(tokens_ids).to(self.device)
-        _, func_embedding = self.model(source_ids)
-        vector = func_embedding.detach().cpu().numpy()[0]
-        return vector.tolist()
+        return self.encode_documents([{"code": code, "docstring": docstring}], batch_size=1)[0].tolist()
+
+    def embed_batch(self, texts: List[Dict[str, str]], batch_size: int = 8) -> List[List[float]]:
+        """Embeddings of a batch of code snippets as lists of floats."""
+        return self.encode_documents(texts, batch_size).tolist()
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding of a search query as a list of floats."""
+        return self.encode_queries([query], batch_size=1)[0].tolist()
@@ -0,0 +1,36 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+def resolve_model_path(model_name: str, model_label: Optional[str] = None) -> str:
+    """
+    Return the local snapshot of `model_name` if it's already cached, so the
+    model can be loaded without touching the network. Otherwise log in to
+    Hugging Face (when a token is configured) and return the hub name.
+    """
+    # Load environment variables
+    load_dotenv()
+
+    from huggingface_hub import snapshot_download
+
+    try:
+        path = snapshot_download(model_name, local_files_only=True)
+        print(f"Using cached weights for {model_name} (offline)")
+        return path
+    except Exception:
+        pass
+
+    # Check for Hugging Face token and login if available
+    hf_token = os.getenv("HUGGINGFACE_TOKEN")
+    if hf_token:
+        from huggingface_hub import login
+
+        print("Logging in to Hugging Face with token...")
+        login(token=hf_token)
+    else:
+        print("Warning: No HUGGINGFACE_TOKEN found in environment variables.")
+        print(f"You may need to authenticate to access the {model_label or model_name} model.")
+        print(f"Visit https://huggingface.co/{model_name} to accept terms.")
+    return model_name
@@ -0,0 +1,270 @@
+"""
+ONNX Runtime backend for the sentence-transformers embedding providers.
+
+A model is exported once to ONNX with its pooling and L2 normalization baked
+into the graph, and cached with its tokenizer under `data/onnx`. Later loads
+only need the tokenizer and an onnxruntime CPU session, not torch or the float
+checkpoint. `OnnxEncoder.encode` mirrors the subset of
+`SentenceTransformer.encode` the providers use, so their public API is unchanged.
+"""
+import os
+import re
+import json
+import shutil
+import logging
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", os.path.join(DATA_DIR, "onnx"))
+ONNX_MODEL_FILENAME = "model.onnx"
+ONNX_INT8_MODEL_FILENAME = "model.int8.onnx"
+ONNX_CONFIG_FILENAME = "onnx_config.json"
+ONNX_OPSET = 17
+
+
+def onnx_enabled(backend: Optional[str] = None) -> bool:
+    """Resolve an explicit `backend` argument or fall back to the EMBEDDING_BACKEND variable."""
+    backend = backend or os.environ.get("EMBEDDING_BACKEND", "torch")
+    return backend.lower() == "onnx"
+
+
+def _model_revision(model_name: str, model_path: str) -> str:
+    # The snapshot directory name is the commit hash of the model revision
+    if os.path.isdir(model_path):
+        return os.path.basename(os.path.normpath(model_path))
+    try:
+        from huggingface_hub import HfApi
+
+        return HfApi().model_info(model_name).sha
+    except Exception as e:
+        logger.warning(
+            f"Could not resolve the revision of {model_name} ({e}); its ONNX export "
+            f"won't be rebuilt when the model is updated"
+        )
+        return "hub"
+
+
+def _export_dir(model_name: str, model_path: str) -> str:
+    revision = _model_revision(model_name, model_path)
+    key = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}-{revision}")
+    return os.path.join(ONNX_CACHE_DIR, key)
+
+
+def _pooling_mode(st_model) -> str:
+    for module in st_model:
+        if type(module).__name__ == "Pooling":
+            if getattr(module, "pooling_mode_cls_token", False):
+                return "cls"
+            if getattr(module, "pooling_mode_lasttoken", False):
+                return "lasttoken"
+            return "mean"
+    return "mean"
+
+
+def export_sentence_transformer(st_model, export_dir: str):
+    """
+    Export a loaded SentenceTransformer to `export_dir` as a single pooled, normalized ONNX graph.
+
+    Args:
+        st_model: The SentenceTransformer to export (on the CPU)
+        export_dir: Directory receiving the graph, tokenizer and config
+    """
+    import torch
+
+    transformer = st_model[0]
+    pooling = _pooling_mode(st_model)
+
+    class PooledEncoder(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask):
+            tokens = self.auto_model(input_ids=input_ids, attention_mask=attention_mask)[0]
+            if pooling == "cls":
+                embedding = tokens[:, 0]
+            elif pooling == "lasttoken":
+                # Index of the last attended token works for left and right padding
+                positions = torch.arange(tokens.shape[1], device=tokens.device).unsqueeze(0)
+                last = (positions * attention_mask).argmax(dim=1)
+                embedding = tokens[torch.arange(tokens.shape[0], device=tokens.device), last]
+            else:
+                mask = attention_mask.unsqueeze(-1).to(tokens.dtype)
+                embedding = (tokens * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            return torch.nn.functional.normalize(embedding, p=2, dim=1)
+
+    tmp_dir = f"{export_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    encoder = PooledEncoder(transformer.auto_model).eval()
+    sample = transformer.tokenizer(["def main(): pass", "class A {}"], padding=True, return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (sample["input_ids"], sample["attention_mask"]),
+            os.path.join(tmp_dir, ONNX_MODEL_FILENAME),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["embedding"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "embedding": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+
+    transformer.tokenizer.save_pretrained(tmp_dir)
+    with open(os.path.join(tmp_dir, ONNX_CONFIG_FILENAME), "w") as f:
+        json.dump({
+            "pooling": pooling,
+            "max_seq_length": transformer.max_seq_length,
+            "prompts": dict(getattr(st_model, "prompts", None) or {}),
+        }, f)
+
+    shutil.rmtree(export_dir, ignore_errors=True)
+    os.replace(tmp_dir, export_dir)
+
+
+def _quantize_export(export_dir: str) -> str:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = os.path.join(export_dir, ONNX_INT8_MODEL_FILENAME)
+    if not os.path.exists(int8_path):
+        print(f"Quantizing ONNX graph in {export_dir} to int8...")
+        tmp_path = f"{int8_path}.tmp"
+        quantize_dynamic(os.path.join(export_dir, ONNX_MODEL_FILENAME), tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+class OnnxEncoder:
+    """Runs an exported embedding model with onnxruntime's CPU execution provider."""
+
+    def __init__(self, export_dir: str, quantize: bool = False):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(export_dir, ONNX_CONFIG_FILENAME), "r") as f:
+            config = json.load(f)
+        self.max_seq_length = config["max_seq_length"]
+        self.prompts = config.get("prompts", {})
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        self._model_file = _quantize_export(export_dir) if quantize else os.path.join(export_dir, ONNX_MODEL_FILENAME)
+        # One request is served by all cores; concurrent requests queue on the session
+        self.threads = int(os.environ.get("ONNX_INTRA_OP_THREADS", os.cpu_count() or 1))
+        self.session = self._create_session()
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        # Embedding dimension from the graph; a symbolic one is measured on first use
+        dim = self.session.get_outputs()[0].shape[-1]
+        self._dim = dim if isinstance(dim, int) else None
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = int(os.environ.get("ONNX_INTER_OP_THREADS", 1))
+        return ort.InferenceSession(self._model_file, sess_options=options, providers=["CPUExecutionProvider"])
+
+    def set_threads(self, threads: int):
+        """Recreate the session with an intra-op pool of `threads`; a session's pool is fixed when it's created."""
+        if threads != self.threads:
+            self.threads = threads
+            self.session = self._create_session()
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            self._dim = int(self.embed_features(self.tokenize([""])).shape[1])
+        return self._dim
+
+    def tokenize(self, texts: List[str]) -> dict:
+        """Session inputs for a batch of texts."""
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feed = {name: encoded[name].astype(np.int64) for name in ("input_ids", "attention_mask")}
+        return {name: value for name, value in feed.items() if name in self._input_names}
+
+    def embed_features(self, features: dict) -> np.ndarray:
+        """Run the session on inputs returned by `tokenize`."""
+        return self.session.run(["embedding"], features)[0]
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        prompt_name: Optional[str] = None,
+        **kwargs,
+    ) -> np.ndarray:
+        """
+        Embed one text or a list of texts.
+
+        Args:
+            sentences: A single text or a list of texts
+            batch_size: Number of texts per inference call
+            show_progress_bar: Accepted for compatibility with SentenceTransformer.encode
+            prompt_name: Key of a prompt stored with the model, prepended to every text
+
+        Returns:
+            A float32 vector for a single text, otherwise a (len(sentences), dim) matrix
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        prefix = self.prompts.get(prompt_name, "") if prompt_name else ""
+        texts = [prefix + text for text in texts]
+
+        # Batch texts of similar length together to minimize padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), max(batch_size, 1)):
+            batch = order[start:start + batch_size]
+            embeddings = self.embed_features(self.tokenize([texts[i] for i in batch]))
+            for i, embedding in zip(batch, embeddings):
+                vectors[i] = embedding
+
+        if single:
+            return vectors[0]
+        return np.stack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+
+
+def load_onnx_encoder(
+    model_name: str,
+    model_path: str,
+    load_float: Callable[[], object],
+    quantize: bool = False,
+) -> OnnxEncoder:
+    """
+    Load the cached ONNX export of `model_name`, exporting it first if needed.
+
+    Args:
+        model_name: Hub name of the model, used for the cache key
+        model_path: Resolved local snapshot (or hub name) the float model is loaded from
+        load_float: Loads the SentenceTransformer on the CPU when there's no export yet
+        quantize: Run a dynamically int8-quantized copy of the graph
+
+    Returns:
+        An encoder with the same `encode` API the providers use
+    """
+    export_dir = _export_dir(model_name, model_path)
+    if not os.path.exists(os.path.join(export_dir, ONNX_CONFIG_FILENAME)):
+        print(f"Exporting {model_name} to ONNX in {export_dir}...")
+        export_sentence_transformer(load_float(), export_dir)
+    else:
+        print(f"Using ONNX export of {model_name} from {export_dir}")
+    return OnnxEncoder(export_dir, quantize=quantize)
@@ -0,0 +1,114 @@
+"""
+Opt-in dynamic int8 quantization of the embedding models for CPU inference.
+
+The linear layers of a loaded model are replaced by dynamically quantized
+int8 versions. The quantized module is cached on disk so later processes can
+load it directly instead of loading the float weights and quantizing again.
+"""
+import os
+import re
+import logging
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from code_search.config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_CACHE_DIR = os.environ.get("QUANTIZED_CACHE_DIR", os.path.join(DATA_DIR, "quantized"))
+
+
+def quantization_enabled(quantize: Optional[bool] = None) -> bool:
+    """Resolve an explicit `quantize` argument or fall back to the EMBEDDING_QUANTIZE variable."""
+    if quantize is not None:
+        return quantize
+    return os.environ.get("EMBEDDING_QUANTIZE", "").lower() in ("1", "true", "yes")
+
+
+def _cache_path(model_name: str, model_path: str) -> str:
+    import torch
+
+    # The snapshot directory name changes with the model revision
+    revision = os.path.basename(os.path.normpath(model_path)) if os.path.isdir(model_path) else "hub"
+    key = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}-{revision}-torch{torch.__version__}")
+    return os.path.join(QUANTIZED_CACHE_DIR, f"{key}.int8.pt")
+
+
+def quantize_model(model):
+    """Apply dynamic int8 quantization to every linear layer of `model`."""
+    import torch
+
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_quantized(model_name: str, model_path: str, load_float: Callable[[], object]):
+    """
+    Load the cached int8 model for `model_name`, or build and cache it.
+
+    Args:
+        model_name: Hub name of the model, used for the cache key
+        model_path: Resolved local snapshot (or hub name) the float model is loaded from
+        load_float: Loads the float model on the CPU when there's no usable cache
+
+    Returns:
+        The quantized model
+    """
+    import torch
+
+    cache_file = _cache_path(model_name, model_path)
+    if os.path.exists(cache_file):
+        try:
+            model = torch.load(cache_file, map_location="cpu", weights_only=False)
+            model.eval()
+            print(f"Loaded quantized {model_name} from {cache_file}")
+            return model
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable quantized cache {cache_file}: {e}")
+
+    print(f"Quantizing {model_name} to int8...")
+    model = quantize_model(load_float())
+
+    try:
+        os.makedirs(QUANTIZED_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        torch.save(model, tmp_file)
+        os.replace(tmp_file, cache_file)
+        print(f"Cached quantized {model_name} at {cache_file}")
+    except Exception as e:
+        logger.warning(f"Could not cache quantized {model_name}: {e}")
+    return model
+
+
+def recall_at_k(
+    reference_queries: np.ndarray,
+    reference_corpus: np.ndarray,
+    candidate_queries: np.ndarray,
+    candidate_corpus: np.ndarray,
+    k: int = 10,
+) -> float:
+    """
+    Fraction of the reference top-k results that the candidate embeddings also return in their top-k.
+
+    Args:
+        reference_queries: Query embeddings of the float model
+        reference_corpus: Corpus embeddings of the float model
+        candidate_queries: Query embeddings of the quantized model
+        candidate_corpus: Corpus embeddings of the quantized model
+        k: Number of results compared per query
+
+    Returns:
+        Mean recall@k over all queries
+    """
+    def top_k(queries: np.ndarray, corpus: np.ndarray) -> List[set]:
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        corpus = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        scores = queries @ corpus.T
+        limit = min(k, corpus.shape[0])
+        return [set(row) for row in np.argsort(-scores, axis=1)[:, :limit]]
+
+    reference = top_k(reference_queries, reference_corpus)
+    candidate = top_k(candidate_queries, candidate_corpus)
+    hits = [len(ref & cand) / len(ref) for ref, cand in zip(reference, candidate) if ref]
+    return float(np.mean(hits)) if hits else 1.0
@@ -93,9 +93,12 @@ class UniXcoder(nn.Module):
             predictions.append(prediction)
         return predictions
 
-    def forward(self, source_ids):
+    def forward(self, source_ids, attention_mask=None):
         """Obtain token embeddings and sentence embeddings"""
-        mask = source_ids.ne(self.config.pad_token_id)
+        if attention_mask is None:
+            mask = source_ids.ne(self.config.pad_token_id)
+        else:
+            mask = attention_mask.bool()
         token_embeddings = self.model(
             source_ids, attention_mask=mask.unsqueeze(1) * mask.unsqueeze(2)
         )[0]
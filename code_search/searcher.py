@@ -19,7 +19,7 @@ class CodeSearcher:
         self.encoder = UniXcoderEmbeddingsProvider("cpu")
 
     def search(self, query, limit=5) -> List[dict]:
-        vector = self.encoder.embed_code(docstring=query)
+        vector = self.encoder.encode_queries([query], batch_size=1)[0]
         result = self.client.search(
             collection_name=self.collection_name,
             query_vector=vector,
@@ -1,16 +1,21 @@
 import os
 import tempfile
-from typing import List
+import threading
+from typing import TYPE_CHECKING, Callable, List
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from code_search.config import ROOT_DIR
-from code_search.searcher import CombinedSearcher
 from code_search.get_file import FileGet
-from code_search.merge_codes import merge_search_results
+from code_search.merge_codes import iter_merged_chunks
+from code_search.warmup import Warmup
+
+if TYPE_CHECKING:
+    from code_search.searcher import CombinedSearcher
 
 app = FastAPI()
 
@@ -23,20 +28,65 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-searcher = CombinedSearcher()
-get_file = FileGet()
+# Encoders are loaded on a background thread once the server is listening.
+# Each service has its own lock, so loading the encoders doesn't hold up /api/file.
+_services = {}
+_service_locks = {"searcher": threading.Lock(), "file": threading.Lock()}
+
+
+def _get_service(name: str, factory: Callable):
+    with _service_locks[name]:
+        if name not in _services:
+            _services[name] = factory()
+        return _services[name]
+
+
+def _create_searcher() -> "CombinedSearcher":
+    # Imported here: the searcher pulls in torch, sentence_transformers and the encoders
+    from code_search.searcher import CombinedSearcher
+
+    return CombinedSearcher()
+
+
+def get_searcher() -> "CombinedSearcher":
+    return _get_service("searcher", _create_searcher)
+
+
+def get_file_getter() -> FileGet:
+    return _get_service("file", FileGet)
+
+
+warmup = Warmup()
+warmup.add_step("searcher", get_searcher)
+warmup.add_step("files", get_file_getter)
+
+
+@app.on_event("startup")
+def start_warmup():
+    warmup.start()
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
 
 @app.get("/api/search")
-async def search(query: str):
+def search(query: str):
     return {
-        "result": searcher.search(query, limit=30)
+        "result": get_searcher().search(query, limit=30)
     }
 
 @app.get("/api/file")
-async def file(path: str):
+def file(path: str):
     return {
-        "result": get_file.get(path)
+        "result": get_file_getter().get(path)
     }
 
 class MergeRequest(BaseModel):
@@ -45,10 +95,10 @@ class MergeRequest(BaseModel):
 @app.post("/api/merge-codes")
 async def merge_codes(request: MergeRequest):
     temp_file = os.path.join(tempfile.gettempdir(), "merged_code.txt")
-    merged_content = merge_search_results(request.file_paths, temp_file)
-    return {
-        "result": merged_content
-    }
+    return StreamingResponse(
+        iter_merged_chunks(request.file_paths, temp_file),
+        media_type="text/plain; charset=utf-8"
+    )
 
 # Mount the static files AFTER registering all API routes
 app.mount("/", StaticFiles(directory=os.path.join(ROOT_DIR, 'frontend', 'dist'), html=True))
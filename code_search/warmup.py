@@ -0,0 +1,56 @@
+"""
+Background warm-up of the heavy parts of a service (indexes, models) so the
+HTTP server can start accepting connections immediately.
+"""
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Runs named warm-up steps in order on a background thread and tracks readiness."""
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], object]]] = []
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_step(self, name: str, func: Callable[[], object]):
+        self._steps.append((name, func))
+        self._state[name] = {"status": "pending", "seconds": None, "error": None}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name, func in self._steps:
+            with self._lock:
+                self._state[name]["status"] = "running"
+            start = time.time()
+            try:
+                func()
+                status, error = "ready", None
+                logger.info(f"Warm-up step '{name}' finished in {time.time() - start:.2f}s")
+            except Exception as e:
+                status, error = "failed", str(e)
+                logger.exception(f"Warm-up step '{name}' failed")
+            with self._lock:
+                self._state[name].update(status=status, seconds=round(time.time() - start, 3), error=error)
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(step["status"] == "ready" for step in self._state.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": all(step["status"] == "ready" for step in self._state.values()),
+                "steps": {name: dict(step) for name, step in self._state.items()},
+            }
@@ -10,8 +10,12 @@ export const GENERATE_EMBEDDINGS_URL = `${API_V1}generate-embeddings`;
 
 export const EMBEDDING_STATUS_URL = `${API_V1}embedding-status`;
 
+export const EMBEDDING_EVENTS_URL = `${API_V1}embedding-events`;
+
 export const GENERATE_STRUCTURES_URL = `${API_V1}generate-structures`;
 
 export const STRUCTURE_STATUS_URL = `${API_V1}structure-status`;
 
+export const STRUCTURE_EVENTS_URL = `${API_V1}structure-events`;
+
 export const AVAILABLE_EMBEDDINGS_URL = `${API_V1}available-embeddings`;
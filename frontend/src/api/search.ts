@@ -42,7 +42,8 @@ export const getSearchResult = (searchRequest:SearchRequest) => {
 };
 
 export const mergeCodes = (mergeRequest: MergeRequest) => {
-    return Axios().post(MERGE_CODES_URL, mergeRequest);
+    // The merged code is streamed back as plain text
+    return Axios().post<string>(MERGE_CODES_URL, mergeRequest, { responseType: "text" });
 };
 
 export const generateEmbeddings = (embeddingRequest: EmbeddingRequest) => {
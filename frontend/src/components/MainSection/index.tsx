@@ -148,11 +148,11 @@ export default function Main() {
     try {
       const response = await mergeCodes({ file_paths: filePaths });
       console.log("Merge response:", response);
-      if (response.data?.result) {
-        console.log("Merged content length:", response.data.result.length);
-        console.log("Content preview:", response.data.result.substring(0, 100) + "...");
+      if (response.data) {
+        console.log("Merged content length:", response.data.length);
+        console.log("Content preview:", response.data.substring(0, 100) + "...");
         
-        const success = await copyToClipboard(response.data.result);
+        const success = await copyToClipboard(response.data);
         console.log("Clipboard copy result:", success);
         if (success) {
           setClipboardNotification({
@@ -19,7 +19,7 @@ import useStructureGeneration from '@/hooks/useStructureGeneration';
 export const StructureGeneration = () => {
   const [targetDir, setTargetDir] = useState('');
   const [pattern, setPattern] = useState('**/*.py');
-  const [maxLines, setMaxLines] = useState(500);
+  const [maxLines, setMaxLines] = useState(0);
   const [force, setForce] = useState(false);
   
   const { 
@@ -128,10 +128,10 @@ export const StructureGeneration = () => {
         
         <NumberInput
           label="Max Lines"
-          description="Maximum lines per code block"
+          description="Maximum lines per code block (0 keeps all; long blocks are split into windows)"
           value={maxLines}
-          onChange={(value) => setMaxLines(typeof value === 'number' ? value : 500)}
-          min={10}
+          onChange={(value) => setMaxLines(typeof value === 'number' ? value : 0)}
+          min={0}
           max={2000}
           disabled={isRunning}
           mb="md"
@@ -139,7 +139,7 @@ export const StructureGeneration = () => {
         
         <Switch
           label="Force regeneration"
-          description="Generate structures even if they already exist"
+          description="Re-scan every file instead of only the added and changed ones"
           checked={force}
           onChange={(event) => setForce(event.currentTarget.checked)}
           disabled={isRunning}
@@ -1,5 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import { generateEmbeddings, getEmbeddingStatus } from '@/api/search';
+import { EMBEDDING_EVENTS_URL } from '@/api/constants';
 
 type EmbeddingStatus = {
   status: 'idle' | 'running' | 'completed' | 'failed';
@@ -9,6 +10,8 @@ type EmbeddingStatus = {
   end_time: number | null;
   total?: number;
   processed?: number;
+  items_per_second?: number;
+  eta_seconds?: number | null;
 };
 
 type EmbeddingOptions = {
@@ -86,23 +89,32 @@ export const useEmbeddingGeneration = () => {
     setIsPolling(false);
   }, []);
   
-  // Poll for status updates
+  // Follow progress events streamed by the server while a job is running
   useEffect(() => {
-    let intervalId: NodeJS.Timeout | null = null;
-    
-    if (isPolling) {
-      // Fetch immediately when polling starts
-      fetchStatus(); 
-      intervalId = setInterval(fetchStatus, 500); // Poll every 500ms
+    if (!isPolling) {
+      return;
     }
     
+    const source = new EventSource(`/${EMBEDDING_EVENTS_URL}`);
+    source.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      setStatus(prevStatus => ({ ...prevStatus, ...data }));
+      
+      // Stop listening when completed or failed
+      if (data.status === 'completed' || data.status === 'failed') {
+        source.close();
+        setIsPolling(false);
+      }
+    };
+    source.onerror = () => {
+      console.error('Lost embedding progress stream, reconnecting...');
+    };
+    
     // Cleanup
     return () => {
-      if (intervalId) {
-        clearInterval(intervalId);
-      }
+      source.close();
     };
-  }, [isPolling, fetchStatus]); // fetchStatus is stable due to useCallback with empty deps
+  }, [isPolling]);
   
   // Check status on initial mount
   useEffect(() => {
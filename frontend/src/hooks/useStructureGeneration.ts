@@ -1,5 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import { generateStructures, getStructureStatus } from '@/api/search';
+import { STRUCTURE_EVENTS_URL } from '@/api/constants';
 
 type StructureStatus = {
   status: 'idle' | 'running' | 'completed' | 'failed';
@@ -9,6 +10,8 @@ type StructureStatus = {
   end_time: number | null;
   total?: number;
   processed?: number;
+  items_per_second?: number;
+  eta_seconds?: number | null;
 };
 
 type StructureOptions = {
@@ -85,23 +88,32 @@ export const useStructureGeneration = () => {
     setIsPolling(false);
   }, []);
   
-  // Poll for status updates
+  // Follow progress events streamed by the server while a job is running
   useEffect(() => {
-    let intervalId: NodeJS.Timeout | null = null;
-    
-    if (isPolling) {
-      intervalId = setInterval(() => {
-        fetchStatus();
-      }, 1000); // Poll every second
+    if (!isPolling) {
+      return;
     }
     
+    const source = new EventSource(`/${STRUCTURE_EVENTS_URL}`);
+    source.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      setStatus(data);
+      
+      // Stop listening when completed or failed
+      if (data.status === 'completed' || data.status === 'failed') {
+        source.close();
+        setIsPolling(false);
+      }
+    };
+    source.onerror = () => {
+      console.error('Lost structure progress stream, reconnecting...');
+    };
+    
     // Cleanup
     return () => {
-      if (intervalId) {
-        clearInterval(intervalId);
-      }
+      source.close();
     };
-  }, [isPolling, fetchStatus]);
+  }, [isPolling]);
   
   // Check status on initial mount
   useEffect(() => {
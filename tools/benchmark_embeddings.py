@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the embedding providers.
+
+Every model in AVAILABLE_MODELS (nomic, qodo, jina) and the UniXcoder provider
+embeds a fixed synthetic snippet set and a sample of the real structures in
+data/structures.json, for every combination of --threads and --batch-sizes.
+Each (model, threads) pair runs in its own process, so the torch thread pool
+is set before torch is imported and the model load time and memory are not
+shared between configurations.
+
+Measured per configuration:
+- items/s and tokens/s of embedding the snippet set
+- p50/p99 latency of embedding one query
+- peak RSS of the process (batch sizes run in ascending order, so the peak
+  of a batch size includes everything that ran before it)
+- model load time
+
+The results are written as JSON to data/benchmarks/ (or --output).
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import resource
+import argparse
+import traceback
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from code_search.config import DATA_DIR
+from code_search.index.generate_embeddings import AVAILABLE_MODELS
+
+PROVIDERS = {model: config["provider"] for model, config in AVAILABLE_MODELS.items()}
+PROVIDERS["unixcoder"] = "code_search.model.encoder.UniXcoderEmbeddingsProvider"
+
+BENCHMARK_DIR = os.path.join(DATA_DIR, "benchmarks")
+
+SYNTHETIC_QUERIES = [
+    "fetch surah list from api",
+    "parse json response",
+    "play audio recitation",
+    "save bookmark to local storage",
+    "build list view of verses",
+    "handle network error",
+    "convert arabic numerals",
+    "search verses by keyword",
+]
+
+
+def synthetic_snippets(count: int, seed: int):
+    """Deterministic code-like snippets of mixed length, from one line to a few hundred tokens."""
+    rng = random.Random(seed)
+    words = ["surah", "verse", "audio", "player", "index", "cache", "request", "result", "item", "state"]
+    snippets = []
+    for i in range(count):
+        name = f"{rng.choice(words)}{rng.choice(words).title()}{i}"
+        body = "\n".join(
+            f"  final {rng.choice(words)}{j} = {rng.choice(words)}.{rng.choice(words)}({j});"
+            for j in range(rng.choice([1, 4, 16, 48]))
+        )
+        snippets.append({
+            "code": f"Future<void> {name}() async {{\n{body}\n}}",
+            "docstring": f"/// Loads the {rng.choice(words)} for {rng.choice(words)}.",
+        })
+    return snippets
+
+
+def real_snippets(structures_file: str, count: int, seed: int):
+    if not os.path.exists(structures_file):
+        return []
+    with open(structures_file, 'r') as f:
+        structures = json.load(f)
+    if len(structures) > count:
+        structures = random.Random(seed).sample(structures, count)
+    return [{"code": s.get("snippet") or "", "docstring": s.get("docstring") or ""} for s in structures]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _count_tokens(provider, texts) -> int:
+    if hasattr(provider, "tokenize_batch"):
+        features = provider.tokenize_batch(texts)
+        if isinstance(features, dict) and "attention_mask" in features:
+            return int(np.asarray(features["attention_mask"]).sum())
+    # Fallback embeddings work on words
+    return sum(len(f"{t['docstring']} {t['code']}".split()) for t in texts)
+
+
+def _embed(provider, texts, batch_size: int):
+    if hasattr(provider, "encode_documents"):
+        for start in range(0, len(texts), batch_size):
+            provider.encode_documents(texts[start:start + batch_size], batch_size=batch_size)
+    elif hasattr(provider, "embed_batch"):
+        for start in range(0, len(texts), batch_size):
+            provider.embed_batch(texts[start:start + batch_size], batch_size=batch_size)
+    else:
+        for text in texts:
+            provider.embed_code(code=text["code"], docstring=text["docstring"])
+
+
+def _embed_query(provider, query: str):
+    if hasattr(provider, "encode_queries"):
+        return provider.encode_queries([query], batch_size=1)
+    if hasattr(provider, "embed_query"):
+        return provider.embed_query(query)
+    return provider.embed_code(docstring=query)
+
+
+def _worker_main(model: str, threads: int, batch_sizes, snippet_sets, queries, use_gpu: bool, results):
+    try:
+        from code_search.index.parallel_embeddings import _pin_threads
+
+        _pin_threads(threads)
+        import importlib
+
+        module_name, class_name = PROVIDERS[model].rsplit(".", 1)
+        rss_before_load = _peak_rss_mb()
+        start = time.time()
+        provider = getattr(importlib.import_module(module_name), class_name)(device="cuda" if use_gpu else "cpu")
+        load_seconds = time.time() - start
+        rss_after_load = _peak_rss_mb()
+
+        # One untimed call warms up lazy initialization and allocator pools
+        _embed(provider, snippet_sets[next(iter(snippet_sets))][:1], 1)
+        tokens = {name: _count_tokens(provider, texts) for name, texts in snippet_sets.items()}
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            _embed_query(provider, query)
+            latencies.append(time.perf_counter() - start)
+
+        runs = []
+        for batch_size in sorted(batch_sizes):
+            for name, texts in snippet_sets.items():
+                start = time.perf_counter()
+                _embed(provider, texts, batch_size)
+                seconds = time.perf_counter() - start
+                runs.append({
+                    "model": model,
+                    "threads": threads,
+                    "batch_size": batch_size,
+                    "snippet_set": name,
+                    "items": len(texts),
+                    "tokens": tokens[name],
+                    "seconds": seconds,
+                    "items_per_second": len(texts) / seconds if seconds else None,
+                    "tokens_per_second": tokens[name] / seconds if seconds else None,
+                    "peak_rss_mb": _peak_rss_mb(),
+                })
+
+        results.put(("done", {
+            "model": model,
+            "threads": threads,
+            "load_seconds": load_seconds,
+            "load_rss_mb": rss_after_load - rss_before_load,
+            "query_latency_ms": {
+                "p50": float(np.percentile(latencies, 50)) * 1000,
+                "p99": float(np.percentile(latencies, 99)) * 1000,
+            },
+            "runs": runs,
+        }))
+    except BaseException:
+        results.put(("error", traceback.format_exc()))
+
+
+def run_configuration(model: str, threads: int, batch_sizes, snippet_sets, queries, use_gpu: bool = False,
+                      timeout: float = None) -> dict:
+    """Benchmark `model` with `threads` torch threads in a fresh process."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_worker_main,
+        args=(model, threads, batch_sizes, snippet_sets, queries, use_gpu, results),
+        name=f"benchmark-{model}-{threads}",
+        daemon=True,
+    )
+    process.start()
+    deadline = time.time() + timeout if timeout else None
+    try:
+        while True:
+            try:
+                kind, payload = results.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"Benchmark process for {model} exited with code {process.exitcode}")
+                if deadline and time.time() > deadline:
+                    raise RuntimeError(f"Benchmark of {model} with {threads} threads timed out")
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    if kind == "error":
+        raise RuntimeError(f"Benchmark of {model} with {threads} threads failed:\n{payload}")
+    return payload
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark embedding providers across batch sizes and thread counts")
+    parser.add_argument("--models", nargs="+", choices=list(PROVIDERS.keys()), default=list(PROVIDERS.keys()),
+                        help="Models to benchmark (default: all)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32], help="Batch sizes (default: 1 8 32)")
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted({1, max(1, cpu_count // 2), cpu_count}),
+                        help="Torch thread counts (default: 1, half and all cores)")
+    parser.add_argument("--synthetic", type=int, default=64, help="Number of synthetic snippets (default: 64)")
+    parser.add_argument("--real", type=int, default=64, help="Number of real structures to sample (default: 64)")
+    parser.add_argument("--structures", default=os.path.join(DATA_DIR, "structures.json"), help="Real structures")
+    parser.add_argument("--queries", type=int, default=50, help="Single queries timed for latency (default: 50)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the snippet sets")
+    parser.add_argument("--gpu", action="store_true", help="Run the models on CUDA")
+    parser.add_argument("--timeout", type=float, help="Seconds allowed per model and thread count")
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/embeddings-<timestamp>.json)")
+    args = parser.parse_args()
+
+    snippet_sets = {"synthetic": synthetic_snippets(args.synthetic, args.seed)}
+    real = real_snippets(args.structures, args.real, args.seed)
+    if real:
+        snippet_sets["real"] = real
+    else:
+        print(f"Warning: {args.structures} not found, benchmarking synthetic snippets only")
+    queries = [SYNTHETIC_QUERIES[i % len(SYNTHETIC_QUERIES)] for i in range(args.queries)]
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": cpu_count,
+        "platform": sys.platform,
+        "snippet_sets": {name: len(texts) for name, texts in snippet_sets.items()},
+        "queries": len(queries),
+        "results": [],
+        "errors": [],
+    }
+    for model in args.models:
+        for threads in args.threads:
+            print(f"Benchmarking {model} with {threads} threads...")
+            try:
+                result = run_configuration(model, threads, args.batch_sizes, snippet_sets, queries, args.gpu,
+                                           args.timeout)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                report["errors"].append({"model": model, "threads": threads, "error": str(e)})
+                continue
+            report["results"].append(result)
+            print(f"  load {result['load_seconds']:.1f}s, query p50 {result['query_latency_ms']['p50']:.1f} ms, "
+                  f"p99 {result['query_latency_ms']['p99']:.1f} ms")
+            for run in result["runs"]:
+                print(f"  batch {run['batch_size']:>3} {run['snippet_set']:<9} "
+                      f"{run['items_per_second'] or 0:8.2f} items/s {run['tokens_per_second'] or 0:10.1f} tokens/s "
+                      f"peak RSS {run['peak_rss_mb']:.0f} MB")
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"embeddings-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Dart structure scanner against the line-based extractor it replaced.
+
+Both extractors process the same files under --target-dir, already read into
+memory, so only the extraction itself (including building the structure
+records) is timed. The report lists the time,
+files/s and MB/s of each extractor over --repeat runs (best run), the number of
+structures each one finds, and how many structures agree on their line span.
+It is written as JSON to data/benchmarks/ (or --output).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from code_search.config import DATA_DIR
+from code_search.index.generate_structures import extract_code_structures, find_source_files
+
+BENCHMARK_DIR = os.path.join(DATA_DIR, "benchmarks")
+
+
+def line_based_structures(code: str, file_path: str, target_dir: str):
+    """The extractor the scanner replaced: substring checks and brace counts per line."""
+    relative_path = os.path.relpath(file_path, start=target_dir)
+    file_name = os.path.basename(file_path)
+    dir_path = os.path.dirname(file_path)
+    module = os.path.basename(dir_path) if dir_path else ""
+
+    code_structures = []
+    lines = code.split('\n')
+    line_index = 0
+
+    while line_index < len(lines):
+        # Look for class or function definitions
+        if ('class ' in lines[line_index] or
+                'void ' in lines[line_index] or
+                'Future<' in lines[line_index] or
+                'Stream<' in lines[line_index] or
+                'Widget ' in lines[line_index]):
+            start_line = line_index
+            brace_count = 0
+            end_line = start_line
+
+            # Collect docstring if any (usually before the definition)
+            docstring = ""
+            if start_line > 0 and "///" in lines[start_line - 1]:
+                comment_lines = []
+                i = start_line - 1
+                while i >= 0 and "///" in lines[i]:
+                    comment_lines.insert(0, lines[i].strip("/ "))
+                    i -= 1
+                docstring = "\n".join(comment_lines)
+
+            # Find the end of the definition
+            while end_line < len(lines):
+                line = lines[end_line]
+                brace_count += line.count('{') - line.count('}')
+                if brace_count <= 0 and '{' in line:
+                    break
+                end_line += 1
+
+            if end_line < len(lines) and '{' in lines[end_line]:
+                # Find matching closing brace
+                brace_count = 1
+                end_line += 1
+
+                while end_line < len(lines) and brace_count > 0:
+                    line = lines[end_line]
+                    brace_count += line.count('{') - line.count('}')
+                    end_line += 1
+
+                if brace_count <= 0:
+                    end_line -= 1
+
+                structure_type = "class" if "class " in lines[start_line] else "function"
+                name = lines[start_line].split("class ")[1].split("{")[0].strip() if "class " in lines[start_line] else lines[start_line].split("(")[0].split(" ")[-1].strip()
+                code_structures.append({
+                    "structure_type": structure_type,
+                    "name": name,
+                    "docstring": docstring,
+                    "module": module,
+                    "file_path": relative_path,
+                    "file_name": file_name,
+                    "line": start_line + 1,
+                    "line_from": start_line + 1,
+                    "line_to": end_line + 1,
+                    "snippet": "\n".join(lines[start_line:end_line + 1]),
+                })
+                line_index = end_line
+
+        line_index += 1
+
+    return code_structures
+
+
+EXTRACTORS = {
+    "line_based": line_based_structures,
+    "scanner": extract_code_structures,
+}
+
+
+def run(extract, sources, target_dir: str, repeat: int):
+    """Best time of `repeat` runs of `extract` over `sources`, and the (line_from, line_to) spans it found per file."""
+    best, structures = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        structures = {path: extract(code, path, target_dir) for path, code in sources.items()}
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    spans = {path: {(s["line_from"], s["line_to"]) for s in file_structures} for path, file_structures in structures.items()}
+    return best, spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Dart structure extraction")
+    parser.add_argument("--target-dir", required=True, help="Codebase to extract structures from")
+    parser.add_argument("--pattern", default="**/*.dart", help="File pattern to process (default: **/*.dart)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per extractor; the best is reported (default: 3)")
+    parser.add_argument("--output", help="Report path (default: data/benchmarks/structures-<timestamp>.json)")
+    args = parser.parse_args()
+
+    sources = {}
+    for file_path in find_source_files(args.target_dir, args.pattern):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                sources[file_path] = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Skipping {file_path}: {e}")
+    megabytes = sum(len(code.encode('utf-8')) for code in sources.values()) / (1024 * 1024)
+    print(f"Benchmarking {len(sources)} files ({megabytes:.2f} MB)")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target_dir": os.path.abspath(args.target_dir),
+        "files": len(sources),
+        "megabytes": megabytes,
+        "results": {},
+    }
+    spans = {}
+    for name, extract in EXTRACTORS.items():
+        seconds, spans[name] = run(extract, sources, args.target_dir, max(1, args.repeat))
+        structures = sum(len(file_spans) for file_spans in spans[name].values())
+        report["results"][name] = {
+            "seconds": seconds,
+            "files_per_second": len(sources) / seconds if seconds else None,
+            "megabytes_per_second": megabytes / seconds if seconds else None,
+            "structures": structures,
+        }
+        print(f"{name:<11} {seconds:8.3f}s {len(sources) / seconds if seconds else 0:10.1f} files/s "
+              f"{megabytes / seconds if seconds else 0:8.2f} MB/s {structures:7d} structures")
+
+    same = sum(len(spans["line_based"][path] & spans["scanner"][path]) for path in sources)
+    report["matching_spans"] = same
+    print(f"{same} structures have the same line span in both extractors")
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"structures-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Measure the quality cost of int8 quantization for an embedding model.
+
+Both the float and the quantized model embed the same corpus (the code
+structures in data/structures.json) and a held-out query set. The script
+reports recall@k of the quantized search results against the float ones,
+along with the average query latency of both models.
+
+Queries are read from --queries (one per line) or derived from the
+structure names, which never appear verbatim as a corpus text.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from code_search.config import DATA_DIR
+from code_search.local_index import iter_structure_records
+from code_search.model.quantize import recall_at_k
+
+PROVIDERS = {
+    "qodo": ("code_search.model.qodo_embed", "QodoEmbeddingsProvider"),
+    "nomic": ("code_search.model.nomic_embed", "NomicEmbeddingsProvider"),
+    "jina": ("code_search.model.jina_embed", "JinaEmbeddingsProvider"),
+    "unixcoder": ("code_search.model.encoder", "UniXcoderEmbeddingsProvider"),
+}
+
+
+def load_provider(model: str, quantize: bool):
+    import importlib
+
+    module_name, class_name = PROVIDERS[model]
+    return getattr(importlib.import_module(module_name), class_name)(device="cpu", quantize=quantize)
+
+
+def name_to_query(name: str) -> str:
+    # "FetchSurahList" -> "fetch surah list"
+    words = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", name).replace("_", " ")
+    return " ".join(re.findall(r"[A-Za-z0-9]+", words)).lower()
+
+
+def build_queries(structures, count: int, seed: int):
+    queries = sorted({name_to_query(s.get("name", "")) for s in structures} - {""})
+    random.Random(seed).shuffle(queries)
+    return queries[:count]
+
+
+def embed_queries(provider, queries):
+    vectors = []
+    start = time.time()
+    for query in queries:
+        if hasattr(provider, "embed_query"):
+            vectors.append(provider.embed_query(query))
+        else:
+            vectors.append(provider.embed_code(docstring=query))
+    latency = (time.time() - start) / max(len(queries), 1)
+    return np.asarray(vectors, dtype=np.float32), latency
+
+
+def embed_corpus(provider, structures):
+    return np.asarray([
+        provider.embed_code(code=s.get("snippet") or "", docstring=s.get("docstring") or "")
+        for s in structures
+    ], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check recall of a quantized embedding model against the float model")
+    parser.add_argument("--model", choices=list(PROVIDERS.keys()), default="qodo", help="Model to check (default: qodo)")
+    parser.add_argument("--structures", default=os.path.join(DATA_DIR, "structures.json"), help="Corpus of code structures")
+    parser.add_argument("--queries", help="File with one held-out query per line")
+    parser.add_argument("--num-queries", type=int, default=50, help="Number of generated queries when --queries is not given")
+    parser.add_argument("--corpus-size", type=int, default=500, help="Maximum number of structures to embed")
+    parser.add_argument("-k", type=int, default=10, help="Compare the top-k results (default: 10)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for sampling queries and corpus")
+    args = parser.parse_args()
+
+    with open(args.structures, "r") as f:
+        # Either structures format, flattened into records with "name", "snippet" and "docstring"
+        structures = [record for _, _, record in iter_structure_records(json.load(f))]
+    if len(structures) > args.corpus_size:
+        structures = random.Random(args.seed).sample(structures, args.corpus_size)
+
+    if args.queries:
+        with open(args.queries, "r") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = build_queries(structures, args.num_queries, args.seed)
+
+    if not structures or not queries:
+        print("Error: need at least one structure and one query")
+        sys.exit(1)
+
+    print(f"Embedding {len(structures)} structures and {len(queries)} queries with the float model...")
+    float_provider = load_provider(args.model, quantize=False)
+    float_corpus = embed_corpus(float_provider, structures)
+    float_queries, float_latency = embed_queries(float_provider, queries)
+    del float_provider
+
+    print("Embedding the same data with the int8 model...")
+    int8_provider = load_provider(args.model, quantize=True)
+    int8_corpus = embed_corpus(int8_provider, structures)
+    int8_queries, int8_latency = embed_queries(int8_provider, queries)
+
+    # Recall of the full quantized pipeline, and of quantized queries against the float index
+    recall = recall_at_k(float_queries, float_corpus, int8_queries, int8_corpus, k=args.k)
+    query_recall = recall_at_k(float_queries, float_corpus, int8_queries, float_corpus, k=args.k)
+
+    print(f"Recall@{args.k} (int8 corpus + queries): {recall:.4f}")
+    print(f"Recall@{args.k} (int8 queries, float corpus): {query_recall:.4f}")
+    print(f"Average query latency: float {float_latency * 1000:.1f} ms, int8 {int8_latency * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
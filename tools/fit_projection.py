@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Fit a PCA projection on a model's embeddings to shrink the local index.
+
+The projection is saved as data/{model}_projection.npz and picked up the next
+time the local index is published: the stored vectors are reduced to the
+chosen number of dimensions and queries are projected at search time.
+The script reports the variance retained and the recall@k of searches over
+the reduced vectors versus the full ones, to help choose the size.
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from code_search.config import DATA_DIR
+from code_search.index.generate_embeddings import AVAILABLE_MODELS
+from code_search.index.projection import fit_model_projection
+from code_search.local_index import model_key_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit a PCA projection to reduce stored embedding vectors")
+    parser.add_argument("--model", type=str, choices=list(AVAILABLE_MODELS.keys()), default="qodo",
+                        help="Model whose embeddings to reduce (default: qodo)")
+    parser.add_argument("--embeddings", type=str, help="Embeddings filename inside the data directory (defaults to the model-specific name)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256], help="Dimensions to keep; the last one is saved (default: 256)")
+    parser.add_argument("--whiten", action="store_true", help="Whiten the projected components")
+    parser.add_argument("-k", type=int, default=10, help="Cut-off of the recall evaluation (default: 10)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    embeddings_file = os.path.join(DATA_DIR, args.embeddings or AVAILABLE_MODELS[args.model]["default_output"])
+    if not os.path.exists(embeddings_file):
+        print(f"Error: {embeddings_file} not found. Please generate embeddings first.")
+        sys.exit(1)
+
+    # Try every requested size, keeping the projection of the last one
+    for dims in args.dims:
+        report = fit_model_projection(model_key_for(embeddings_file), embeddings_file, dims, args.whiten, args.k)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
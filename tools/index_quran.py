@@ -15,6 +15,8 @@ from qdrant_client.http.exceptions import UnexpectedResponse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from code_search.index.textifier import textify
+from code_search.index.generate_structures import iter_file_structures
+from code_search.index.storage import iter_json_array, write_json_array_atomic
 from code_search.config import QDRANT_NLU_COLLECTION_NAME, ENCODER_SIZE, QDRANT_CODE_COLLECTION_NAME
 
 # Set up paths
@@ -83,110 +85,41 @@ def process_flutter_files():
     
     # Get all Dart files
     dart_files = glob.glob(f"{QURAN_CODEBASE_PATH}/**/*.dart", recursive=True)
-    code_structures = []
     
-    for file_path in tqdm(dart_files):
-        try:
-            relative_path = os.path.relpath(file_path, start=QURAN_CODEBASE_PATH)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                code = f.read()
-                
-            # Extract file parts
-            file_name = os.path.basename(file_path)
-            dir_path = os.path.dirname(file_path)
-            module = os.path.basename(dir_path) if dir_path else ""
-            
-            # Process code line by line
-            lines = code.split('\n')
-            line_index = 0
-            
-            while line_index < len(lines):
-                # Look for class or function definitions
-                if line_index < len(lines) and ('class ' in lines[line_index] or 
-                                              'void ' in lines[line_index] or 
-                                              'Future<' in lines[line_index] or
-                                              'Stream<' in lines[line_index] or
-                                              'Widget ' in lines[line_index]):
-                    start_line = line_index
-                    # Look for opening brace
-                    brace_count = 0
-                    end_line = start_line
-                    
-                    # Collect docstring if any (usually before the definition)
-                    docstring = ""
-                    if start_line > 0 and "///" in lines[start_line - 1]:
-                        comment_lines = []
-                        i = start_line - 1
-                        while i >= 0 and "///" in lines[i]:
-                            comment_lines.insert(0, lines[i].strip("/ "))
-                            i -= 1
-                        docstring = "\n".join(comment_lines)
-                    
-                    # Find the end of the definition
-                    while end_line < len(lines):
-                        line = lines[end_line]
-                        brace_count += line.count('{') - line.count('}')
-                        if brace_count <= 0 and '{' in line:
-                            break
-                        end_line += 1
-                    
-                    # Check if we found a complete definition
-                    if end_line < len(lines) and '{' in lines[end_line]:
-                        # Find matching closing brace
-                        brace_count = 1  # We've found an opening brace
-                        end_line += 1
-                        
-                        while end_line < len(lines) and brace_count > 0:
-                            line = lines[end_line]
-                            brace_count += line.count('{') - line.count('}')
-                            end_line += 1
-                        
-                        # Adjust for over-counting
-                        if brace_count <= 0:
-                            end_line -= 1
-                        
-                        # Extract the code segment
-                        code_segment = "\n".join(lines[start_line:end_line+1])
-                        
-                        # Adapt the structure to match what textify expects
-                        signature = lines[start_line].strip()
-                        code_type = "Class" if "class " in lines[start_line] else "Function"
-                        name = signature.split("class ")[1].split("{")[0].strip() if "class " in signature else signature.split("(")[0].split(" ")[-1].strip()
-                        
-                        structure = {
-                            "code_type": code_type,
-                            "name": name,
-                            "signature": signature,
-                            "docstring": docstring,
-                            "module": module,
-                            "line": start_line + 1,
-                            "line_from": start_line + 1,
-                            "line_to": end_line + 1,
-                            "context": {
-                                "module": module,
-                                "file_path": relative_path,
-                                "file_name": file_name,
-                                "struct_name": None,
-                                "snippet": code_segment
-                            }
-                        }
-                        
-                        code_structures.append(structure)
-                        line_index = end_line
-                
-                line_index += 1
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+    # Files are scanned in parallel and their structures streamed to the file in order
+    with tqdm(total=len(dart_files)) as pbar:
+        structures = iter_file_structures(dart_files, QURAN_CODEBASE_PATH,
+                                          progress=lambda done, total: pbar.update(done - pbar.n))
+        count = write_json_array_atomic(STRUCTURES_JSON_PATH, (to_textify_structure(s) for s in structures))
     
-    # Save structures to file
-    with open(STRUCTURES_JSON_PATH, 'w') as f:
-        json.dump(code_structures, f)
-    
-    print(f"Found {len(code_structures)} code structures")
+    print(f"Found {count} code structures")
     
     # Index the structures
-    index_structures(code_structures, model_all_minilm, model_unixcoder)
+    index_structures(iter_json_array(STRUCTURES_JSON_PATH), model_all_minilm, model_unixcoder)
+
+# Adapt an extracted structure to match what textify expects
+def to_textify_structure(structure):
+    signature = structure.get("signature") or structure["snippet"].split("\n", 1)[0].strip()
+    code_type = structure["structure_type"].capitalize()
+    name = structure["name"]
+    
+    return {
+        "code_type": code_type,
+        "name": name,
+        "signature": signature,
+        "docstring": structure["docstring"],
+        "module": structure["module"],
+        "line": structure["line"],
+        "line_from": structure["line_from"],
+        "line_to": structure["line_to"],
+        "context": {
+            "module": structure["module"],
+            "file_path": structure["file_path"],
+            "file_name": structure["file_name"],
+            "struct_name": structure.get("parent"),
+            "snippet": structure["snippet"]
+        }
+    }
 
 # Index structures to Qdrant
 def index_structures(structures, model_all_minilm, model_unixcoder):
@@ -3,7 +3,6 @@
 import os
 import json
 import sys
-import glob
 import hashlib
 import numpy as np
 import argparse
@@ -12,16 +11,24 @@ from tqdm import tqdm
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 
+# Add the code_search module to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_search.index.generate_structures import find_source_files, update_structures
+from code_search.index.storage import iter_json_array
+
 # Parse arguments
 parser = argparse.ArgumentParser(description='Index Quran codebase structures')
 parser.add_argument('--target-dir', type=str, default="",
                     help='Target directory to process')
 parser.add_argument('--pattern', type=str, default="**/*.dart",
                     help='File pattern to process')
-parser.add_argument('--max-lines', type=int, default=500,
-                    help='Maximum lines per code block')
+parser.add_argument('--max-lines', type=int, default=0,
+                    help='Maximum lines per code block (0 keeps all; long blocks are embedded as windows)')
 parser.add_argument('--force', action='store_true',
-                    help='Force regeneration even if structures exist')
+                    help='Re-scan every file instead of only the added and changed ones')
+parser.add_argument('--workers', type=int, default=None,
+                    help='Worker processes scanning files (default: one per core, 1 disables)')
 args = parser.parse_args()
 
 # Set up paths
@@ -105,33 +112,10 @@ def simple_encode(text, size=VECTOR_SIZE):
 def process_flutter_files():
     print("Processing Flutter files...")
     
-    # Get all files matching the pattern
-    if os.path.isdir(QURAN_CODEBASE_PATH):
-        # If the target is a directory without a pattern specified or a directory is specified directly
-        if args.pattern == "**/*.dart" and not QURAN_CODEBASE_PATH.endswith(".dart"):
-            # Use all dart files in that directory and subdirectories
-            file_pattern = "**/*.dart"
-            dart_files = glob.glob(os.path.join(QURAN_CODEBASE_PATH, file_pattern), recursive=True)
-            print(f"Searching recursively in directory: '{QURAN_CODEBASE_PATH}' for *.dart files")
-        elif args.pattern.startswith('**'):
-            # Already a recursive pattern
-            file_pattern = args.pattern
-            dart_files = glob.glob(os.path.join(QURAN_CODEBASE_PATH, file_pattern), recursive=True)
-        elif args.pattern.startswith('*'):
-            # For patterns like *.dart, we should only search in the immediate directory
-            # without recursing into subdirectories
-            file_pattern = args.pattern
-            dart_files = glob.glob(os.path.join(QURAN_CODEBASE_PATH, file_pattern), recursive=False)
-            print(f"Searching only in immediate directory: '{QURAN_CODEBASE_PATH}'")
-        else:
-            # For other patterns, assume it should be recursive but check both
-            file_pattern = args.pattern
-            dart_files = glob.glob(os.path.join(QURAN_CODEBASE_PATH, file_pattern), recursive=False)
-            if not dart_files:  # If no files found, try with recursive
-                file_pattern = f"**/{args.pattern}"
-                dart_files = glob.glob(os.path.join(QURAN_CODEBASE_PATH, file_pattern), recursive=True)
-    else:
-        print(f"Error processing '{QURAN_CODEBASE_PATH}': Is not a directory")
+    try:
+        dart_files = find_source_files(QURAN_CODEBASE_PATH, args.pattern)
+    except NotADirectoryError as e:
+        print(e)
         sys.exit(1)
     
     print(f"Found {len(dart_files)} files to process with pattern: {args.pattern}")
@@ -140,114 +124,19 @@ def process_flutter_files():
     if len(dart_files) > 5:
         print(f"  ... and {len(dart_files) - 5} more")
     
-    code_structures = []
-    
-    for file_path in tqdm(dart_files):
-        try:
-            # Skip directories that might have been caught by the glob pattern
-            if os.path.isdir(file_path):
-                print(f"Skipping directory: {file_path}")
-                continue
-                
-            relative_path = os.path.relpath(file_path, start=QURAN_CODEBASE_PATH)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                code = f.read()
-                
-            # Extract file parts
-            file_name = os.path.basename(file_path)
-            dir_path = os.path.dirname(file_path)
-            module = os.path.basename(dir_path) if dir_path else ""
-            
-            # Process code line by line
-            lines = code.split('\n')
-            line_index = 0
-            
-            while line_index < len(lines):
-                # Look for class or function definitions
-                if line_index < len(lines) and ('class ' in lines[line_index] or 
-                                              'void ' in lines[line_index] or 
-                                              'Future<' in lines[line_index] or
-                                              'Stream<' in lines[line_index] or
-                                              'Widget ' in lines[line_index]):
-                    start_line = line_index
-                    # Look for opening brace
-                    brace_count = 0
-                    end_line = start_line
-                    
-                    # Collect docstring if any (usually before the definition)
-                    docstring = ""
-                    if start_line > 0 and "///" in lines[start_line - 1]:
-                        comment_lines = []
-                        i = start_line - 1
-                        while i >= 0 and "///" in lines[i]:
-                            comment_lines.insert(0, lines[i].strip("/ "))
-                            i -= 1
-                        docstring = "\n".join(comment_lines)
-                    
-                    # Find the end of the definition
-                    while end_line < len(lines):
-                        line = lines[end_line]
-                        brace_count += line.count('{') - line.count('}')
-                        if brace_count <= 0 and '{' in line:
-                            break
-                        end_line += 1
-                    
-                    # Check if we found a complete definition
-                    if end_line < len(lines) and '{' in lines[end_line]:
-                        # Find matching closing brace
-                        brace_count = 1  # We've found an opening brace
-                        end_line += 1
-                        
-                        while end_line < len(lines) and brace_count > 0:
-                            line = lines[end_line]
-                            brace_count += line.count('{') - line.count('}')
-                            end_line += 1
-                        
-                        # Adjust for over-counting
-                        if brace_count <= 0:
-                            end_line -= 1
-                        
-                        # Extract the code segment
-                        code_segment = "\n".join(lines[start_line:end_line+1])
-                        
-                        # Skip if code segment is too long
-                        if len(lines[start_line:end_line+1]) > args.max_lines:
-                            line_index = end_line
-                            continue
-                        
-                        # Create structure
-                        structure_type = "class" if "class " in lines[start_line] else "function"
-                        name = lines[start_line].split("class ")[1].split("{")[0].strip() if "class " in lines[start_line] else lines[start_line].split("(")[0].split(" ")[-1].strip()
-                        
-                        structure = {
-                            "structure_type": structure_type,
-                            "name": name,
-                            "docstring": docstring,
-                            "module": module,
-                            "file_path": relative_path,
-                            "file_name": file_name,
-                            "line": start_line + 1,
-                            "line_from": start_line + 1,
-                            "line_to": end_line + 1,
-                            "snippet": code_segment
-                        }
-                        
-                        code_structures.append(structure)
-                        line_index = end_line
-                
-                line_index += 1
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-    
-    # Save structures to file
-    with open(STRUCTURES_JSON_PATH, 'w') as f:
-        json.dump(code_structures, f)
+    # Only files added or changed since the last run are scanned, in parallel
+    with tqdm(total=len(dart_files)) as pbar:
+        delta = update_structures(
+            QURAN_CODEBASE_PATH, dart_files, args.max_lines, str(STRUCTURES_JSON_PATH),
+            progress=lambda done, total: pbar.update(done - pbar.n), workers=args.workers, full=args.force,
+        )
     
-    print(f"Found {len(code_structures)} code structures")
+    print(f"Files: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+          f"{len(delta['removed'])} removed, {delta['unchanged']} unchanged")
+    print(f"Found {delta['structures']} code structures")
     
     # Index the structures
-    index_structures(code_structures)
+    index_structures(iter_json_array(STRUCTURES_JSON_PATH))
 
 # Index structures to Qdrant
 def index_structures(structures):
@@ -290,11 +179,6 @@ def index_structures(structures):
             print(f"Error uploading batch {i//batch_size} to {COLLECTION_NAME}: {e}")
 
 if __name__ == "__main__":
-    # Check if we should skip generation if structure exists
-    if not args.force and os.path.exists(STRUCTURES_JSON_PATH):
-        print(f"Structure file {STRUCTURES_JSON_PATH} already exists. Use --force to regenerate.")
-        sys.exit(0)
-        
     # Set up collections
     setup_collections()
     
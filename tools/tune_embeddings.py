@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tune the embedding batch size and thread counts for this machine.
+
+The model embeds a sample of data/structures.json with doubling batch sizes
+until throughput stops improving or the projected peak memory would cross the
+ceiling, then tries thread counts for indexing and for single queries. The
+result is stored per host and model in data/tuning.json, where embedding jobs
+and query encoding pick it up automatically.
+"""
+import os
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from code_search.index.generate_embeddings import AVAILABLE_MODELS, STRUCTURES_FILE, create_provider
+from code_search.index.tuning import MAX_BATCH_SIZE, TUNING_FILE, sample_texts, tune
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune embedding batch size and threads for this machine")
+    parser.add_argument("--model", type=str, choices=list(AVAILABLE_MODELS.keys()), nargs="+", default=["qodo"],
+                        help="Models to tune (default: qodo)")
+    parser.add_argument("--gpu", action="store_true", help="Tune the models on CUDA")
+    parser.add_argument("--sample", type=int, default=64, help="Number of structures to embed per probe (default: 64)")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help=f"Largest batch size to probe (default: {MAX_BATCH_SIZE})")
+    parser.add_argument("--memory-ceiling", type=float, help="Peak RSS in MB the probes must stay under "
+                        "(default: EMBEDDING_TUNING_MEMORY_FRACTION of the physical memory)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not os.path.exists(STRUCTURES_FILE):
+        print(f"Error: {STRUCTURES_FILE} not found. Please generate code structures first.")
+        sys.exit(1)
+    texts = sample_texts(STRUCTURES_FILE, args.sample)
+
+    device = "cuda" if args.gpu else "cpu"
+    for model in args.model:
+        print(f"Tuning {model} on {device}...")
+        provider = create_provider(model, args.gpu)
+        config = tune(model, provider, texts, device, args.max_batch_size, args.memory_ceiling)
+        print(f"{model}: batch size {config['batch_size']}, {config['threads']} threads "
+              f"({config['items_per_second']:.2f} items/s), {config['query_threads']} query threads "
+              f"({config['query_latency_ms']:.1f} ms/query)")
+        del provider
+
+    print(f"Configuration saved to {TUNING_FILE}")
+
+
+if __name__ == "__main__":
+    main()